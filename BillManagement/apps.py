@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BillmanagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'BillManagement'
+
+    def ready(self):
+        from BillManagement import checks, signals  # noqa: F401  Registers the system checks and cache invalidation receivers
@@ -0,0 +1,190 @@
+"""
+Async versions of the read endpoints.
+
+Under ASGI these views run on the event loop and query the database with Django's async ORM, so
+a worker keeps serving other requests while one waits on the database. They return the same
+bodies, status codes and ETags as their counterparts in ``views``; ``urls`` routes the read
+endpoints here when ``ASYNC_READ_VIEWS`` is set.
+
+The Server-Sent Events endpoints streaming live group and user events live here as well.
+"""
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from BillManagement import balances, caching, events, lookups, models, pagination, reads, views
+from user.authentication import StatelessJWTAuthentication
+from user.models import UserInfo as UserProfile
+from utils import fast_json
+
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    """
+    Returns a JSON response encoded like the API's renderer encodes it.
+    """
+    return HttpResponse(fast_json.dumps(data), status=status_code, headers=headers,
+                        content_type='application/json')
+
+
+class AsyncReadView(View):
+    """
+    Base of the async read views.
+
+    Requests are authenticated with the same JWT authentication as the API views; like them,
+    anonymous requests are rejected.
+    """
+    http_method_names = ['get', 'head', 'options']
+    authentication = StatelessJWTAuthentication()
+    sync_view_class = None  # The API view serving the same endpoint, used by batch requests
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            authenticated = await self.authentication.aauthenticate(request)
+        except exceptions.APIException as exc:
+            return self.authentication_failed(request, exc.detail, exc.status_code)
+        if authenticated is None:
+            return self.authentication_failed(
+                request, exceptions.NotAuthenticated.default_detail, status.HTTP_401_UNAUTHORIZED)
+        request.user, request.auth = authenticated
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def head(self, request, *args, **kwargs):
+        return await self.get(request, *args, **kwargs)
+
+    def authentication_failed(self, request, detail, status_code):
+        body = detail if isinstance(detail, dict) else {'detail': detail}
+        return json_response(body, status_code, {'WWW-Authenticate': self.authentication.authenticate_header(request)})
+
+    async def conditional_response(self, request, namespace, entity_id, name, compute):
+        """
+        Async version of :func:`caching.conditional_response`.
+        """
+        params = request.GET.dict()
+        tag = await caching.aetag(namespace, entity_id, name, params)
+        if caching.is_not_modified(request, tag):
+            response = HttpResponseNotModified()
+            response['ETag'] = tag
+            return response
+        data = await caching.acached(namespace, entity_id, name, params, compute)
+        return json_response(data, headers={'ETag': tag})
+
+
+class ShowGroupMembersView(AsyncReadView):
+    """Show group members"""
+    sync_view_class = views.ShowGroupMembersApiView
+
+    async def get(self, request):
+        group_name = request.GET.get('name')
+        try:
+            group = await lookups.aget_group(group_name)
+
+            async def members_page():
+                members, next_cursor = await pagination.apaginate(
+                    request, reads.members_queryset(group), reads.MEMBERS_ORDERING)
+                return reads.members_data(group, members, next_cursor)
+
+            return await self.conditional_response(request, caching.GROUP, group.id, 'members', members_page)
+        except models.Group.DoesNotExist:
+            return json_response({'error': 'Group does not exist'}, status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+
+class ShowUserDetailsView(AsyncReadView):
+    """Show user details"""
+    sync_view_class = views.ShowUserDetailsApiView
+
+    async def get(self, request):
+        user_email = request.GET.get('email')
+        try:
+            user = await lookups.aget_profile(user_email)
+
+            async def summary_page():
+                rows, next_cursor = await pagination.apaginate(
+                    request, balances.user_balances(user), reads.BALANCES_ORDERING)
+                owes, owed = await balances.auser_totals(user)
+                return reads.user_details_data(user, rows, next_cursor, owes, owed)
+
+            return await self.conditional_response(request, caching.USER, user.id, 'details', summary_page)
+        except UserProfile.DoesNotExist:
+            return json_response({'error': 'User does not exist'}, status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+
+class ShowGroupDetailsView(AsyncReadView):
+    """Show group details"""
+    sync_view_class = views.ShowGroupDetailsApiView
+
+    async def get(self, request):
+        group_name = request.GET.get('name')
+        try:
+            group = await lookups.aget_group(group_name)
+
+            async def details_page():
+                expenses, next_cursor = await pagination.apaginate(
+                    request, reads.details_queryset(group), reads.DETAILS_ORDERING)
+                return reads.details_data(expenses, next_cursor)
+
+            return await self.conditional_response(request, caching.GROUP, group.id, 'details', details_page)
+        except models.Group.DoesNotExist:
+            return json_response({'error': 'Group does not exist'}, status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+
+async def event_stream(channel):
+    """
+    Yields the events of a channel as Server-Sent Events until the client disconnects.
+
+    A comment is sent when no event arrives for ``EVENT_STREAM_KEEPALIVE_SECONDS`` so proxies
+    keep the connection open.
+    """
+    subscription = events.get_broker().subscribe(channel)
+    try:
+        yield b': connected\n\n'
+        while True:
+            event = await subscription.get(settings.EVENT_STREAM_KEEPALIVE_SECONDS)
+            if event is None:
+                yield b': keep-alive\n\n'
+            else:
+                yield b'id: %d\nevent: %s\ndata: %s\n\n' % (
+                    event['id'], event['type'].encode(), fast_json.dumps(event['data']))
+    finally:
+        subscription.close()
+
+
+class EventStreamView(AsyncReadView):
+    """
+    Base of the Server-Sent Events endpoints.
+
+    Each client holds one long-lived connection, so these views are meant to be served by the
+    ASGI application, where an idle stream costs no worker thread.
+    """
+    http_method_names = ['get', 'options']
+
+    def stream(self, channel):
+        return StreamingHttpResponse(event_stream(channel), content_type='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # Stops nginx from buffering the stream
+        })
+
+
+class GroupEventsView(EventStreamView):
+    """Stream group events"""
+    async def get(self, request):
+        try:
+            group = await lookups.aget_group(request.GET.get('name'))
+        except models.Group.DoesNotExist:
+            return json_response({'error': 'Group does not exist'}, status.HTTP_404_NOT_FOUND)
+        return self.stream(events.group_channel(group.id))
+
+
+class UserEventsView(EventStreamView):
+    """Stream user events"""
+    async def get(self, request):
+        try:
+            user = await lookups.aget_profile(request.GET.get('email'))
+        except UserProfile.DoesNotExist:
+            return json_response({'error': 'User does not exist'}, status.HTTP_404_NOT_FOUND)
+        return self.stream(events.user_channel(user.id))
@@ -0,0 +1,167 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Q, Sum
+from BillManagement import caching, ledger, models
+
+
+def balance_key(from_user_id, to_user_id):
+    """
+    Orders a debt's users into the canonical (user_a, user_b) pair.
+
+    Args:
+        from_user_id (UUID): The user who lent the money.
+        to_user_id (UUID): The user who owes the money.
+
+    Returns:
+        tuple: ``(user_a_id, user_b_id, sign)`` where ``sign`` is +1 when ``user_b`` owes
+        ``user_a`` for this debt and -1 otherwise.
+    """
+    if from_user_id < to_user_id:
+        return from_user_id, to_user_id, 1
+    return to_user_id, from_user_id, -1
+
+
+def apply_debts(entries, kind):
+    """
+    Applies debt changes to the stored pairwise balances and records them in the ledger.
+
+    Every change is written to the overall balance row of the pair and, when a group is
+    given, to the group's row as well. The whole update costs one locking select, one bulk
+    insert and one bulk update regardless of how many entries are passed, plus one insert
+    into the ledger.
+
+    Args:
+        entries (iterable): ``(from_user_id, to_user_id, amount, group_id, expense_id)`` tuples
+            where a positive ``amount`` means ``to_user`` now owes ``from_user`` that much more, in
+            minor units of ``BASE_CURRENCY``.
+        kind (str): The ``LedgerEntry`` kind of the changes.
+    """
+    deltas = defaultdict(int)
+    ledger_entries = defaultdict(int)
+    for from_user_id, to_user_id, amount, group_id, expense_id in entries:
+        if from_user_id == to_user_id or not amount:
+            continue
+        user_a_id, user_b_id, sign = balance_key(from_user_id, to_user_id)
+        deltas[(user_a_id, user_b_id, None)] += sign * amount
+        if group_id is not None:
+            deltas[(user_a_id, user_b_id, group_id)] += sign * amount
+        ledger_entries[(user_a_id, user_b_id, group_id, expense_id)] += sign * amount
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    caching.invalidate(caching.USER, {user_id for key in deltas for user_id in key[:2]})
+
+    with transaction.atomic():
+        ledger.record(((*key, amount) for key, amount in ledger_entries.items() if amount), kind)
+
+        user_a_ids = {key[0] for key in deltas}
+        user_b_ids = {key[1] for key in deltas}
+        group_ids = {key[2] for key in deltas if key[2] is not None}
+        group_filter = Q(group__isnull=True)
+        if group_ids:
+            group_filter |= Q(group_id__in=group_ids)
+
+        existing = models.Balance.objects.select_for_update().filter(
+            group_filter, user_a_id__in=user_a_ids, user_b_id__in=user_b_ids
+        )
+        to_update = []
+        for balance in existing:
+            key = (balance.user_a_id, balance.user_b_id, balance.group_id)
+            if key in deltas:
+                balance.amount += deltas.pop(key)
+                to_update.append(balance)
+
+        if to_update:
+            models.Balance.objects.bulk_update(to_update, ['amount'])
+        if deltas:
+            models.Balance.objects.bulk_create([
+                models.Balance(user_a_id=user_a_id, user_b_id=user_b_id, group_id=group_id, amount=delta)
+                for (user_a_id, user_b_id, group_id), delta in deltas.items()
+            ])
+
+
+def user_balances(user, group=None):
+    """
+    Returns the non-zero balance rows between the user and any counterparty.
+
+    Args:
+        user (UserProfile): The user whose balances are requested.
+        group (Group): Restricts the balances to this group. Defaults to the overall balances.
+
+    Returns:
+        QuerySet: Balance rows with both users selected.
+    """
+    return models.Balance.objects.filter(
+        Q(user_a=user) | Q(user_b=user), group=group
+    ).exclude(amount=0).select_related('user_a', 'user_b')
+
+
+def group_balances(group):
+    """
+    Returns the non-zero balance rows of a group.
+
+    Args:
+        group (Group): The group whose balances are requested.
+
+    Returns:
+        QuerySet: Balance rows of the group.
+    """
+    return models.Balance.objects.filter(group=group).exclude(amount=0)
+
+
+def counterparty_amount(balance, user):
+    """
+    Reads a balance row from the point of view of one of its users.
+
+    Args:
+        balance (Balance): The balance row.
+        user (UserProfile): One of the two users of the row.
+
+    Returns:
+        tuple: ``(counterparty, amount)`` where a positive ``amount`` means the user owes
+        the counterparty and a negative one means the counterparty owes the user.
+    """
+    if balance.user_a_id == user.id:
+        return balance.user_b, -balance.amount
+    return balance.user_a, balance.amount
+
+
+def user_totals(user, group=None):
+    """
+    Returns how much the user owes and is owed in total, computed in one aggregate query.
+
+    Args:
+        user (UserProfile): The user whose totals are requested.
+        group (Group): Restricts the totals to this group. Defaults to the overall balances.
+
+    Returns:
+        tuple: ``(owes, owed)``, both non-negative.
+    """
+    queryset, aggregates = _totals_query(user, group)
+    return _totals(queryset.aggregate(**aggregates))
+
+
+async def auser_totals(user, group=None):
+    """
+    Async version of :func:`user_totals`.
+    """
+    queryset, aggregates = _totals_query(user, group)
+    return _totals(await queryset.aaggregate(**aggregates))
+
+
+def _totals_query(user, group):
+    """Returns the balance rows of the user and the sums that make up their totals."""
+    queryset = models.Balance.objects.filter(Q(user_a=user) | Q(user_b=user), group=group)
+    aggregates = dict(
+        owes_as_a=Sum('amount', filter=Q(user_a=user, amount__lt=0), default=0),
+        owes_as_b=Sum('amount', filter=Q(user_b=user, amount__gt=0), default=0),
+        owed_as_a=Sum('amount', filter=Q(user_a=user, amount__gt=0), default=0),
+        owed_as_b=Sum('amount', filter=Q(user_b=user, amount__lt=0), default=0),
+    )
+    return queryset, aggregates
+
+
+def _totals(totals):
+    return (totals['owes_as_b'] - totals['owes_as_a'],
+            totals['owed_as_a'] - totals['owed_as_b'])
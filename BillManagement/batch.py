@@ -0,0 +1,129 @@
+import io
+import json
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.response import Response
+from BillManagement import lookups
+
+MAX_OPERATIONS = 50  # Sub-requests accepted in one batch
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Endpoints that cannot run inside a batch: the batch itself, streamed downloads, event streams and
+# file uploads
+EXCLUDED_URL_NAMES = {'batch', 'export_group', 'group_events', 'user_events', 'import_expenses'}
+# Headers of the batch request that must not leak into its sub-requests
+DROPPED_HEADERS = ('HTTP_AUTHORIZATION', 'HTTP_IDEMPOTENCY_KEY', 'HTTP_IF_NONE_MATCH', 'CONTENT_TYPE',
+                   'CONTENT_LENGTH')
+
+
+class BatchError(Exception):
+    """
+    Raised when a batch or one of its operations is malformed.
+    """
+
+
+def build_request(request, method, path, params, body):
+    """
+    Builds the Django request of one operation, authenticated as the batch's user.
+
+    The sub-request skips the middleware and token authentication: the user resolved for the
+    batch is forced on it the same way DRF's test client forces authentication.
+    """
+    payload = json.dumps(body).encode() if body is not None else b''
+    sub_request = HttpRequest()
+    sub_request.method = method
+    sub_request.path = sub_request.path_info = path
+    sub_request.META = {key: value for key, value in request.META.items() if key not in DROPPED_HEADERS}
+    sub_request.META.update(CONTENT_TYPE='application/json', CONTENT_LENGTH=str(len(payload)),
+                            REQUEST_METHOD=method, PATH_INFO=path)
+    sub_request.GET = QueryDict(mutable=True)
+    for key, value in (params or {}).items():
+        sub_request.GET.setlist(key, value if isinstance(value, list) else [value])
+    sub_request._body = payload
+    sub_request._stream = io.BytesIO(payload)
+    sub_request._read_started = False
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def run_operation(request, operation):
+    """
+    Runs one operation of a batch through its BillManagement view.
+
+    Args:
+        request (Request): The batch request.
+        operation (dict): ``method``, ``path`` relative to ``/api/bill/``, and optional ``params``
+            and ``body``.
+
+    Returns:
+        Response: The response of the view.
+
+    Raises:
+        BatchError: If the operation is malformed or targets an endpoint that cannot be batched.
+    """
+    if not isinstance(operation, dict):
+        raise BatchError('Each operation must be an object')
+    method = str(operation.get('method', 'GET')).upper()
+    path = '/' + str(operation.get('path', '')).lstrip('/')
+    try:
+        match = resolve(path, urlconf='BillManagement.urls')
+    except Resolver404:
+        raise BatchError(f'Unknown path {path}')
+    if match.url_name in EXCLUDED_URL_NAMES:
+        raise BatchError(f'{path} cannot be used in a batch')
+
+    sub_request = build_request(request, method, request.path.rsplit('/batch/', 1)[0] + path,
+                                operation.get('params'), operation.get('body'))
+    view = match.func
+    sync_view_class = getattr(getattr(view, 'view_class', None), 'sync_view_class', None)
+    if sync_view_class is not None:
+        # Async read views are run through their API view, which takes the batch's user
+        view = sync_view_class.as_view()
+    response = view(sub_request, *match.args, **match.kwargs)
+    if method not in SAFE_METHODS:
+        # The operation may have changed the users and groups the next ones read
+        lookups.forget()
+    if not isinstance(response, Response):
+        raise BatchError(f'{path} did not return a JSON response')
+    return response
+
+
+def run_batch(request, operations, stop_on_failure=False):
+    """
+    Runs the operations of a batch in order, sharing the users and groups they load.
+
+    Args:
+        request (Request): The batch request.
+        operations (list): The operations, see ``run_operation``.
+        stop_on_failure (bool): Skip the remaining operations once one returns an error.
+
+    Returns:
+        list: ``{'status': ..., 'body': ...}`` results in the order of the operations.
+
+    Raises:
+        BatchError: If the batch or one of its operations is malformed.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BatchError('operations must be a non-empty list')
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError(f'A batch can contain at most {MAX_OPERATIONS} operations')
+
+    results = []
+    with lookups.shared_lookups():
+        for index, operation in enumerate(operations):
+            try:
+                response = run_operation(request, operation)
+            except BatchError as e:
+                raise BatchError(f'Operation {index}: {e}')
+            results.append({'status': response.status_code, 'body': response.data})
+            if stop_on_failure and is_failure(results[-1]):
+                break
+    return results
+
+
+def is_failure(result):
+    """
+    Returns True if the result of an operation is an error response.
+    """
+    return result['status'] >= status.HTTP_400_BAD_REQUEST
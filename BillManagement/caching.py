@@ -0,0 +1,171 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+GROUP = 'group'  # Namespace of entries that depend on a group's members or expenses
+USER = 'user'  # Namespace of entries that depend on a user's balances
+
+
+def _version_key(namespace, entity_id):
+    return f'bill:{namespace}:{entity_id}:version'
+
+
+def _digest(params):
+    return hashlib.md5(repr(sorted(params.items())).encode()).hexdigest()
+
+
+def get_version(namespace, entity_id):
+    """
+    Returns the current cache version of an entity.
+
+    Missing versions are seeded from the clock, so a version lost to eviction never
+    falls back to a value that older entries were stored under.
+
+    Args:
+        namespace (str): Either :data:`GROUP` or :data:`USER`.
+        entity_id (UUID): The group or user id.
+
+    Returns:
+        int: The version.
+    """
+    key = _version_key(namespace, entity_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key, time.time_ns())
+    return version
+
+
+async def aget_version(namespace, entity_id):
+    """
+    Async version of :func:`get_version`.
+    """
+    key = _version_key(namespace, entity_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key, time.time_ns())
+    return version
+
+
+def invalidate(namespace, entity_ids):
+    """
+    Bumps the cache version of entities so that their cached entries are never served again.
+
+    The bump happens immediately and again once the current transaction commits, so a
+    read that caches pre-commit data in between is discarded as well.
+
+    Args:
+        namespace (str): Either :data:`GROUP` or :data:`USER`.
+        entity_ids (iterable): The group or user ids.
+    """
+    keys = {_version_key(namespace, entity_id) for entity_id in entity_ids if entity_id is not None}
+    if not keys:
+        return
+
+    def bump():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def cached(namespace, entity_id, name, params, compute):
+    """
+    Returns a cached value for an entity, computing and storing it on a miss.
+
+    Args:
+        namespace (str): Either :data:`GROUP` or :data:`USER`.
+        entity_id (UUID): The group or user id the value depends on.
+        name (str): Name of the cached view or value.
+        params (dict): Request parameters that change the value, such as the page cursor.
+        compute (callable): Builds the value on a miss.
+
+    Returns:
+        object: The cached or freshly computed value.
+    """
+    key = f'bill:{namespace}:{entity_id}:{get_version(namespace, entity_id)}:{name}:{_digest(params)}'
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.BILL_CACHE_TIMEOUT)
+    return value
+
+
+async def acached(namespace, entity_id, name, params, compute):
+    """
+    Async version of :func:`cached`, where ``compute`` is a coroutine function.
+    """
+    key = f'bill:{namespace}:{entity_id}:{await aget_version(namespace, entity_id)}:{name}:{_digest(params)}'
+    value = await cache.aget(key)
+    if value is None:
+        value = await compute()
+        await cache.aset(key, value, settings.BILL_CACHE_TIMEOUT)
+    return value
+
+
+def etag(namespace, entity_id, name, params):
+    """
+    Builds the ETag of a cached read from the entity's current version.
+
+    Args:
+        namespace (str): Either :data:`GROUP` or :data:`USER`.
+        entity_id (UUID): The group or user id the value depends on.
+        name (str): Name of the cached view or value.
+        params (dict): Request parameters that change the value.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    return f'"{namespace}-{entity_id}-{get_version(namespace, entity_id)}-{name}-{_digest(params)}"'
+
+
+async def aetag(namespace, entity_id, name, params):
+    """
+    Async version of :func:`etag`.
+    """
+    return f'"{namespace}-{entity_id}-{await aget_version(namespace, entity_id)}-{name}-{_digest(params)}"'
+
+
+def is_not_modified(request, tag):
+    """
+    Returns True if the request's ``If-None-Match`` header matches the given ETag.
+    """
+    client_tags = parse_etags(request.headers.get('If-None-Match', ''))
+    return tag in client_tags or '*' in client_tags
+
+
+def conditional_response(request, namespace, entity_id, name, compute):
+    """
+    Responds to a cached read, with 304 Not Modified when the client's copy is still current.
+
+    The ETag is taken before the value is computed, so a write that lands in between makes the
+    next request fetch the value again rather than keep a stale copy. This only holds when every
+    worker reads the versions from the same cache: production.py and ``manage.py check --deploy``
+    (``BillManagement.E001``) refuse a per-process cache.
+
+    Args:
+        request (Request): The GET request, possibly carrying ``If-None-Match``.
+        namespace (str): Either :data:`GROUP` or :data:`USER`.
+        entity_id (UUID): The group or user id the value depends on.
+        name (str): Name of the cached view or value.
+        compute (callable): Builds the value on a cache miss.
+
+    Returns:
+        Response: The value with its ``ETag``, or an empty 304 response.
+    """
+    params = request.GET.dict()
+    tag = etag(namespace, entity_id, name, params)
+    if is_not_modified(request, tag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': tag})
+    data = cached(namespace, entity_id, name, params, compute)
+    return Response(data, status=status.HTTP_200_OK, headers={'ETag': tag})
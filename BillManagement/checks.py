@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Cache backends whose entries are only seen by the process that wrote them
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Requires a cache shared between workers, run by ``manage.py check --deploy``.
+
+    The versions that invalidate cached reads and their ETags live in the default cache. With a
+    per-process cache, a worker that did not serve a write keeps its old version and answers
+    304 Not Modified, or a cached body, for data that has changed.
+    """
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        'The default cache is local to each process.',
+        hint='Set CACHE_BACKEND to a cache shared by every worker, e.g. RedisCache.',
+        id='BillManagement.E001',
+    )]
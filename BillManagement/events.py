@@ -0,0 +1,168 @@
+"""
+Live events about groups and users.
+
+Writes publish small events, such as an expense being created or a payment recorded, on the
+channels of the groups and users they touch once their transaction commits. The event stream
+endpoints forward them to clients as Server-Sent Events, so frontends no longer need to poll.
+
+Events go through the broker named by ``EVENT_BROKER``. The default ``InProcessBroker`` only
+reaches subscribers of the same process; deployments running several worker processes plug in
+a broker backed by a shared pub/sub service by implementing ``Broker``.
+"""
+import asyncio
+import functools
+import itertools
+import threading
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+EXPENSE_CREATED = 'expense_created'
+PAYMENT_RECORDED = 'payment_recorded'
+MEMBERS_ADDED = 'members_added'
+MEMBERS_REMOVED = 'members_removed'
+GROUP_SETTLED = 'group_settled'
+RESET = 'reset'  # Sent to a subscriber that missed events, which should fetch the current state again
+
+_event_ids = itertools.count(1)
+
+
+def group_channel(group_id):
+    return f'group:{group_id}'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Broker:
+    """
+    Interface of the brokers delivering events to subscribers.
+    """
+    def publish(self, channel, event):
+        """
+        Delivers an event to the current subscribers of a channel. May be called from any thread.
+
+        Args:
+            channel (str): The channel, see ``group_channel`` and ``user_channel``.
+            event (dict): The event with its ``id``, ``type`` and ``data``.
+        """
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        """
+        Subscribes to a channel from the running event loop.
+
+        Returns:
+            Subscription: Receives the events published from now on until it is closed.
+        """
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        """
+        Stops delivering events to a subscription.
+        """
+        raise NotImplementedError
+
+
+class Subscription:
+    """
+    Events of one channel waiting to be read by one subscriber.
+
+    At most ``EVENT_QUEUE_SIZE`` events are buffered. When a slow subscriber falls further behind,
+    the oldest events are dropped and a ``reset`` event is delivered in their place.
+    """
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(settings.EVENT_QUEUE_SIZE)
+        self.missed = False
+
+    def put(self, event):
+        """Buffers an event; runs on the subscriber's event loop."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.missed = True
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """
+        Returns the next event, or None if none arrives within ``timeout`` seconds.
+        """
+        if self.missed:
+            self.missed = False
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return {'id': next(_event_ids), 'type': RESET, 'data': {}}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker(Broker):
+    """
+    Broker delivering events to the subscribers of the current process.
+    """
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The subscriber's event loop is closed
+                self.unsubscribe(subscription)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.channel, None)
+
+
+@functools.cache
+def get_broker():
+    """
+    Returns the broker configured by ``EVENT_BROKER``.
+    """
+    return import_string(settings.EVENT_BROKER)()
+
+
+def publish(event_type, data, group_ids=(), user_ids=()):
+    """
+    Publishes an event on the channels of groups and users once the current transaction commits.
+
+    Args:
+        event_type (str): One of the event types above.
+        data (dict): JSON serializable details of the event.
+        group_ids (iterable): Groups the event is about.
+        user_ids (iterable): Users the event is about.
+    """
+    channels = {group_channel(group_id) for group_id in group_ids if group_id is not None}
+    channels.update(user_channel(user_id) for user_id in user_ids if user_id is not None)
+    if not channels:
+        return
+
+    def deliver():
+        event = {'id': next(_event_ids), 'type': event_type, 'data': data}
+        broker = get_broker()
+        for channel in channels:
+            broker.publish(channel, event)
+
+    transaction.on_commit(deliver)
@@ -0,0 +1,97 @@
+from django.db import transaction
+from django.utils import timezone
+from BillManagement import balances, caching, events, fx, models, splits
+
+
+def split_expense(expense, paid_by_id, user_ids, owed_shares=None):
+    """
+    Splits an expense between its users.
+
+    Args:
+        expense (Expense): The expense being split.
+        paid_by_id (UUID): The user who paid the expense.
+        user_ids (list): The users sharing the expense.
+        owed_shares (list): The amount owed by each user, as computed by
+            :func:`BillManagement.splits.split_amounts`. Defaults to an equal split.
+
+    Returns:
+        tuple: The unsaved ``(debts, expense_users)`` of the expense.
+
+    Raises:
+        SplitError: If the expense amount cannot be split.
+    """
+    if owed_shares is None:
+        owed_shares = splits.split_amounts(expense.amount, splits.EQUAL, len(user_ids))
+    owed_shares = [int(share) for share in owed_shares]
+    debts = [
+        models.Debt(from_user_id=paid_by_id, to_user_id=user_id, amount=owed_share, currency=expense.currency)
+        for user_id, owed_share in zip(user_ids, owed_shares) if user_id != paid_by_id and owed_share
+    ]
+    expense_users = []
+    for user_id, owed_share in zip(user_ids, owed_shares):
+        paid_share = int(expense.amount) if user_id == paid_by_id else 0
+        expense_users.append(models.ExpenseUser(
+            user_id=user_id, paid_share=paid_share, owed_share=owed_share, net_balance=paid_share - owed_share))
+    return debts, expense_users
+
+
+def create_expenses(entries, batch_size=None):
+    """
+    Saves expenses together with their debts, expense users and balances.
+
+    Every table is written with bulk inserts inside one transaction, so the number of
+    queries does not depend on the number of expenses or participants. Debts in another
+    currency than ``BASE_CURRENCY`` are converted in bulk at the rate of the expense's date
+    before they are added to the balances.
+
+    Args:
+        entries (list): ``(expense, paid_by_id, user_ids)`` tuples with unsaved expenses, optionally
+            followed by the amount owed by each user as fourth item.
+        batch_size (int): Number of rows per insert statement.
+
+    Returns:
+        list: The saved expenses.
+
+    Raises:
+        MissingRate: If an expense's currency has no exchange rate for its date.
+    """
+    expenses = []
+    debts = []
+    expense_users = []
+    repayment_links = []
+    user_links = []
+    for expense, paid_by_id, user_ids, *owed_shares in entries:
+        expense_debts, expense_expense_users = split_expense(expense, paid_by_id, user_ids, *owed_shares)
+        expenses.append(expense)
+        debts.extend(expense_debts)
+        expense_users.extend(expense_expense_users)
+        repayment_links.extend((expense, debt) for debt in expense_debts)
+        user_links.extend((expense, expense_user) for expense_user in expense_expense_users)
+
+    with transaction.atomic():
+        models.Expense.objects.bulk_create(expenses, batch_size=batch_size)
+        models.Debt.objects.bulk_create_with_pks(debts, batch_size=batch_size)
+        models.ExpenseUser.objects.bulk_create(expense_users, batch_size=batch_size)
+        models.Expense.repayments.through.objects.bulk_create([
+            models.Expense.repayments.through(expense_id=expense.pk, debt_id=debt.pk)
+            for expense, debt in repayment_links
+        ], batch_size=batch_size)
+        models.Expense.users.through.objects.bulk_create([
+            models.Expense.users.through(expense_id=expense.pk, expenseuser_id=expense_user.pk)
+            for expense, expense_user in user_links
+        ], batch_size=batch_size)
+        base_amounts = fx.to_base(
+            [debt.amount for _, debt in repayment_links], [debt.currency for _, debt in repayment_links],
+            (timezone.localdate(expense.date) for expense, _ in repayment_links))
+        balances.apply_debts((
+            (debt.from_user_id, debt.to_user_id, int(base_amount), expense.expense_group_id, expense.pk)
+            for (expense, debt), base_amount in zip(repayment_links, base_amounts)
+        ), models.LedgerEntry.EXPENSE)
+        caching.invalidate(caching.GROUP, {expense.expense_group_id for expense in expenses})
+        for expense, paid_by_id, user_ids, *_ in entries:
+            events.publish(events.EXPENSE_CREATED, {
+                'expense': expense.name, 'group': expense.expense_group_id, 'amount': expense.amount,
+                'currency': expense.currency,
+                'paid_by': paid_by_id, 'users': list(user_ids),
+            }, group_ids=[expense.expense_group_id], user_ids=[paid_by_id, *user_ids])
+    return expenses
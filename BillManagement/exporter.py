@@ -0,0 +1,76 @@
+import csv
+from django.core.serializers.json import DjangoJSONEncoder
+from BillManagement import models
+
+CHUNK_SIZE = 2000  # Rows fetched from the database per round-trip
+FIELDS = ('type', 'expense', 'date', 'description', 'amount', 'currency', 'payment', 'from_user', 'to_user')
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def export_rows(group, chunk_size=CHUNK_SIZE):
+    """
+    Lazily yields every expense, repayment and settlement debt of a group.
+
+    Rows are read with ``values()`` projections and server-side iteration, so no model
+    instances are built and memory does not grow with the size of the group.
+
+    Args:
+        group (Group): The group to export.
+        chunk_size (int): Number of rows fetched per round-trip.
+
+    Yields:
+        dict: One row keyed by :data:`FIELDS`. Repayments and settlements use
+        ``from_user`` for the lender and ``to_user`` for the user who owes.
+    """
+    expenses = models.Expense.objects.filter(expense_group=group).order_by('date', 'transaction_id').values_list(
+        'name', 'date', 'description', 'amount', 'currency', 'payment')
+    for name, date, description, amount, currency, payment in expenses.iterator(chunk_size=chunk_size):
+        yield {'type': 'expense', 'expense': name, 'date': date, 'description': description,
+               'amount': amount, 'currency': currency, 'payment': payment, 'from_user': None, 'to_user': None}
+
+    repayments = models.Expense.repayments.through.objects.filter(expense__expense_group=group).order_by(
+        'expense__date', 'expense_id', 'debt_id').values_list(
+        'expense__name', 'debt__amount', 'debt__currency', 'debt__from_user__user__email',
+        'debt__to_user__user__email')
+    for name, amount, currency, from_user, to_user in repayments.iterator(chunk_size=chunk_size):
+        yield {'type': 'repayment', 'expense': name, 'date': None, 'description': None,
+               'amount': amount, 'currency': currency, 'payment': None, 'from_user': from_user, 'to_user': to_user}
+
+    settlements = models.Group.debts.through.objects.filter(group=group).order_by('debt_id').values_list(
+        'debt__amount', 'debt__currency', 'debt__from_user__user__email', 'debt__to_user__user__email')
+    for amount, currency, from_user, to_user in settlements.iterator(chunk_size=chunk_size):
+        yield {'type': 'settlement', 'expense': None, 'date': None, 'description': None,
+               'amount': amount, 'currency': currency, 'payment': None, 'from_user': from_user, 'to_user': to_user}
+
+
+class _Echo:
+    """
+    File-like object whose ``write`` returns the written value, used to stream CSV lines.
+    """
+    def write(self, value):
+        return value
+
+
+def render(rows, file_format):
+    """
+    Encodes rows lazily as CSV (with a header) or JSON lines.
+
+    Args:
+        rows (iterable): Rows as produced by :func:`export_rows`.
+        file_format (str): One of :data:`FORMATS`.
+
+    Yields:
+        str: One encoded line per row.
+    """
+    if file_format == 'csv':
+        writer = csv.DictWriter(_Echo(), fieldnames=FIELDS)
+        yield writer.writeheader()
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        encoder = DjangoJSONEncoder()
+        for row in rows:
+            yield encoder.encode(row) + '\n'
@@ -0,0 +1,202 @@
+"""
+Currency conversion with an in-memory table of exchange rates.
+
+Rates live in the ``ExchangeRate`` table, loaded from a local file with ``load_fx_rates``. Each
+process keeps them in a ``RateTable``: per currency, the days with a rate and the rates as NumPy
+arrays, so the rate of a day is a binary search and a batch of amounts is converted with one
+vectorized pass per currency instead of one lookup per row. Every load stamps the rates it
+stores with a new revision. A process reads the highest revision at most once every
+``FX_REVISION_CHECK_SECONDS`` and reloads its table when it differs from the one it loaded, so
+all workers follow a load within that delay without a shared cache, and converting amounts
+does not cost a query per call.
+"""
+import csv
+import datetime
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from BillManagement import models
+from BillManagement.money import MINOR_UNITS, validate_currency
+
+_table = None
+_table_revision = None
+_revision_checked_at = float('-inf')  # time.monotonic() of the last revision check
+_table_lock = threading.Lock()
+
+
+class MissingRate(ValueError):
+    """
+    Raised when a currency has no exchange rate on or before a requested day.
+    """
+
+
+class RateTable:
+    """
+    Exchange rates of every currency by day, against ``BASE_CURRENCY``.
+
+    Args:
+        rates (iterable): ``(currency, date, rate)`` tuples, rates being units of the currency
+            per unit of the base currency.
+        base_currency (str): The currency rates are quoted against.
+    """
+    def __init__(self, rates, base_currency):
+        by_currency = defaultdict(list)
+        for currency, date, rate in rates:
+            by_currency[currency].append((date.toordinal(), float(rate)))
+        self.base_currency = base_currency
+        self._days = {}
+        self._rates = {}
+        for currency, rows in by_currency.items():
+            rows.sort()
+            self._days[currency] = np.array([day for day, _ in rows], dtype=np.int64)
+            self._rates[currency] = np.array([rate for _, rate in rows], dtype=np.float64)
+
+    def rates(self, currency, days):
+        """
+        Returns the rate of a currency on each of the given days.
+
+        Args:
+            currency (str): ISO 4217 code.
+            days (numpy.ndarray): Day ordinals, as returned by ``date.toordinal()``.
+
+        Returns:
+            numpy.ndarray: The latest rate on or before each day.
+
+        Raises:
+            MissingRate: If the currency has no rate on or before one of the days.
+        """
+        if currency == self.base_currency:
+            return np.ones(len(days), dtype=np.float64)
+        known_days = self._days.get(currency)
+        if known_days is None:
+            raise MissingRate(f'No exchange rate for {currency}')
+        positions = np.searchsorted(known_days, days, side='right') - 1
+        if (positions < 0).any():
+            missing = datetime.date.fromordinal(int(days[positions < 0].min()))
+            raise MissingRate(f'No exchange rate for {currency} on {missing}')
+        return self._rates[currency][positions]
+
+    def rate(self, currency, date):
+        """Returns the rate of a currency on a day."""
+        return float(self.rates(currency, np.array([date.toordinal()]))[0])
+
+    def convert(self, amounts, currencies, dates, to_currency):
+        """
+        Converts amounts in minor units to another currency, rounding half to even.
+
+        Args:
+            amounts (iterable): Integer amounts in minor units.
+            currencies (iterable): The currency of each amount.
+            dates (iterable): The day whose rate converts each amount.
+            to_currency (str): The currency to convert to.
+
+        Returns:
+            numpy.ndarray: The int64 converted amounts in minor units of ``to_currency``.
+
+        Raises:
+            MissingRate: If a rate is missing.
+        """
+        amounts = np.asarray(amounts, dtype=np.int64)
+        days = np.fromiter(map(datetime.date.toordinal, dates), dtype=np.int64, count=len(amounts))
+        # Numbers the currencies so each one is selected with an integer comparison
+        currencies = list(currencies)
+        numbers = {currency: number for number, currency in enumerate(set(currencies))}
+        codes = np.fromiter(map(numbers.__getitem__, currencies), dtype=np.int64, count=len(amounts))
+        converted = amounts.copy()
+        for currency, number in numbers.items():
+            if currency == to_currency:
+                continue
+            mask = codes == number
+            factor = (self.rates(to_currency, days[mask]) / self.rates(currency, days[mask])
+                      * 10.0 ** (MINOR_UNITS[to_currency] - MINOR_UNITS[currency]))
+            converted[mask] = np.rint(amounts[mask] * factor)
+        return converted
+
+
+def get_table():
+    """
+    Returns this process's rate table, reloading it if the rates changed since it was loaded.
+
+    The latest revision is only read again once ``FX_REVISION_CHECK_SECONDS`` have passed since
+    the last check, or after this process loaded rates itself.
+    """
+    global _table, _table_revision, _revision_checked_at
+    now = time.monotonic()
+    if _table is not None and now - _revision_checked_at < settings.FX_REVISION_CHECK_SECONDS:
+        return _table
+    revision = latest_revision()
+    if _table is None or _table_revision != revision:
+        with _table_lock:
+            if _table is None or _table_revision != revision:
+                _table = RateTable(models.ExchangeRate.objects.values_list('currency', 'date', 'rate').iterator(),
+                                   settings.BASE_CURRENCY)
+                _table_revision = revision
+    _revision_checked_at = now
+    return _table
+
+
+def latest_revision():
+    """Returns the revision of the latest load of rates, read from the revision index."""
+    return models.ExchangeRate.objects.aggregate(revision=Max('revision'))['revision']
+
+
+def load_rates(stream):
+    """
+    Stores the exchange rates of a CSV file, replacing the stored rates of the same days.
+
+    The file needs a header with ``date`` (ISO 8601), ``currency`` and ``rate`` columns, the
+    rate being units of the currency per unit of ``BASE_CURRENCY``.
+
+    Args:
+        stream (file): Text stream to read from.
+
+    Returns:
+        int: The number of rates stored.
+
+    Raises:
+        ValueError: If a row is invalid, naming its line; nothing is stored then.
+    """
+    global _revision_checked_at
+    rates = []
+    for line, row in enumerate(csv.DictReader(stream), start=2):
+        try:
+            rate = Decimal(row.get('rate') or '')
+            if not rate.is_finite() or rate <= 0:
+                raise ValueError('Rate must be a positive number')
+            rates.append(models.ExchangeRate(currency=validate_currency(row.get('currency')),
+                                             date=datetime.date.fromisoformat(row.get('date') or ''), rate=rate))
+        except (InvalidOperation, ValueError) as e:
+            message = 'Rate must be a positive number' if isinstance(e, InvalidOperation) else e
+            raise ValueError(f'Line {line}: {message}')
+    with transaction.atomic():
+        # Seeded from the clock, so rates restored or deleted since never bring back a loaded revision
+        revision = max((latest_revision() or 0) + 1, time.time_ns())
+        for rate in rates:
+            rate.revision = revision
+        models.ExchangeRate.objects.bulk_create(rates, batch_size=1000, update_conflicts=True,
+                                                unique_fields=['currency', 'date'], update_fields=['rate', 'revision'])
+    # This process sees its own load at once, other processes at their next revision check
+    _revision_checked_at = float('-inf')
+    return len(rates)
+
+
+def convert(amounts, currencies, dates, to_currency):
+    """
+    Converts amounts in bulk, see :meth:`RateTable.convert`.
+
+    The rate table is only consulted when some amounts are in another currency.
+    """
+    currencies = list(currencies)
+    if all(currency == to_currency for currency in currencies):
+        return np.asarray(amounts, dtype=np.int64)
+    return get_table().convert(amounts, currencies, dates, to_currency)
+
+
+def to_base(amounts, currencies, dates):
+    """Converts amounts in bulk to ``BASE_CURRENCY``."""
+    return convert(amounts, currencies, dates, settings.BASE_CURRENCY)
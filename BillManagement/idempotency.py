@@ -0,0 +1,116 @@
+import functools
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from BillManagement import models
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def request_hash(request):
+    """
+    Returns a fingerprint of the request so a key cannot be reused for a different request.
+    """
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def expired_before():
+    """
+    Returns the creation time before which stored keys have expired.
+    """
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def claim_key(user_id, key, fingerprint):
+    """
+    Stores a new key for the request, or returns the one already stored for it.
+
+    An expired key, or one released by a failed request in the meantime, is claimed again.
+
+    Returns:
+        IdempotencyKey: The key, with ``claimed`` set to True if this request created it.
+    """
+    while True:
+        record = models.IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+        if record is not None:
+            if record.created_at >= expired_before():
+                record.claimed = False
+                return record
+            record.delete()
+        try:
+            with transaction.atomic():
+                record = models.IdempotencyKey.objects.create(user_id=user_id, key=key, request_hash=fingerprint)
+        except IntegrityError:
+            # Another request claimed the key in the meantime
+            continue
+        record.claimed = True
+        return record
+
+
+def idempotent(view_method):
+    """
+    Decorator making an APIView write method safe to retry with an ``Idempotency-Key`` header.
+
+    The first request with a key claims it and stores the response. Retries with the same key
+    get the stored response back without the view running again. A retry that arrives while
+    the first request is still running gets 409, and reusing a key for a different request
+    gets 422. Server errors release the key so the client can retry.
+
+    Args:
+        view_method (callable): The ``post`` method of an APIView.
+
+    Returns:
+        callable: The wrapped method.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_hash(request)
+        record = claim_key(request.user.pk, key, fingerprint)
+        if not record.claimed:
+            if record.request_hash != fingerprint:
+                return Response({'error': f'{HEADER} was already used for a different request'},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if record.status_code is None:
+                return Response({'error': f'A request with this {HEADER} is still in progress'},
+                                status=status.HTTP_409_CONFLICT)
+            return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            record.status_code = response.status_code
+            record.response = response.data
+            record.save(update_fields=['status_code', 'response'])
+        return response
+    return wrapper
+
+
+def sweep_expired_keys():
+    """
+    Deletes the stored keys older than ``IDEMPOTENCY_KEY_TTL``.
+
+    Returns:
+        int: The number of deleted keys.
+    """
+    deleted, _ = models.IdempotencyKey.objects.filter(created_at__lt=expired_before()).delete()
+    return deleted
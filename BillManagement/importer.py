@@ -0,0 +1,203 @@
+import csv
+import json
+from itertools import islice
+from django.db import DatabaseError
+from BillManagement import expenses, fx, lookups, models, money, splits
+
+CHUNK_SIZE = 1000  # Rows resolved and inserted together
+MAX_REPORTED_ERRORS = 1000  # Row errors kept in the summary, further ones are only counted
+FORMATS = ('csv', 'jsonl')
+
+
+def read_rows(stream, file_format):
+    """
+    Lazily reads expense rows from a CSV or JSONL text stream.
+
+    CSV files need a header with ``name``, ``description``, ``amount``, ``paid_by``,
+    ``users`` and ``group_name`` columns, where ``users`` holds ``;``-separated emails, and
+    may have a ``currency`` column; rows without one use their group's currency.
+    JSONL files hold one object with the same keys per line and ``users`` as a list.
+
+    Args:
+        stream (file): Text stream to read from.
+        file_format (str): Either ``'csv'`` or ``'jsonl'``.
+
+    Yields:
+        dict: The raw row, or ``None`` for a line that could not be parsed.
+    """
+    if file_format == 'csv':
+        for row in csv.DictReader(stream):
+            row['users'] = [email.strip() for email in (row.get('users') or '').split(';') if email.strip()]
+            yield row
+    elif file_format == 'jsonl':
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            if isinstance(row, dict) and isinstance(row.get('users'), str):
+                row['users'] = [email.strip() for email in row['users'].split(';') if email.strip()]
+            yield row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f'Unsupported format "{file_format}", expected one of {", ".join(FORMATS)}')
+
+
+def import_expenses(rows, chunk_size=CHUNK_SIZE):
+    """
+    Imports expense rows in chunks, reporting invalid rows without aborting the batch.
+
+    Each chunk resolves its emails, group names and expense names with one query each and
+    is written with bulk inserts in its own transaction, so memory stays bounded by the
+    chunk size whatever the size of the input.
+
+    Args:
+        rows (iterable): Rows as produced by :func:`read_rows`.
+        chunk_size (int): Number of rows per chunk.
+
+    Returns:
+        dict: ``created`` and ``failed`` counts plus the first ``errors`` as
+        ``{'row': number, 'error': message}`` dicts, rows being numbered from 1.
+    """
+    summary = {'created': 0, 'failed': 0, 'errors': []}
+    numbered_rows = enumerate(rows, start=1)
+    while True:
+        chunk = list(islice(numbered_rows, chunk_size))
+        if not chunk:
+            return summary
+        entries, errors = _resolve_chunk(chunk)
+        if entries:
+            try:
+                expenses.create_expenses([entry for _, entry in entries])
+                summary['created'] += len(entries)
+            except (DatabaseError, fx.MissingRate) as e:
+                errors.extend((number, f'Chunk could not be saved: {e}') for number, _ in entries)
+        summary['failed'] += len(errors)
+        for number, error in sorted(errors):
+            if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                summary['errors'].append({'row': number, 'error': error})
+
+
+def _resolve_chunk(chunk):
+    """
+    Validates a chunk of rows and turns the valid ones into expense entries.
+
+    Args:
+        chunk (list): ``(row_number, row)`` tuples.
+
+    Returns:
+        tuple: ``(row_number, entry)`` tuples whose entries are ready for
+        :func:`BillManagement.expenses.create_expenses`, and ``(row_number, error)`` tuples.
+    """
+    emails = set()
+    group_names = set()
+    expense_names = set()
+    errors = []
+    rows = []
+    for number, row in chunk:
+        try:
+            _check_types(row)
+        except ValueError as e:
+            errors.append((number, str(e)))
+            continue
+        rows.append((number, row))
+        emails.add(row.get('paid_by'))
+        emails.update(row.get('users') or [])
+        group_names.add(row.get('group_name'))
+        expense_names.add(row.get('name'))
+
+    user_ids = lookups.resolve_emails(emails, strict=False)
+    groups = {name: (group_id, currency) for name, group_id, currency in models.Group.objects.filter(
+        group_name__in=group_names).values_list('group_name', 'id', 'currency')}
+    taken_names = set(models.Expense.objects.filter(name__in=expense_names).values_list('name', flat=True))
+
+    entries = []
+    for number, row in rows:
+        try:
+            entries.append((number, _build_entry(row, user_ids, groups, taken_names)))
+            taken_names.add(row['name'])
+        except ValueError as e:
+            errors.append((number, str(e)))
+    return entries, errors
+
+
+def _check_types(row):
+    """
+    Rejects rows that could not be parsed or whose fields have the wrong type, such as a list
+    where an email is expected.
+
+    Raises:
+        ValueError: If the row is invalid.
+    """
+    if row is None:
+        raise ValueError('Row could not be parsed')
+    for field in ('name', 'description', 'paid_by', 'group_name', 'currency'):
+        if row.get(field) is not None and not isinstance(row[field], str):
+            raise ValueError(f'{field} must be a string')
+    users = row.get('users')
+    if users is not None and (not isinstance(users, list) or not all(isinstance(email, str) for email in users)):
+        raise ValueError('users must be a list of emails')
+
+
+def _parse_amount(value):
+    """Returns an integer amount, rejecting fractions instead of truncating them."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    raise ValueError('Amount must be an integer')
+
+
+def _build_entry(row, user_ids, groups, taken_names):
+    """
+    Validates one row against the resolved lookups.
+
+    Args:
+        row (dict): The raw row, with fields of the right types.
+        user_ids (dict): Maps known emails to user ids.
+        groups (dict): Maps known group names to ``(group_id, currency)`` tuples.
+        taken_names (set): Expense names that are already used.
+
+    Returns:
+        tuple: The ``(expense, paid_by_id, user_ids, owed_shares)`` entry, split equally.
+
+    Raises:
+        ValueError: If the row is invalid.
+    """
+    name = row.get('name')
+    if not name:
+        raise ValueError('Expense name is required')
+    if name in taken_names:
+        raise ValueError('Expense name must be unique')
+    amount = _parse_amount(row.get('amount'))
+
+    paid_by = row.get('paid_by')
+    if paid_by not in user_ids:
+        raise ValueError(f'User with email {paid_by} does not exist!')
+    users = row.get('users') or []
+    if not users:
+        raise ValueError('At least one user is required')
+    missing = [email for email in users if email not in user_ids]
+    if missing:
+        raise ValueError(f'Users with emails {", ".join(missing)} do not exist!')
+    group_name = row.get('group_name') or None
+    if group_name and group_name not in groups:
+        raise ValueError(f'Group {group_name} does not exist')
+    group_id, group_currency = groups.get(group_name, (None, money.default_currency()))
+    currency = money.validate_currency(row.get('currency') or group_currency)
+
+    expense = models.Expense(
+        expense_group_id=group_id,
+        description=row.get('description') or '',
+        amount=amount,
+        currency=currency,
+        name=name
+    )
+    member_ids = list(dict.fromkeys(user_ids[email] for email in users))
+    return expense, user_ids[paid_by], member_ids, splits.split_amounts(amount, splits.EQUAL, len(member_ids))
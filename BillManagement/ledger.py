@@ -0,0 +1,247 @@
+"""
+Append-only ledger of balance changes with periodic balance snapshots.
+
+Every expense split, payment and settlement appends ledger entries next to its update of the
+``Balance`` table. A group's balances are its latest snapshot plus the entries recorded after
+it, and the whole ``Balance`` table can be rebuilt by replaying the ledger.
+"""
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from BillManagement import caching, models
+
+CHUNK_SIZE = 10000  # Ledger entries replayed per query when rebuilding balances
+WORKERS = 4  # Chunks replayed in parallel when rebuilding balances
+
+
+def record(entries, kind):
+    """
+    Appends balance changes to the ledger.
+
+    Args:
+        entries (iterable): ``(user_a_id, user_b_id, group_id, expense_id, amount)`` tuples in
+            the canonical pair order of ``Balance``.
+        kind (str): One of the ``LedgerEntry`` kinds.
+    """
+    models.LedgerEntry.objects.bulk_create([
+        models.LedgerEntry(kind=kind, user_a_id=user_a_id, user_b_id=user_b_id, group_id=group_id,
+                           expense_id=expense_id, amount=amount)
+        for user_a_id, user_b_id, group_id, expense_id, amount in entries
+    ])
+
+
+def _entries(group_id):
+    """Returns the ledger entries a group's balances are made of, every entry for the overall ones."""
+    if group_id is None:
+        return models.LedgerEntry.objects.all()
+    return models.LedgerEntry.objects.filter(group_id=group_id)
+
+
+def snapshots_queryset(group_id, upto_id=None):
+    """
+    Returns the snapshots of a group's balances, latest first.
+
+    Args:
+        group_id (UUID): The group, or ``None`` for the overall balances.
+        upto_id (int): Only include snapshots taken up to this entry.
+    """
+    snapshots = models.BalanceSnapshot.objects.filter(group_id=group_id)
+    if upto_id is not None:
+        snapshots = snapshots.filter(last_entry_id__lte=upto_id)
+    return snapshots.order_by('-last_entry_id')
+
+
+def tail_totals_queryset(group_id, after_id=None, upto_id=None):
+    """
+    Returns the sums per pair of users of a group's ledger entries in a range of ids.
+
+    Args:
+        group_id (UUID): The group, or ``None`` for every entry.
+        after_id (int): Only include entries after this one, e.g. the last one of a snapshot.
+        upto_id (int): Only include entries up to this one.
+
+    Returns:
+        QuerySet: ``(user_a_id, user_b_id, total)`` tuples.
+    """
+    tail = _entries(group_id)
+    if after_id is not None:
+        tail = tail.filter(id__gt=after_id)
+    if upto_id is not None:
+        tail = tail.filter(id__lte=upto_id)
+    return tail.values_list('user_a_id', 'user_b_id').annotate(
+        total=Sum('amount')).values_list('user_a_id', 'user_b_id', 'total').order_by()
+
+
+def balances(group_id=None, upto_id=None):
+    """
+    Computes balances from the latest snapshot and the ledger entries recorded after it.
+
+    Args:
+        group_id (UUID): The group, or ``None`` for the overall balances.
+        upto_id (int): Only include entries up to this one. Defaults to the whole ledger.
+
+    Returns:
+        dict: Non-zero amounts keyed by ``(user_a_id, user_b_id)``.
+    """
+    totals = defaultdict(int)
+    snapshot = snapshots_queryset(group_id, upto_id).first()
+    after_id = None
+    if snapshot is not None:
+        for user_a_id, user_b_id, amount in snapshot.balances:
+            totals[(uuid.UUID(user_a_id), uuid.UUID(user_b_id))] = amount
+        after_id = snapshot.last_entry_id
+    for user_a_id, user_b_id, amount in tail_totals_queryset(group_id, after_id, upto_id):
+        totals[(user_a_id, user_b_id)] += amount
+    return {pair: amount for pair, amount in totals.items() if amount}
+
+
+def _snapshot(group_id, last_entry_id, totals):
+    return models.BalanceSnapshot(group_id=group_id, last_entry_id=last_entry_id, balances=[
+        [str(user_a_id), str(user_b_id), amount] for (user_a_id, user_b_id), amount in totals.items() if amount
+    ])
+
+
+def take_snapshots(min_entries=None):
+    """
+    Snapshots the balances of the groups with many ledger entries since their last snapshot.
+
+    Entries younger than ``LEDGER_SNAPSHOT_LAG_SECONDS`` are left for the next snapshot, so a
+    transaction still in flight when the snapshot is taken cannot slip behind it.
+
+    Args:
+        min_entries (int): Entries needed since the last snapshot. Defaults to
+            ``LEDGER_SNAPSHOT_MIN_ENTRIES``.
+
+    Returns:
+        int: The number of snapshots stored.
+    """
+    if min_entries is None:
+        min_entries = settings.LEDGER_SNAPSHOT_MIN_ENTRIES
+    cutoff = timezone.now() - timedelta(seconds=settings.LEDGER_SNAPSHOT_LAG_SECONDS)
+    upto_id = models.LedgerEntry.objects.filter(created_at__lte=cutoff).aggregate(last=Max('id'))['last']
+    if upto_id is None:
+        return 0
+
+    last_snapshot = models.BalanceSnapshot.objects.filter(group_id=OuterRef('pk')).order_by(
+        '-last_entry_id').values('last_entry_id')[:1]
+    group_ids = list(models.Group.objects.annotate(last_entry_id=Coalesce(Subquery(last_snapshot), 0)).annotate(
+        new_entries=Count('ledger_entries', filter=Q(ledger_entries__id__gt=F('last_entry_id'),
+                                                     ledger_entries__id__lte=upto_id))
+    ).filter(new_entries__gte=min_entries).values_list('pk', flat=True))
+    overall = snapshots_queryset(None).first()
+    if models.LedgerEntry.objects.filter(
+            id__gt=overall.last_entry_id if overall else 0, id__lte=upto_id).count() >= min_entries:
+        group_ids.append(None)
+
+    snapshots = [_snapshot(group_id, upto_id, balances(group_id, upto_id)) for group_id in group_ids]
+    models.BalanceSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+
+def _replay_chunk(bounds):
+    """Sums the ledger entries with ids in ``[start, end)`` per pair and group."""
+    start, end = bounds
+    return list(models.LedgerEntry.objects.filter(id__gte=start, id__lt=end).values_list(
+        'user_a_id', 'user_b_id', 'group_id').annotate(total=Sum('amount')).values_list(
+        'user_a_id', 'user_b_id', 'group_id', 'total').order_by())
+
+
+def _add_rows(totals, rows):
+    """Adds summed ledger rows to the balances of their group and to the overall balances."""
+    for user_a_id, user_b_id, group_id, amount in rows:
+        totals[(user_a_id, user_b_id, group_id)] += amount
+        if group_id is not None:
+            totals[(user_a_id, user_b_id, None)] += amount
+
+
+def _replay_chunk_in_thread(bounds):
+    try:
+        return _replay_chunk(bounds)
+    finally:
+        # Each worker thread opened its own connection
+        connection.close()
+
+
+def replay(chunk_size=CHUNK_SIZE, workers=WORKERS):
+    """
+    Replays the whole ledger, summing chunks of entries in parallel.
+
+    Args:
+        chunk_size (int): Ledger entries per chunk.
+        workers (int): Chunks summed at the same time, each on its own database connection.
+
+    Returns:
+        tuple: The balances keyed by ``(user_a_id, user_b_id, group_id)``, with ``group_id``
+        ``None`` for the overall balances, the id of the last entry replayed and the number
+        of chunks.
+    """
+    bounds = models.LedgerEntry.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is None:
+        return {}, 0, 0
+    chunks = [(start, min(start + chunk_size, bounds['last'] + 1))
+              for start in range(bounds['first'], bounds['last'] + 1, chunk_size)]
+
+    totals = defaultdict(int)
+    with ThreadPoolExecutor(workers) as executor:
+        results = executor.map(_replay_chunk_in_thread, chunks) if workers > 1 else map(_replay_chunk, chunks)
+        for rows in results:
+            _add_rows(totals, rows)
+    return totals, bounds['last'], len(chunks)
+
+
+def rebuild_balances(chunk_size=CHUNK_SIZE, workers=WORKERS, dry_run=False):
+    """
+    Rebuilds the ``Balance`` table from the ledger and snapshots every group at the end of it.
+
+    The ledger is replayed without locks, then the balance rows are locked and the entries
+    written in the meantime are replayed as well, so no write committed before the lock is lost.
+    Writes should still be paused while it runs, for instance with maintenance mode on: a write
+    that only creates new balance rows is not held back by the lock.
+
+    Args:
+        chunk_size (int): Ledger entries per replayed chunk.
+        workers (int): Chunks replayed in parallel.
+        dry_run (bool): Only report how many balances differ from the ledger.
+
+    Returns:
+        dict: ``chunks`` replayed, ``last_entry_id`` and the number of ``corrected`` balances.
+    """
+    totals, last_entry_id, chunks = replay(chunk_size, workers)
+
+    with transaction.atomic():
+        # Writers holding a balance row commit before the lock is granted, their entries are in the tail
+        list(models.Balance.objects.select_for_update().values_list('pk', flat=True))
+        tail_last_id = models.LedgerEntry.objects.aggregate(last=Max('id'))['last'] or 0
+        if tail_last_id > last_entry_id:
+            _add_rows(totals, _replay_chunk((last_entry_id + 1, tail_last_id + 1)))
+            last_entry_id = tail_last_id
+        by_group = defaultdict(dict)
+        for (user_a_id, user_b_id, group_id), amount in totals.items():
+            by_group[group_id][(user_a_id, user_b_id)] = amount
+
+        to_update = []
+        for balance in models.Balance.objects.select_for_update().iterator():
+            amount = totals.pop((balance.user_a_id, balance.user_b_id, balance.group_id), 0)
+            if balance.amount != amount:
+                balance.amount = amount
+                to_update.append(balance)
+        to_create = [
+            models.Balance(user_a_id=user_a_id, user_b_id=user_b_id, group_id=group_id, amount=amount)
+            for (user_a_id, user_b_id, group_id), amount in totals.items() if amount
+        ]
+        if not dry_run:
+            models.Balance.objects.bulk_update(to_update, ['amount'], batch_size=1000)
+            models.Balance.objects.bulk_create(to_create, batch_size=1000)
+            models.BalanceSnapshot.objects.bulk_create(
+                [_snapshot(group_id, last_entry_id, group_totals) for group_id, group_totals in by_group.items()],
+                batch_size=100)
+            changed = to_update + to_create
+            caching.invalidate(caching.USER, {user_id for row in changed for user_id in (row.user_a_id, row.user_b_id)})
+            caching.invalidate(caching.GROUP, {row.group_id for row in changed})
+    return {'chunks': chunks, 'last_entry_id': last_entry_id, 'corrected': len(to_update) + len(to_create)}
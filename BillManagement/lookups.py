@@ -0,0 +1,182 @@
+"""
+Lookups of users and groups by their natural keys.
+
+Inside ``shared_lookups()`` every user and group is loaded at most once, so the operations of a
+batch request that refer to the same user or group share a single query. Lists of emails are
+resolved together with one ``IN`` query instead of one query per email.
+"""
+import contextlib
+import contextvars
+from collections import defaultdict
+from BillManagement import models
+from user.models import UserInfo as UserProfile
+
+_shared = contextvars.ContextVar('shared_lookups', default=None)
+
+
+class UnknownEmails(Exception):
+    """
+    Raised when some of the emails passed to ``resolve_emails`` belong to no user.
+    """
+    def __init__(self, emails):
+        self.emails = sorted(emails, key=str)
+        super().__init__(f'Users with emails {", ".join(map(str, self.emails))} do not exist')
+
+
+class InvalidEmails(ValueError):
+    """
+    Raised when a list of emails is not a list of strings.
+    """
+
+
+@contextlib.contextmanager
+def shared_lookups():
+    """
+    Context manager sharing the users and groups loaded inside it.
+    """
+    token = _shared.set({})
+    try:
+        yield
+    finally:
+        _shared.reset(token)
+
+
+def forget():
+    """
+    Drops the shared users and groups, e.g. after an operation that may have changed them.
+    """
+    shared = _shared.get()
+    if shared is not None:
+        shared.clear()
+
+
+def _lookup(key, load):
+    shared = _shared.get()
+    if shared is None:
+        return load()
+    if key not in shared:
+        shared[key] = load()
+    return shared[key]
+
+
+async def _alookup(key, load):
+    shared = _shared.get()
+    if shared is None:
+        return await load()
+    if key not in shared:
+        shared[key] = await load()
+    return shared[key]
+
+
+def profile_queryset(email):
+    """
+    Returns the query matching the profile of the user with the given email.
+    """
+    return UserProfile.objects.filter(user__email=email)
+
+
+def profiles_queryset(emails):
+    """
+    Returns the query matching the profiles of the users with any of the given emails.
+    """
+    return UserProfile.objects.filter(user__email__in=emails)
+
+
+def group_queryset(group_name):
+    """
+    Returns the query matching the group with the given name.
+    """
+    return models.Group.objects.filter(group_name=group_name)
+
+
+def expense_queryset(expense_name):
+    """
+    Returns the query matching the expense with the given name.
+    """
+    return models.Expense.objects.filter(name=expense_name)
+
+
+def get_profile(email):
+    """
+    Returns the profile of the user with the given email.
+
+    Raises:
+        UserProfile.DoesNotExist: If there is no such user.
+    """
+    return _lookup(('profile', email), lambda: profile_queryset(email).get())
+
+
+def get_group(group_name):
+    """
+    Returns the group with the given name.
+
+    Raises:
+        Group.DoesNotExist: If there is no such group.
+    """
+    return _lookup(('group', group_name), lambda: group_queryset(group_name).get())
+
+
+async def aget_profile(email):
+    """
+    Async version of :func:`get_profile`.
+    """
+    return await _alookup(('profile', email), lambda: profile_queryset(email).aget())
+
+
+async def aget_group(group_name):
+    """
+    Async version of :func:`get_group`.
+    """
+    return await _alookup(('group', group_name), lambda: group_queryset(group_name).aget())
+
+
+def check_emails(emails):
+    """
+    Checks that request data meant as a list of emails is one.
+
+    Args:
+        emails: The value read from the request.
+
+    Returns:
+        list: The emails.
+
+    Raises:
+        InvalidEmails: If the value is not a list or one of its entries is not a string.
+    """
+    if not isinstance(emails, (list, tuple, set)) or not all(isinstance(email, str) for email in emails):
+        raise InvalidEmails('Emails must be a list of strings')
+    return list(emails)
+
+
+def resolve_emails(emails, strict=True):
+    """
+    Resolves user emails to profile ids with a single query.
+
+    Args:
+        emails (iterable): The emails to resolve; duplicates are resolved once.
+        strict (bool): Raise if any email is unknown instead of leaving it out of the result.
+
+    Returns:
+        dict: Profile ids keyed by email.
+
+    Raises:
+        InvalidEmails: If an email is not a string.
+        UnknownEmails: In strict mode, listing every unknown email at once.
+    """
+    emails = set(check_emails(emails))
+    shared = _shared.get()
+    if shared is None:
+        shared = {}
+    resolved = {email: shared[('profile_id', email)] for email in emails if ('profile_id', email) in shared}
+    pending = emails - resolved.keys()
+    if pending:
+        # Map matches back to the requested spelling, databases may compare emails case-insensitively
+        requested = defaultdict(list)
+        for email in pending:
+            requested[str(email).lower()].append(email)
+        for db_email, profile_id in profiles_queryset(pending).values_list('user__email', 'id'):
+            for email in requested.get(db_email.lower(), ()):
+                resolved[email] = shared[('profile_id', email)] = profile_id
+    if strict and len(resolved) < len(emails):
+        raise UnknownEmails(emails - resolved.keys())
+    return resolved
@@ -0,0 +1,93 @@
+import re
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.test import RequestFactory
+from django.utils import timezone
+from BillManagement import balances, ledger, lookups, models, pagination, payments, reads
+from user.models import OTPModel, UserInfo as UserProfile
+
+# Plan fragments that reveal a full table scan, per database vendor
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING\b)\S+'),
+    'mysql': re.compile(r'"access_type": "ALL"'),
+    'postgresql': re.compile(r'\bSeq Scan\b'),
+}
+EXPLAIN_FORMATS = {
+    'mysql': 'JSON',
+}
+
+
+def page(queryset, ordering, cursor_values):
+    """
+    Returns the queryset of a page after the given cursor, as ``pagination.paginate`` runs it.
+    """
+    request = RequestFactory().get('/', {'cursor': pagination.encode_cursor(cursor_values)})
+    return pagination.page_queryset(request, queryset, ordering)[0]
+
+
+def endpoint_queries():
+    """
+    Builds the querysets each endpoint runs, using placeholder lookup values.
+
+    The querysets come from the same functions the views call, so the audit follows the views
+    when their queries change.
+
+    Returns:
+        list: ``(endpoint, label, queryset)`` tuples.
+    """
+    user = UserProfile(id=uuid.uuid4())
+    group = models.Group(id=uuid.uuid4())
+    expense = models.Expense(transaction_id=uuid.uuid4())
+    email = 'explain@example.com'
+    return [
+        ('groups/members/', 'group by name', lookups.group_queryset('explain')),
+        ('groups/members/', 'members page', page(reads.members_queryset(group), reads.MEMBERS_ORDERING,
+                                                 [str(uuid.uuid4())])),
+        ('groups/add_user/', 'membership check', group.memberships([user.id])),
+        ('groups/details/', 'unpaid expenses page', page(reads.details_queryset(group), reads.DETAILS_ORDERING,
+                                                         [timezone.now(), str(uuid.uuid4())])),
+        ('groups/details/', 'repayments prefetch', reads.repayments_queryset().filter(
+            expense__in=[expense.pk])),
+        ('groups/settle/', 'group balances', balances.group_balances(group)),
+        ('users/details/', 'user by email', lookups.profile_queryset(email)),
+        ('users/details/', 'balances page', page(balances.user_balances(user), reads.BALANCES_ORDERING, [0])),
+        ('expenses/create/', 'expense name check', lookups.expense_queryset('explain')),
+        ('expenses/create/', 'users by email', lookups.profiles_queryset([email])),
+        ('expenses/record_payment/', 'repayment match', payments.matching_repayments(
+            expense, user.id, uuid.uuid4())),
+        ('snapshot_balances', 'latest group snapshot', ledger.snapshots_queryset(group.id)[:1]),
+        ('snapshot_balances', 'group ledger tail', ledger.tail_totals_queryset(group.id, 0)),
+        ('generate-otp/', 'otp by email', OTPModel.objects.filter(email=email)),
+    ]
+
+
+class Command(BaseCommand):
+    """
+    Management command that runs EXPLAIN on the queries of every endpoint.
+    """
+    help = 'Runs EXPLAIN on each endpoint\'s queries against the configured database and flags full scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to explain against.')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not only flagged ones.')
+        parser.add_argument('--fail-on-scan', action='store_true', help='Exit with an error if any full scan is found.')
+
+    def handle(self, *args, **options):
+        vendor = connections[options['database']].vendor
+        pattern = FULL_SCAN_PATTERNS.get(vendor)
+        if pattern is None:
+            raise CommandError(f'Full scan detection is not supported for {vendor}.')
+
+        flagged = 0
+        for endpoint, label, queryset in endpoint_queries():
+            plan = queryset.using(options['database']).explain(format=EXPLAIN_FORMATS.get(vendor))
+            full_scan = bool(pattern.search(plan))
+            flagged += full_scan
+            status = self.style.ERROR('FULL SCAN') if full_scan else self.style.SUCCESS('ok')
+            self.stdout.write(f'{endpoint:<28} {label:<24} {status}')
+            if full_scan or options['verbose_plans']:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+
+        if flagged and options['fail_on_scan']:
+            raise CommandError(f'{flagged} queries use a full table scan.')
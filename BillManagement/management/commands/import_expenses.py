@@ -0,0 +1,31 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from BillManagement import importer
+
+
+class Command(BaseCommand):
+    """
+    Management command that imports expenses from a CSV or JSONL file.
+    """
+    help = 'Imports expenses from a CSV or JSONL file in bulk, reporting invalid rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import.')
+        parser.add_argument('--format', choices=importer.FORMATS,
+                            help='File format, guessed from the file extension by default.')
+        parser.add_argument('--chunk-size', type=int, default=importer.CHUNK_SIZE,
+                            help='Number of rows written per transaction.')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if file_format not in importer.FORMATS:
+            raise CommandError(f'Cannot guess the format of {options["path"]}, use --format.')
+
+        with open(options['path'], newline='', encoding='utf-8') as stream:
+            summary = importer.import_expenses(importer.read_rows(stream, file_format), options['chunk_size'])
+
+        for error in summary['errors']:
+            self.stderr.write(f'Row {error["row"]}: {error["error"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {summary["created"]} expenses, {summary["failed"]} rows failed.'
+        ))
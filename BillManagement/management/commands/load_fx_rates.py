@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from BillManagement import fx
+
+
+class Command(BaseCommand):
+    """
+    Management command that loads exchange rates from a local CSV file.
+
+    Run it whenever new rates are published; processes pick them up on their next conversion.
+    """
+    help = 'Loads exchange rates against BASE_CURRENCY from a CSV file with date, currency and rate columns.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to load.')
+
+    def handle(self, *args, **options):
+        with open(options['path'], newline='', encoding='utf-8') as stream:
+            try:
+                loaded = fx.load_rates(stream)
+            except ValueError as e:
+                raise CommandError(str(e))
+        self.stdout.write(f'Loaded {loaded} exchange rates.')
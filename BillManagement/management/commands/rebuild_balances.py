@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from BillManagement import ledger
+
+
+class Command(BaseCommand):
+    """
+    Management command that rebuilds the stored balances by replaying the ledger.
+
+    Pause writes while it runs, for instance by turning maintenance mode on.
+    """
+    help = 'Rebuilds the Balance table from the ledger, replaying chunks of entries in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=ledger.CHUNK_SIZE,
+                            help='Number of ledger entries replayed per query.')
+        parser.add_argument('--workers', type=int, default=ledger.WORKERS,
+                            help='Number of chunks replayed in parallel.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the balances that differ from the ledger.')
+
+    def handle(self, *args, **options):
+        summary = ledger.rebuild_balances(options['chunk_size'], options['workers'], options['dry_run'])
+        verb = 'would be corrected' if options['dry_run'] else 'corrected'
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed the ledger up to entry {summary["last_entry_id"]} in {summary["chunks"]} chunks, '
+            f'{summary["corrected"]} balances {verb}.'
+        ))
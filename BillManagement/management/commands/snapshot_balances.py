@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from BillManagement import ledger
+
+
+class Command(BaseCommand):
+    """
+    Management command that snapshots the balances of groups with many new ledger entries.
+
+    Run it periodically from cron; snapshots keep the ledger tail replayed per balance short.
+    """
+    help = 'Snapshots the balances of groups with at least LEDGER_SNAPSHOT_MIN_ENTRIES new ledger entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-entries', type=int,
+                            help='New ledger entries needed, defaults to LEDGER_SNAPSHOT_MIN_ENTRIES.')
+
+    def handle(self, *args, **options):
+        stored = ledger.take_snapshots(options['min_entries'])
+        self.stdout.write(f'Stored {stored} balance snapshots.')
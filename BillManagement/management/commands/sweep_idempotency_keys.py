@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from BillManagement.idempotency import sweep_expired_keys
+
+
+class Command(BaseCommand):
+    """
+    Management command that deletes expired idempotency keys.
+
+    Run it periodically from cron; keys are only needed for as long as clients retry.
+    """
+    help = 'Deletes idempotency keys older than IDEMPOTENCY_KEY_TTL.'
+
+    def handle(self, *args, **options):
+        deleted = sweep_expired_keys()
+        self.stdout.write(f'Deleted {deleted} expired idempotency keys.')
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:35
+
+import django.db.models.deletion
+from collections import defaultdict
+from django.db import migrations, models
+
+
+def backfill_balances(apps, schema_editor):
+    """Builds the balance rows from the existing debts."""
+    Debt = apps.get_model('BillManagement', 'Debt')
+    Expense = apps.get_model('BillManagement', 'Expense')
+    Balance = apps.get_model('BillManagement', 'Balance')
+
+    debt_groups = dict(
+        Expense.repayments.through.objects.filter(expense__expense_group__isnull=False)
+        .values_list('debt_id', 'expense__expense_group_id')
+    )
+    deltas = defaultdict(int)
+    for debt_id, from_user_id, to_user_id, amount in Debt.objects.values_list(
+            'id', 'from_user_id', 'to_user_id', 'amount').iterator():
+        if from_user_id == to_user_id or not amount:
+            continue
+        if from_user_id < to_user_id:
+            key, delta = (from_user_id, to_user_id), amount
+        else:
+            key, delta = (to_user_id, from_user_id), -amount
+        deltas[key + (None,)] += delta
+        if debt_id in debt_groups:
+            deltas[key + (debt_groups[debt_id],)] += delta
+
+    Balance.objects.bulk_create([
+        Balance(user_a_id=user_a_id, user_b_id=user_b_id, group_id=group_id, amount=amount)
+        for (user_a_id, user_b_id, group_id), amount in deltas.items() if amount
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BillManagement', '0001_initial'),
+        ('user', '0003_remove_user_is_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Balance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(default=0)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='BillManagement.group')),
+                ('user_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances_as_a', to='user.userinfo')),
+                ('user_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances_as_b', to='user.userinfo')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user_a', 'user_b', 'group'), name='unique_group_balance'), models.UniqueConstraint(condition=models.Q(('group__isnull', True)), fields=('user_a', 'user_b'), name='unique_overall_balance')],
+            },
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def clear_orphaned_expense_groups(apps, schema_editor):
+    """Detaches expenses whose group was deleted before the foreign key was enforced."""
+    Expense = apps.get_model('BillManagement', 'Expense')
+    Group = apps.get_model('BillManagement', 'Group')
+    Expense.objects.exclude(expense_group_id__isnull=True).exclude(
+        expense_group_id__in=Group.objects.values('id')).update(expense_group_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BillManagement', '0002_balance'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_orphaned_expense_groups, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='expense',
+            name='expense_group',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='BillManagement.group'),
+        ),
+        migrations.AddIndex(
+            model_name='balance',
+            index=models.Index(fields=['user_b', 'group'], name='balance_user_b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='debt',
+            index=models.Index(fields=['from_user', 'to_user'], name='debt_pair_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['expense_group', 'payment', 'date', 'transaction_id'], name='expense_group_unpaid_idx'),
+        ),
+    ]
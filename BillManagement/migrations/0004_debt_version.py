@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BillManagement', '0003_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='debt',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
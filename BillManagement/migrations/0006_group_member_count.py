@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:53
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_members(apps, schema_editor):
+    """Fills in the member count of the existing groups."""
+    Group = apps.get_model('BillManagement', 'Group')
+    members = Group.members.through.objects.filter(group_id=OuterRef('pk')).order_by().values(
+        'group_id').annotate(count=Count('pk')).values('count')
+    Group.objects.update(member_count=Coalesce(Subquery(members), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BillManagement', '0005_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_members, migrations.RunPython.noop),
+    ]
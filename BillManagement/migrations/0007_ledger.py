@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:09
+
+import django.db.models.deletion
+from collections import defaultdict
+from django.db import migrations, models
+
+
+def record_opening_balances(apps, schema_editor):
+    """Opens the ledger with one entry per existing balance, so replaying it gives the current balances."""
+    Balance = apps.get_model('BillManagement', 'Balance')
+    LedgerEntry = apps.get_model('BillManagement', 'LedgerEntry')
+    entries = []
+    ungrouped = defaultdict(int)
+    for user_a_id, user_b_id, group_id, amount in Balance.objects.exclude(amount=0).values_list(
+            'user_a_id', 'user_b_id', 'group_id', 'amount').iterator():
+        if group_id is None:
+            ungrouped[(user_a_id, user_b_id)] += amount
+        else:
+            entries.append(LedgerEntry(kind='opening', user_a_id=user_a_id, user_b_id=user_b_id, group_id=group_id,
+                                       amount=amount))
+            # The overall balance already includes the group balances
+            ungrouped[(user_a_id, user_b_id)] -= amount
+    entries.extend(
+        LedgerEntry(kind='opening', user_a_id=user_a_id, user_b_id=user_b_id, amount=amount)
+        for (user_a_id, user_b_id), amount in ungrouped.items() if amount
+    )
+    LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BillManagement', '0006_group_member_count'),
+        ('user', '0003_remove_user_is_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_entry_id', models.BigIntegerField()),
+                ('balances', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='BillManagement.group')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['group', '-last_entry_id'], name='snapshot_group_latest_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('opening', 'Opening balance'), ('expense', 'Expense split'), ('payment', 'Payment'), ('settlement', 'Settlement')], max_length=16)),
+                ('amount', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('expense', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='BillManagement.expense')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='BillManagement.group')),
+                ('user_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='user.userinfo')),
+                ('user_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='user.userinfo')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['group', 'id'], name='ledger_group_tail_idx')],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:17
+
+import BillManagement.money
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BillManagement', '0007_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='debt',
+            name='currency',
+            field=models.CharField(default=BillManagement.money.default_currency, max_length=3),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='currency',
+            field=models.CharField(default=BillManagement.money.default_currency, max_length=3),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='currency',
+            field=models.CharField(default=BillManagement.money.default_currency, max_length=3),
+        ),
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=10, max_digits=24)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('currency', 'date'), name='unique_exchange_rate')],
+            },
+        ),
+    ]
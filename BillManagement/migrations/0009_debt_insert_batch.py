@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BillManagement', '0008_money'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='debt',
+            name='insert_batch',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
@@ -1,32 +1,175 @@
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 import uuid
+from BillManagement import caching, events, money
 from user.models import UserInfo as UserProfile  # Assuming UserProfile is defined in the user app
 
 
+class DebtManager(models.Manager):
+    """
+    Manager for the Debt model.
+    """
+    def bulk_create_with_pks(self, debts, batch_size=None):
+        """
+        Bulk inserts debts and makes sure each one gets its primary key.
+
+        Backends that cannot return primary keys from a bulk insert (MySQL) tag the rows with
+        a batch marker and read the keys back with one query, in insertion order, so the
+        returned debts can always be used in relations.
+
+        Args:
+            debts (list): Unsaved Debt instances.
+            batch_size (int): Number of debts per insert statement.
+
+        Returns:
+            list: The saved Debt instances.
+        """
+        if connections[self.db].features.can_return_rows_from_bulk_insert or not debts:
+            return self.bulk_create(debts, batch_size=batch_size)
+        marker = uuid.uuid4()
+        for debt in debts:
+            debt.insert_batch = marker
+        self.bulk_create(debts, batch_size=batch_size)
+        # Auto-increment keys grow in insertion order within the transaction
+        pks = self.filter(insert_batch=marker).order_by('pk').values_list('pk', flat=True)
+        for debt, pk in zip(debts, pks):
+            debt.pk = pk
+        return debts
+
+
 class Debt(models.Model):
     """
     Model representing a debt between two users.
     """
     from_user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='from_user')  # User who lent the money
     to_user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='to_user')  # User who owes the money
-    amount = models.IntegerField()  # The amount of money owed
+    amount = models.IntegerField()  # The amount of money owed, in minor units of currency
+    currency = models.CharField(max_length=3, default=money.default_currency)  # ISO 4217 code of the amount
+    version = models.PositiveIntegerField(default=0)  # Incremented on every payment, guards against lost updates
+    insert_batch = models.UUIDField(null=True, blank=True, editable=False, db_index=True)  # Bulk insert the row came from, on backends that cannot return its key
+    objects = DebtManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['from_user', 'to_user'], name='debt_pair_idx'),  # Repayment matching
+        ]
 
     def __str__(self):
         return f'{self.to_user.name} owes {self.amount} to {self.from_user.name}'  # String representation of the debt
 
+    @property
+    def money(self):
+        return money.Money(self.amount, self.currency)
+
+
+class GroupManager(models.Manager):
+    """
+    Manager for the Group model.
+    """
+    def refresh_member_counts(self, group_ids):
+        """
+        Recounts the members of the given groups with a single UPDATE.
+
+        Args:
+            group_ids (iterable): The groups to recount.
+        """
+        members = Group.members.through.objects.filter(group_id=OuterRef('pk')).order_by().values(
+            'group_id').annotate(count=Count('pk')).values('count')
+        self.filter(pk__in=group_ids).update(member_count=Coalesce(Subquery(members), 0))
+
 
 class Group(models.Model):
     """
     Model representing a group of users and their associated debts.
+
+    Membership changes made through ``add_members`` and ``remove_members`` touch only the
+    affected rows of the membership table, whatever the size of the group.
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  # Unique UUID for the group
     group_name = models.CharField(max_length=255, unique=True)  # Name of the group
     debts = models.ManyToManyField(Debt, null=True)  # Many-to-many relationship with Debt model
     members = models.ManyToManyField(UserProfile)  # Many-to-many relationship with UserProfile model
+    member_count = models.PositiveIntegerField(default=0)  # Number of members, kept in sync with members
+    currency = models.CharField(max_length=3, default=money.default_currency)  # Default currency of expenses and settlements
+    objects = GroupManager()
 
     def __str__(self):
         return self.group_name  # String representation of the group
 
+    def memberships(self, user_ids):
+        """
+        Returns the membership rows of the given users in the group.
+
+        Args:
+            user_ids (iterable): The users to look up.
+
+        Returns:
+            QuerySet: Rows of the members through table.
+        """
+        return Group.members.through.objects.filter(group_id=self.pk, userinfo_id__in=set(user_ids))
+
+    def has_member(self, user_id):
+        """
+        Checks whether a user is a member without loading the member list.
+
+        Args:
+            user_id (UUID): The user to check.
+
+        Returns:
+            bool: True if the user is a member of the group.
+        """
+        return self.memberships([user_id]).exists()
+
+    def add_members(self, user_ids):
+        """
+        Adds users to the group in a constant number of queries.
+
+        Args:
+            user_ids (iterable): The users to add; current members are skipped.
+
+        Returns:
+            set: The ids of the users that were added.
+        """
+        through = Group.members.through
+        user_ids = set(user_ids)
+        with transaction.atomic():
+            # Serializes concurrent membership changes so member_count stays exact
+            list(Group.objects.select_for_update().filter(pk=self.pk).values_list('pk'))
+            existing = set(self.memberships(user_ids).values_list('userinfo_id', flat=True))
+            added = user_ids - existing
+            if added:
+                through.objects.bulk_create([through(group_id=self.pk, userinfo_id=user_id) for user_id in added])
+                Group.objects.filter(pk=self.pk).update(member_count=F('member_count') + len(added))
+                caching.invalidate(caching.GROUP, [self.pk])
+                events.publish(events.MEMBERS_ADDED, {'group': self.pk, 'members': list(added)},
+                               group_ids=[self.pk], user_ids=added)
+        return added
+
+    def remove_members(self, user_ids):
+        """
+        Removes users from the group in a constant number of queries.
+
+        Args:
+            user_ids (iterable): The users to remove; users who are not members are ignored.
+
+        Returns:
+            int: The number of users removed.
+        """
+        with transaction.atomic():
+            list(Group.objects.select_for_update().filter(pk=self.pk).values_list('pk'))
+            memberships = self.memberships(user_ids)
+            removed_ids = list(memberships.values_list('userinfo_id', flat=True))
+            removed, _ = memberships.delete()
+            if removed:
+                Group.objects.filter(pk=self.pk).update(member_count=F('member_count') - removed)
+                caching.invalidate(caching.GROUP, [self.pk])
+                events.publish(events.MEMBERS_REMOVED, {'group': self.pk, 'members': removed_ids},
+                               group_ids=[self.pk], user_ids=removed_ids)
+        return removed
+
 
 class ExpenseUser(models.Model):
     """
@@ -47,14 +190,156 @@ class Expense(models.Model):
     Model representing an expense and its details.
     """
     name = models.CharField(max_length=255, unique=True)  # Name of the expense
-    expense_group = models.ForeignKey(Group, on_delete=models.DO_NOTHING, null=True, db_constraint=False)  # Group associated with the expense
+    expense_group = models.ForeignKey(Group, on_delete=models.SET_NULL, null=True)  # Group associated with the expense
     description = models.CharField(max_length=255)  # Description of the expense
     payment = models.BooleanField(default=False)  # Whether the expense is fully paid
-    amount = models.IntegerField()  # Total amount of the expense
+    amount = models.IntegerField()  # Total amount of the expense, in minor units of currency
+    currency = models.CharField(max_length=3, default=money.default_currency)  # ISO 4217 code of the amount and shares
     date = models.DateTimeField(auto_now_add=True)  # Date when the expense was created
     repayments = models.ManyToManyField(Debt)  # Many-to-many relationship with Debt model
     users = models.ManyToManyField(ExpenseUser)  # Many-to-many relationship with ExpenseUser model
     transaction_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  # Unique transaction ID for the expense
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['expense_group', 'payment', 'date', 'transaction_id'],
+                         name='expense_group_unpaid_idx'),  # Group details pages and exports
+        ]
+
     def __str__(self):
         return self.name  # String representation of the expense
+
+    @property
+    def money(self):
+        return money.Money(self.amount, self.currency)
+
+
+class Balance(models.Model):
+    """
+    Model representing the running net balance between two users.
+
+    Each pair is stored once with ``user_a`` holding the smaller primary key. A positive
+    ``amount`` means ``user_b`` owes ``user_a``; a negative one means the opposite.
+    Rows with ``group`` set to ``None`` hold the overall balance across all groups.
+
+    Amounts are kept in ``BASE_CURRENCY``; debts in other currencies are converted at the
+    exchange rate of their expense's date.
+    """
+    user_a = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='balances_as_a')  # Lower-keyed user of the pair
+    user_b = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='balances_as_b')  # Higher-keyed user of the pair
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, null=True, blank=True)  # Group the balance belongs to, if any
+    amount = models.IntegerField(default=0)  # Net amount user_b owes user_a, in minor units of BASE_CURRENCY
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_a', 'user_b', 'group'], name='unique_group_balance'),
+            models.UniqueConstraint(fields=['user_a', 'user_b'], condition=models.Q(group__isnull=True),
+                                    name='unique_overall_balance'),
+        ]
+        indexes = [
+            models.Index(fields=['user_b', 'group'], name='balance_user_b_idx'),  # Summaries where the user is user_b
+        ]
+
+    def __str__(self):
+        return f'{self.user_a_id} / {self.user_b_id}: {self.amount}'  # String representation of the balance
+
+
+class LedgerEntry(models.Model):
+    """
+    Model representing one change to the balance between two users, in an append-only ledger.
+
+    Entries are never updated or deleted by the application: every balance equals the sum of
+    its entries, so :class:`Balance` can be rebuilt from them at any time. The pair is stored
+    like in :class:`Balance`, with a positive ``amount`` meaning ``user_b`` owes ``user_a`` more.
+    """
+    OPENING = 'opening'
+    EXPENSE = 'expense'
+    PAYMENT = 'payment'
+    SETTLEMENT = 'settlement'
+    KINDS = [
+        (OPENING, 'Opening balance'),
+        (EXPENSE, 'Expense split'),
+        (PAYMENT, 'Payment'),
+        (SETTLEMENT, 'Settlement'),
+    ]
+    id = models.BigAutoField(primary_key=True)  # Increasing sequence number, the replay order
+    kind = models.CharField(max_length=16, choices=KINDS)  # What caused the change
+    user_a = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='+')  # Lower-keyed user of the pair
+    user_b = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='+')  # Higher-keyed user of the pair
+    group = models.ForeignKey(Group, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries')  # Group of the change, if any
+    expense = models.ForeignKey(Expense, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')  # Expense split or paid, if any
+    amount = models.IntegerField()  # Change of the amount user_b owes user_a, in minor units of BASE_CURRENCY
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)  # When the change was recorded
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'id'], name='ledger_group_tail_idx'),  # Replaying a group after a snapshot
+        ]
+
+    def __str__(self):
+        return f'#{self.id} {self.kind} {self.user_a_id} / {self.user_b_id}: {self.amount}'  # String representation of the entry
+
+
+class BalanceSnapshot(models.Model):
+    """
+    Model representing the balances of a group as of a ledger entry.
+
+    A balance is the snapshot's amount plus the ledger entries recorded after it. Snapshots
+    with ``group`` set to ``None`` hold the overall balances across all groups.
+    """
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, null=True, blank=True)  # Group of the balances, if any
+    last_entry_id = models.BigIntegerField()  # Last ledger entry included in the snapshot
+    balances = models.JSONField()  # Non-zero balances as [user_a_id, user_b_id, amount] lists
+    created_at = models.DateTimeField(auto_now_add=True)  # When the snapshot was taken
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', '-last_entry_id'], name='snapshot_group_latest_idx'),  # Latest snapshot of a group
+        ]
+
+    def __str__(self):
+        return f'{self.group_id} @ {self.last_entry_id}'  # String representation of the snapshot
+
+
+class ExchangeRate(models.Model):
+    """
+    Model representing the exchange rate of a currency on a day, loaded with ``load_fx_rates``.
+
+    Rates are quoted as units of the currency per unit of ``BASE_CURRENCY``. A day without a
+    rate uses the latest earlier one.
+    """
+    currency = models.CharField(max_length=3)  # ISO 4217 code
+    date = models.DateField()  # Day the rate applies from
+    rate = models.DecimalField(max_digits=24, decimal_places=10)  # Units of currency per unit of BASE_CURRENCY
+    revision = models.PositiveBigIntegerField(default=0, db_index=True)  # Load that last stored the rate
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'date'], name='unique_exchange_rate'),
+        ]
+
+    def __str__(self):
+        return f'{self.currency} {self.date}: {self.rate}'  # String representation of the rate
+
+
+class IdempotencyKey(models.Model):
+    """
+    Model storing the outcome of a write request sent with an ``Idempotency-Key`` header.
+
+    A retry with the same key replays the stored response instead of running the view again.
+    Rows older than ``IDEMPOTENCY_KEY_TTL`` are removed by the ``sweep_idempotency_keys`` command.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # User who sent the request
+    key = models.CharField(max_length=255)  # Client supplied Idempotency-Key header
+    request_hash = models.CharField(max_length=64)  # SHA-256 of the method, path and body of the request
+    status_code = models.PositiveSmallIntegerField(null=True)  # Response status, None while the request is running
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)  # Response data replayed to retries
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)  # When the key was first seen
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} / {self.key}: {self.status_code}'  # String representation of the key
@@ -0,0 +1,91 @@
+"""
+Amounts of money as integer minor units of an ISO 4217 currency.
+
+Every amount column stores whole minor units (cents for USD, yen for JPY, fils for KWD) next
+to the currency it is expressed in, so amounts are added and compared exactly and never go
+through floats. ``Money`` pairs the two when an amount leaves the database.
+"""
+from decimal import Decimal, InvalidOperation
+from typing import NamedTuple
+from django.conf import settings
+
+# Digits after the decimal point of the supported ISO 4217 currencies
+MINOR_UNITS = {
+    'AED': 2, 'AUD': 2, 'BHD': 3, 'BRL': 2, 'CAD': 2, 'CHF': 2, 'CLP': 0, 'CNY': 2, 'CZK': 2, 'DKK': 2,
+    'EUR': 2, 'GBP': 2, 'HKD': 2, 'HUF': 2, 'IDR': 2, 'ILS': 2, 'INR': 2, 'ISK': 0, 'JOD': 3, 'JPY': 0,
+    'KRW': 0, 'KWD': 3, 'MXN': 2, 'MYR': 2, 'NOK': 2, 'NZD': 2, 'OMR': 3, 'PHP': 2, 'PLN': 2, 'SAR': 2,
+    'SEK': 2, 'SGD': 2, 'THB': 2, 'TND': 3, 'TRY': 2, 'TWD': 2, 'USD': 2, 'VND': 0, 'ZAR': 2,
+}
+
+
+def default_currency():
+    """Returns the base currency, the default of every currency column."""
+    return settings.BASE_CURRENCY
+
+
+def validate_currency(code):
+    """
+    Normalizes a currency code.
+
+    Args:
+        code (str): An ISO 4217 code, in any case.
+
+    Returns:
+        str: The upper-case code.
+
+    Raises:
+        ValueError: If the currency is not supported.
+    """
+    normalized = code.upper() if isinstance(code, str) else code
+    if normalized not in MINOR_UNITS:
+        raise ValueError(f'Unsupported currency "{code}"')
+    return normalized
+
+
+class Money(NamedTuple):
+    """
+    An amount of money in integer minor units of a currency.
+    """
+    amount: int  # Minor units, e.g. cents
+    currency: str  # ISO 4217 code
+
+    @classmethod
+    def from_major(cls, value, currency):
+        """
+        Builds an amount from major units, e.g. ``Money.from_major('12.34', 'EUR')``.
+
+        Raises:
+            ValueError: If the currency is not supported or the value has more decimals than it allows.
+        """
+        currency = validate_currency(currency)
+        try:
+            minor = Decimal(str(value)).scaleb(MINOR_UNITS[currency])
+        except InvalidOperation:
+            raise ValueError('Amount must be a number')
+        if not minor.is_finite():
+            raise ValueError('Amount must be a number')
+        if minor != minor.to_integral_value():
+            raise ValueError(f'{currency} amounts have at most {MINOR_UNITS[currency]} decimals')
+        return cls(int(minor), currency)
+
+    def to_major(self):
+        """Returns the amount in major units as an exact Decimal."""
+        return Decimal(self.amount).scaleb(-MINOR_UNITS[self.currency])
+
+    def __add__(self, other):
+        self._check_currency(other)
+        return Money(self.amount + other.amount, self.currency)
+
+    def __sub__(self, other):
+        self._check_currency(other)
+        return Money(self.amount - other.amount, self.currency)
+
+    def __neg__(self):
+        return Money(-self.amount, self.currency)
+
+    def __str__(self):
+        return f'{self.to_major():.{MINOR_UNITS[self.currency]}f} {self.currency}'
+
+    def _check_currency(self, other):
+        if not isinstance(other, Money) or other.currency != self.currency:
+            raise ValueError(f'Cannot combine {self.currency} with {other!r}')
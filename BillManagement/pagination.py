@@ -0,0 +1,171 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = 100  # Items returned when the client does not ask for a page size
+MAX_PAGE_SIZE = 1000  # Upper bound for the page_size query parameter
+
+
+def encode_cursor(values):
+    """
+    Encodes the ordering values of the last item of a page into an opaque token.
+
+    Args:
+        values (list): Values of the ordering fields.
+
+    Returns:
+        str: URL-safe cursor token.
+    """
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(token, length):
+    """
+    Decodes a cursor token produced by :func:`encode_cursor`.
+
+    Args:
+        token (str): The cursor token.
+        length (int): Expected number of ordering values.
+
+    Returns:
+        list: The ordering values.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def keyset_filter(ordering, values):
+    """
+    Builds the filter selecting the rows that come after the given ordering values.
+
+    For ordering ``(a, b)`` this is ``a > va OR (a = va AND b > vb)``, which the database
+    answers with an index range scan, so every page costs the same as the first one.
+
+    Args:
+        ordering (tuple): Ascending ordering fields, the last one being unique.
+        values (list): Values of the ordering fields for the last row already returned.
+
+    Returns:
+        Q: The filter.
+    """
+    condition = Q()
+    for index, field in enumerate(ordering):
+        step = Q(**{f'{field}__gt': values[index]})
+        for previous_field, previous_value in zip(ordering[:index], values[:index]):
+            step &= Q(**{previous_field: previous_value})
+        condition |= step
+    return condition
+
+
+def paginate(request, queryset, ordering):
+    """
+    Returns one page of a queryset using keyset pagination.
+
+    The ``cursor`` and ``page_size`` query parameters of the request select the page.
+
+    Args:
+        request (Request): The current request.
+        queryset (QuerySet): The rows to paginate.
+        ordering (tuple): Ascending ordering fields, the last one being unique.
+
+    Returns:
+        tuple: The list of items on the page and the cursor of the next page, or ``None``
+        on the last page.
+
+    Raises:
+        ValueError: If the cursor or page size is invalid.
+    """
+    queryset, page_size = page_queryset(request, queryset, ordering)
+    try:
+        items = list(queryset)
+    except ValidationError:
+        raise ValueError('Invalid cursor')
+    return _page_result(items, page_size, ordering)
+
+
+async def apaginate(request, queryset, ordering):
+    """
+    Async version of :func:`paginate`, evaluating the page with the async ORM.
+    """
+    queryset, page_size = page_queryset(request, queryset, ordering)
+    try:
+        items = [item async for item in queryset]
+    except ValidationError:
+        raise ValueError('Invalid cursor')
+    return _page_result(items, page_size, ordering)
+
+
+def page_queryset(request, queryset, ordering):
+    """
+    Applies the page size and cursor of the request to a queryset without evaluating it.
+
+    Returns:
+        tuple: The queryset of the page, with one extra row, and the page size.
+
+    Raises:
+        ValueError: If the cursor or page size is invalid.
+    """
+    try:
+        page_size = min(int(request.GET.get('page_size', PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        raise ValueError('Invalid page size')
+    if page_size < 1:
+        raise ValueError('Invalid page size')
+
+    queryset = queryset.order_by(*ordering)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        values = _clean_cursor_values(queryset.model, ordering, decode_cursor(cursor, len(ordering)))
+        queryset = queryset.filter(keyset_filter(ordering, values))
+    # One extra row tells whether there is a next page
+    return queryset[:page_size + 1], page_size
+
+
+def _clean_cursor_values(model, ordering, values):
+    """
+    Converts decoded cursor values to the types of their ordering fields.
+
+    Raises:
+        ValueError: If a value does not fit its field.
+    """
+    cleaned = []
+    for field_path, value in zip(ordering, values):
+        if isinstance(value, (list, dict)):
+            raise ValueError('Invalid cursor')
+        field = None
+        for name in field_path.split('__'):
+            field = model._meta.get_field(name)
+            if field.is_relation:
+                model = field.related_model
+        if field.is_relation:
+            field = field.target_field
+        try:
+            cleaned.append(field.to_python(value))
+        except (ValidationError, TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+    return cleaned
+
+
+def _page_result(items, page_size, ordering):
+    """Trims the extra row off a page and builds the cursor of the next page."""
+    if len(items) <= page_size:
+        return items, None
+    items = items[:page_size]
+    last = items[-1]
+    return items, encode_cursor([_field_value(last, field) for field in ordering])
+
+
+def _field_value(item, field):
+    """Reads an ordering field, following ``__`` lookups, from a model instance."""
+    for attribute in field.split('__'):
+        item = getattr(item, attribute)
+    return item
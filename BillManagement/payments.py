@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from BillManagement import balances, caching, events, fx, models
+
+# Times a payment is retried when a concurrent payment changed its repayment first
+MAX_ATTEMPTS = 5
+
+
+class PaymentConflict(Exception):
+    """
+    Raised when concurrent payments kept changing a repayment until the retries ran out.
+    """
+
+
+def matching_repayments(expense, from_user_id, to_user_id):
+    """
+    Returns the expense's repayments that a payment from ``from_user_id`` to ``to_user_id`` pays off.
+    """
+    return expense.repayments.filter(from_user_id=to_user_id, to_user_id=from_user_id)
+
+
+def record_payment(expense, from_user_id, to_user_id, amount):
+    """
+    Records a payment towards an expense's repayment.
+
+    The matching repayment is locked with ``select_for_update`` and decremented with a
+    conditional update on its ``version`` column, so concurrent payments never overwrite
+    each other even on databases without row locks. A payment with no matching repayment
+    is recorded as a new debt of the receiver towards the payer.
+
+    The amount is in the expense's currency and is converted to ``BASE_CURRENCY`` at the rate
+    of the expense's date, like the expense's debts were.
+
+    Args:
+        expense (Expense): The expense being paid.
+        from_user_id (UUID): The user paying.
+        to_user_id (UUID): The user receiving the payment.
+        amount (int): The amount paid, in minor units of the expense's currency.
+
+    Raises:
+        ValueError: If the amount is not a positive integer, if the payment is larger than the
+            outstanding repayment, or if the expense's currency has no exchange rate for its date.
+        PaymentConflict: If the repayment kept changing for ``MAX_ATTEMPTS`` attempts.
+    """
+    if isinstance(amount, bool) or not isinstance(amount, int) or amount <= 0:
+        raise ValueError('Amount must be a positive whole number')
+    group_id = expense.expense_group_id
+    base_amount = int(fx.to_base([amount], [expense.currency], [timezone.localdate(expense.date)])[0])
+    for _ in range(MAX_ATTEMPTS):
+        with transaction.atomic():
+            repayment = matching_repayments(expense, from_user_id, to_user_id).select_for_update().values(
+                'pk', 'amount', 'version').first()
+
+            if repayment is None:
+                debt = models.Debt.objects.create(from_user_id=from_user_id, to_user_id=to_user_id, amount=amount,
+                                                  currency=expense.currency)
+                expense.repayments.add(debt)
+                balances.apply_debts([(from_user_id, to_user_id, base_amount, group_id, expense.pk)],
+                                     models.LedgerEntry.PAYMENT)
+            else:
+                if repayment['amount'] < amount:
+                    raise ValueError('Insufficient repayment amount')
+                updated = models.Debt.objects.filter(pk=repayment['pk'], version=repayment['version']).update(
+                    amount=F('amount') - amount, version=F('version') + 1
+                )
+                if not updated:
+                    continue
+                balances.apply_debts([(to_user_id, from_user_id, -base_amount, group_id, expense.pk)],
+                                     models.LedgerEntry.PAYMENT)
+
+            update_paid_flag(expense)
+            caching.invalidate(caching.GROUP, [group_id])
+            events.publish(events.PAYMENT_RECORDED, {
+                'expense': expense.name, 'group': group_id, 'from_user': from_user_id, 'to_user': to_user_id,
+                'amount': amount, 'currency': expense.currency,
+            }, group_ids=[group_id], user_ids=[from_user_id, to_user_id])
+            return
+    raise PaymentConflict('Repayment changed concurrently, please retry')
+
+
+def update_paid_flag(expense):
+    """
+    Marks the expense paid when none of its repayments is outstanding, in a single query.
+    """
+    outstanding = models.Expense.repayments.through.objects.filter(expense_id=OuterRef('pk'), debt__amount__gt=0)
+    models.Expense.objects.filter(pk=expense.pk).update(payment=~Exists(outstanding))
@@ -0,0 +1,82 @@
+"""
+Queries and response bodies of the read endpoints.
+
+They are shared by the sync API views and their async counterparts in ``async_views``, which
+only differ in how the queries are run.
+"""
+from django.db.models import F, Prefetch
+from BillManagement import balances, models
+
+MEMBERS_ORDERING = ('id',)
+DETAILS_ORDERING = ('date', 'transaction_id')
+BALANCES_ORDERING = ('id',)
+
+
+def members_queryset(group):
+    """
+    Returns the group's members, loading only what the members page shows.
+    """
+    return group.members.only('id')
+
+
+def members_data(group, members, next_cursor):
+    """
+    Builds the body of a group members page.
+    """
+    return {
+        'members': [str(member) for member in members],
+        'member_count': group.member_count,
+        'next_cursor': next_cursor
+    }
+
+
+def repayments_queryset():
+    """
+    Returns the outstanding repayments shown on a group details page, with both users selected.
+    """
+    return models.Debt.objects.exclude(amount=0).exclude(
+        from_user=F('to_user')).select_related('from_user', 'to_user')
+
+
+def details_queryset(group):
+    """
+    Returns the group's unpaid expenses with their outstanding repayments prefetched.
+    """
+    return models.Expense.objects.filter(expense_group=group, payment=False).prefetch_related(
+        Prefetch('repayments', queryset=repayments_queryset()))
+
+
+def details_data(expenses, next_cursor):
+    """
+    Builds the body of a group details page.
+    """
+    expense_details = [
+        {
+            "name": expense.name,
+            "description": expense.description,
+            "currency": expense.currency,
+            "repayments": [str(rep) for rep in expense.repayments.all()]
+        } for expense in expenses
+    ]
+    return {'expenses': expense_details, 'next_cursor': next_cursor}
+
+
+def user_details_data(user, rows, next_cursor, owes, owed):
+    """
+    Builds the body of a user details page from balance rows and the user's totals.
+    """
+    summary = []
+    for row in rows:
+        counterparty, amount = balances.counterparty_amount(row, user)
+        if amount > 0:
+            summary.append(f'User "{user.name}" owes {amount} to "{counterparty.name}"')
+        else:
+            summary.append(f'User "{user.name}" is owed {-amount} by "{counterparty.name}"')
+
+    return {
+        'user': str(user),
+        'total_debt': -owed,
+        'total_credit': owes,
+        'debt_summary': summary,
+        'next_cursor': next_cursor
+    }
@@ -1,5 +1,6 @@
+from django.db import transaction
 from rest_framework import serializers
-from . import models
+from . import models, money
 
 
 
@@ -9,7 +10,7 @@ class DebtSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = models.Debt  # Model to serialize
-        fields = ('id', 'from_user', 'to_user', 'amount')  # Fields to include in the serialization
+        fields = ('id', 'from_user', 'to_user', 'amount', 'currency')  # Fields to include in the serialization
 
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -21,6 +22,33 @@ class GroupSerializer(serializers.ModelSerializer):
         fields = ('id', 'group_name', 'debts', 'members')  # Fields to include in the serialization
 
 
+class GroupCreateSerializer(serializers.ModelSerializer):
+    """
+    Serializer for creating a group together with its members.
+
+    Members are profile ids already resolved by the view; they are added with one bulk insert
+    instead of being looked up one by one.
+    """
+    members = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, write_only=True)
+
+    class Meta:
+        model = models.Group  # Model to serialize
+        fields = ('id', 'group_name', 'members', 'currency')  # Fields to include in the serialization
+
+    def validate_currency(self, value):
+        try:
+            return money.validate_currency(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def create(self, validated_data):
+        member_ids = validated_data.pop('members')
+        with transaction.atomic():
+            group = super().create(validated_data)
+            group.add_members(member_ids)
+        return group
+
+
 class ExpenseUserSerializer(serializers.ModelSerializer):
     """
     Serializer for the ExpenseUser model.
@@ -37,4 +65,4 @@ class ExpenseSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Expense  # Model to serialize
         fields = ('transaction_id', 'name', 'expense_group', 'description', 'payment',
-                  'amount', 'date', 'repayments', 'users')  # Corrected field names to match the model
+                  'amount', 'currency', 'date', 'repayments', 'users')  # Corrected field names to match the model
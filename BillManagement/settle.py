@@ -0,0 +1,145 @@
+import heapq
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from BillManagement import balances, caching, events, fx, models
+
+
+def simplify_debts(net_balances):
+    """
+    Builds a near-minimal list of transfers that settles the given balances.
+
+    The largest creditor is repeatedly paid by the largest debtor, so at most ``n - 1``
+    transfers are produced for ``n`` users in ``O(n log n)`` time.
+
+    Args:
+        net_balances (dict): Maps each user id to its net balance, positive when the user
+            is owed money and negative when the user owes money.
+
+    Returns:
+        list: ``(debtor_id, creditor_id, amount)`` tuples, one per transfer.
+    """
+    creditors = [(-amount, user_id) for user_id, amount in net_balances.items() if amount > 0]
+    debtors = [(amount, user_id) for user_id, amount in net_balances.items() if amount < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor_id = heapq.heappop(creditors)
+        debt, debtor_id = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor_id, creditor_id, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor_id))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor_id))
+    return transfers
+
+
+def _net_balances(rows):
+    net_balances = defaultdict(int)
+    for user_a_id, user_b_id, amount in rows:
+        net_balances[user_a_id] += amount
+        net_balances[user_b_id] -= amount
+    return net_balances
+
+
+def group_net_balances(group):
+    """
+    Returns the net balance of every member with a non-zero balance in the group.
+
+    Args:
+        group (Group): The group to inspect.
+
+    Returns:
+        dict: Maps user ids to their net balance in ``BASE_CURRENCY``, positive when the user is owed money.
+    """
+    return _net_balances(balances.group_balances(group).values_list('user_a_id', 'user_b_id', 'amount'))
+
+
+def convert_transfers(transfers, currency):
+    """
+    Converts transfers computed in ``BASE_CURRENCY`` to another currency at today's rate.
+
+    Args:
+        transfers (list): ``(debtor_id, creditor_id, amount)`` tuples.
+        currency (str): The currency to convert to, usually the group's.
+
+    Returns:
+        list: The converted ``(debtor_id, creditor_id, amount)`` tuples.
+
+    Raises:
+        MissingRate: If the currency has no exchange rate yet.
+    """
+    today = timezone.localdate()
+    amounts = fx.convert([amount for _, _, amount in transfers], [settings.BASE_CURRENCY] * len(transfers),
+                         [today] * len(transfers), currency)
+    return [(debtor_id, creditor_id, int(amount)) for (debtor_id, creditor_id, _), amount in zip(transfers, amounts)]
+
+
+def outstanding_group_debts(group):
+    """
+    Returns the group's unsettled debts, locking them for the current transaction.
+
+    Args:
+        group (Group): The group whose debts are requested.
+
+    Returns:
+        list: The non-zero debts attached to the group's expenses or to the group itself.
+    """
+    expense_debt_ids = models.Expense.repayments.through.objects.filter(
+        expense__expense_group=group).values('debt_id')
+    group_debt_ids = models.Group.debts.through.objects.filter(group=group).values('debt_id')
+    return list(models.Debt.objects.select_for_update().filter(
+        Q(id__in=expense_debt_ids) | Q(id__in=group_debt_ids)
+    ).exclude(amount=0))
+
+
+def apply_settlement(group):
+    """
+    Replaces the group's outstanding debts with the simplified set of transfers.
+
+    The existing debts are zeroed, the group's expenses are marked as paid and one new debt
+    per transfer, in the group's currency, is stored on ``group.debts``. The group's balances
+    are replaced by the transfers in the same transaction.
+
+    Args:
+        group (Group): The group to settle.
+
+    Returns:
+        list: ``(debtor_id, creditor_id, amount)`` tuples for the created debts, in the group's currency.
+
+    Raises:
+        MissingRate: If the group's currency has no exchange rate yet.
+    """
+    with transaction.atomic():
+        old_debts = outstanding_group_debts(group)
+        rows = list(balances.group_balances(group).select_for_update().values_list(
+            'user_a_id', 'user_b_id', 'amount'))
+        transfers = simplify_debts(_net_balances(rows))
+        converted = convert_transfers(transfers, group.currency)
+
+        models.Debt.objects.filter(id__in=[debt.id for debt in old_debts]).update(amount=0)
+        models.Expense.objects.filter(expense_group=group, payment=False).update(payment=True)
+        new_debts = models.Debt.objects.bulk_create_with_pks([
+            models.Debt(from_user_id=creditor_id, to_user_id=debtor_id, amount=amount, currency=group.currency)
+            for debtor_id, creditor_id, amount in converted
+        ])
+        group.debts.set(new_debts)
+
+        balances.apply_debts(
+            [(user_a_id, user_b_id, -amount, group.id, None) for user_a_id, user_b_id, amount in rows]
+            + [(creditor_id, debtor_id, amount, group.id, None) for debtor_id, creditor_id, amount in transfers],
+            models.LedgerEntry.SETTLEMENT
+        )
+        caching.invalidate(caching.GROUP, [group.id])
+        events.publish(events.GROUP_SETTLED, {
+            'group': group.id,
+            'currency': group.currency,
+            'transfers': [{'from_user': debtor_id, 'to_user': creditor_id, 'amount': amount}
+                          for debtor_id, creditor_id, amount in converted],
+        }, group_ids=[group.id], user_ids={user_id for transfer in transfers for user_id in transfer[:2]})
+    return converted
@@ -0,0 +1,42 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, pre_delete
+from django.dispatch import receiver
+from BillManagement import caching, models
+from user.models import UserInfo as UserProfile
+
+
+@receiver(m2m_changed, sender=models.Group.members.through)
+def group_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Recounts the members and invalidates cached reads of the groups whose members changed.
+    """
+    if action == 'pre_clear' and reverse:
+        # The user's groups are gone once the clear has run
+        instance._cleared_group_ids = list(instance.group_set.values_list('id', flat=True))
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        group_ids = [instance.pk]
+    elif action == 'post_clear':
+        group_ids = instance.__dict__.pop('_cleared_group_ids', [])
+    else:
+        group_ids = list(pk_set)
+    if group_ids:
+        models.Group.objects.refresh_member_counts(group_ids)
+        caching.invalidate(caching.GROUP, group_ids)
+
+
+@receiver(pre_delete, sender=UserProfile)
+def leave_groups_of_deleted_user(sender, instance, **kwargs):
+    """
+    Decrements the member count of the groups a user leaves by being deleted.
+    """
+    models.Group.objects.filter(members=instance).update(member_count=F('member_count') - 1)
+
+
+@receiver(post_delete, sender=models.Group)
+def invalidate_deleted_group(sender, instance, **kwargs):
+    """
+    Invalidates cached group reads when a group is deleted.
+    """
+    caching.invalidate(caching.GROUP, [instance.pk])
@@ -0,0 +1,139 @@
+"""
+Vectorized calculation of how an expense is split between its users.
+
+Every split type is reduced to integer weights, and the amount is divided in proportion to
+them in one NumPy pass with largest-remainder rounding: each user gets the floor of their exact
+share, and the units left over go to the users with the largest fractional parts. Shares are
+whole minor units and always add up to the amount exactly, even for thousands of users.
+"""
+from decimal import Decimal, InvalidOperation
+import numpy as np
+
+EQUAL = 'equal'  # Same share for every user
+EXACT = 'exact'  # Values are the amounts owed by each user
+PERCENTAGE = 'percentage'  # Values are percentages of the amount, with up to two decimals
+SHARES = 'shares'  # Values are whole-number weights, e.g. 2 shares for a couple
+SPLIT_TYPES = (EQUAL, EXACT, PERCENTAGE, SHARES)
+
+PERCENT_SCALE = 100  # Percentages are weighted in hundredths of a percent
+MAX_PRODUCT = 2 ** 63  # amount * weight must fit in int64
+MAX_EXACT_FLOAT = 2 ** 53  # Values are parsed as floats, which hold integers exactly up to here
+ROUNDING_TOLERANCE = 1e-6  # Float error allowed when checking that scaled values are whole
+
+
+class SplitError(ValueError):
+    """
+    Raised when an amount cannot be split as requested.
+    """
+
+
+def _weights(values, scale, label, expected):
+    """
+    Converts values to an int64 array after multiplying them by ``scale``, rejecting negative
+    values and values with more decimals than the scale allows.
+    """
+    try:
+        scaled = np.asarray(values, dtype=np.float64) * scale
+    except (TypeError, ValueError):
+        raise SplitError(f'{label} must be numbers')
+    if scaled.ndim != 1:
+        raise SplitError(f'{label} must be numbers')
+    weights = np.rint(scaled)
+    if not np.isfinite(scaled).all() or (weights < 0).any() or (np.abs(scaled - weights) > ROUNDING_TOLERANCE).any():
+        raise SplitError(f'{label} must be {expected}')
+    if weights.size and weights.max() >= MAX_EXACT_FLOAT:
+        raise SplitError(f'{label} are too large')
+    return weights.astype(np.int64)
+
+
+def largest_remainder(amount, weights):
+    """
+    Divides an amount in proportion to integer weights, rounding with the largest-remainder method.
+
+    Ties between equal remainders go to the earlier users.
+
+    Args:
+        amount (int): The amount in minor units.
+        weights (numpy.ndarray): Non-negative int64 weights, one per user.
+
+    Returns:
+        numpy.ndarray: The int64 shares, adding up to ``amount``.
+
+    Raises:
+        SplitError: If the weights are all zero or too large to divide exactly.
+    """
+    total = int(weights.sum())
+    if total <= 0:
+        raise SplitError('At least one user must have a share')
+    if amount * int(weights.max()) >= MAX_PRODUCT:
+        raise SplitError('Amount is too large for these weights')
+    shares, remainders = np.divmod(weights * amount, total)
+    left_over = amount - int(shares.sum())
+    if left_over:
+        shares[np.argsort(-remainders, kind='stable')[:left_over]] += 1
+    return shares
+
+
+def parse_amount(amount):
+    """
+    Converts an amount from request data to an integer number of minor units.
+
+    Args:
+        amount: The amount, e.g. ``30``, ``"30"`` or ``30.0``.
+
+    Returns:
+        int: The amount.
+
+    Raises:
+        SplitError: If the amount is not a finite, non-negative whole number small enough to split.
+    """
+    if isinstance(amount, bool):
+        raise SplitError('Amount must be a whole number')
+    try:
+        amount = Decimal(str(amount))
+    except InvalidOperation:
+        raise SplitError('Amount must be a whole number')
+    if not amount.is_finite() or amount != amount.to_integral_value() or amount < 0:
+        raise SplitError('Amount must be a non-negative whole number')
+    if amount >= MAX_PRODUCT:
+        raise SplitError('Amount is too large')
+    return int(amount)
+
+
+def split_amounts(amount, split_type, count, values=None):
+    """
+    Splits an amount between users.
+
+    Args:
+        amount (int): The amount in minor units.
+        split_type (str): One of :data:`SPLIT_TYPES`.
+        count (int): The number of users.
+        values (list): One value per user, required by every split type except ``equal``.
+
+    Returns:
+        numpy.ndarray: The int64 amount owed by each user, adding up to ``amount``.
+
+    Raises:
+        SplitError: If the amount, split type or values are invalid.
+    """
+    amount = parse_amount(amount)
+    if split_type not in SPLIT_TYPES:
+        raise SplitError(f'Unsupported split type, expected one of {", ".join(SPLIT_TYPES)}')
+    if count < 1:
+        raise SplitError('At least one user is required')
+    if split_type == EQUAL:
+        return largest_remainder(amount, np.ones(count, dtype=np.int64))
+
+    if values is None or len(values) != count:
+        raise SplitError(f'A {split_type} split needs one value per user')
+    if split_type == EXACT:
+        shares = _weights(values, 1, 'Exact amounts', 'non-negative whole numbers')
+        if int(shares.sum()) != amount:
+            raise SplitError('Exact amounts must add up to the expense amount')
+        return shares
+    if split_type == PERCENTAGE:
+        weights = _weights(values, PERCENT_SCALE, 'Percentages', 'non-negative with at most two decimals')
+        if int(weights.sum()) != 100 * PERCENT_SCALE:
+            raise SplitError('Percentages must add up to 100')
+        return largest_remainder(amount, weights)
+    return largest_remainder(amount, _weights(values, 1, 'Shares', 'non-negative whole numbers'))
@@ -1,3 +1,1136 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, router
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from BillManagement import async_views, checks, events, expenses, fx, ledger, models, money, pagination, payments, settle, splits
+from core.db import pool
+from core.db.replicas import ReplicaRoutingMiddleware
+from user.models import User, UserInfo
+from utils import fast_json
+
+
+def call_command_output(name, *args, **options):
+    """Runs a management command and returns what it printed."""
+    stdout = io.StringIO()
+    call_command(name, *args, stdout=stdout, **options)
+    return stdout.getvalue()
+
+
+def create_profile(email, first_name='Test'):
+    """Creates an active user together with its profile."""
+    user = User.objects.create_user(email=email, password='password', is_active=True)
+    return _create_user_info(user, first_name)
+
+
+def create_participant(email, first_name='Test'):
+    """Creates an active user without a usable password, skipping the slow password hashing."""
+    user = User.objects.create_user(email=email, password=None, is_active=True)
+    return _create_user_info(user, first_name)
+
+
+def _create_user_info(user, first_name):
+    return UserInfo.objects.create(
+        user=user, first_name=first_name, last_name='User', date_of_birth=date(1990, 1, 1),
+        phone_number='+14155552671', street_address='1 Main St', city='City', state_province='State',
+        postal_code='00000', country='US',
+    )
+
+
+class BillManagementTestCase(TestCase):
+    """Base test case with an authenticated client and a few users."""
+
+    def setUp(self):
+        self.alice = create_profile('alice@example.com', 'Alice')
+        self.bob = create_profile('bob@example.com', 'Bob')
+        self.carol = create_profile('carol@example.com', 'Carol')
+        self.group = models.Group.objects.create(group_name='trip')
+        self.group.members.set([self.alice, self.bob, self.carol])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice.user)
+
+    def create_expense(self, name, amount, paid_by, users, group_name='trip'):
+        return self.client.post(reverse('create_expense'), {
+            'name': name, 'description': name, 'amount': amount, 'paid_by': paid_by.email,
+            'users': [user.email for user in users], 'group_name': group_name,
+        }, format='json')
+
+
+class BalanceTests(BillManagementTestCase):
+    """Tests for the maintained pairwise balances."""
+
+    def test_expense_and_payment_update_balances(self):
+        self.create_expense('dinner', 90, self.alice, [self.alice, self.bob, self.carol])
+        self.client.post(reverse('record_payment'), {
+            'from_user': self.bob.email, 'to_user': self.alice.email, 'amount': 10,
+            'group_name': 'trip', 'expense_name': 'dinner',
+        }, format='json')
+
+        response = self.client.get(reverse('show_user_details'), {'email': self.alice.email})
+        self.assertEqual(response.data['total_debt'], -50)
+        self.assertEqual(response.data['total_credit'], 0)
+        self.assertCountEqual(response.data['debt_summary'], [
+            'User "Alice User" is owed 20 by "Bob User"',
+            'User "Alice User" is owed 30 by "Carol User"',
+        ])
+        self.assertEqual(models.Balance.objects.filter(group=self.group).count(), 2)
+
+    def test_opposite_debts_are_netted(self):
+        self.create_expense('taxi', 20, self.alice, [self.alice, self.bob])
+        self.create_expense('lunch', 50, self.bob, [self.alice, self.bob])
+
+        response = self.client.get(reverse('show_user_details'), {'email': self.alice.email})
+        self.assertEqual(response.data['debt_summary'], ['User "Alice User" owes 15 to "Bob User"'])
+
+    def test_invalid_payment_amounts_are_rejected(self):
+        self.create_expense('dinner', 90, self.alice, [self.alice, self.bob, self.carol])
+        payment = {'from_user': self.bob.email, 'to_user': self.alice.email, 'group_name': 'trip',
+                   'expense_name': 'dinner'}
+        for amount in (None, 2.7, '2.7', -5, 0, True, 'ten', [5]):
+            with self.subTest(amount=amount):
+                response = self.client.post(reverse('record_payment'), {**payment, 'amount': amount}, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(models.Debt.objects.get(to_user=self.bob).amount, 30)
+        self.assertFalse(models.LedgerEntry.objects.filter(kind=models.LedgerEntry.PAYMENT).exists())
+
+        response = self.client.post(reverse('record_payment'), {**payment, 'amount': '5'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(models.Debt.objects.get(to_user=self.bob).amount, 25)
+
+
+class RecordPaymentTests(TransactionTestCase):
+    """Tests for payments recorded concurrently."""
+
+    def test_parallel_payments_are_not_lost(self):
+        alice = create_profile('alice@example.com', 'Alice')
+        bob = create_profile('bob@example.com', 'Bob')
+        group = models.Group.objects.create(group_name='trip')
+        expense = models.Expense(name='rent', description='rent', amount=400, expense_group=group)
+        expenses.create_expenses([(expense, alice.id, [alice.id, bob.id])])
+
+        def pay(_):
+            try:
+                payments.record_payment(expense, bob.id, alice.id, 1)
+                return True
+            except ValueError:
+                return False
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(pay, range(300)))
+
+        self.assertEqual(results.count(True), 200)
+        self.assertEqual(models.Debt.objects.get().amount, 0)
+        self.assertEqual(models.Debt.objects.get().version, 200)
+        self.assertTrue(models.Expense.objects.get().payment)
+        self.assertEqual(models.Balance.objects.filter(amount=0).count(), 2)
+
+
+class CreateExpenseTests(BillManagementTestCase):
+    """Tests for expense creation."""
+
+    def assert_query_count_does_not_grow(self, prefix):
+        query_counts = []
+        for size in (3, 50):
+            users = [self.alice] + [create_participant(f'{prefix}{size}-{i}@example.com') for i in range(size - 1)]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.create_expense(f'{prefix}-{size}', size * 10, self.alice, users)
+            self.assertEqual(response.status_code, 201)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+        expense = models.Expense.objects.get(name=f'{prefix}-50')
+        self.assertEqual(expense.users.count(), 50)
+        self.assertEqual(set(expense.repayments.values_list('to_user', flat=True)),
+                         set(expense.users.exclude(user=self.alice).values_list('user', flat=True)))
+
+    def test_query_count_does_not_grow_with_participants(self):
+        self.assert_query_count_does_not_grow('lunch')
+
+    def test_query_count_without_keys_returned_from_bulk_inserts(self):
+        # Like MySQL, which cannot return auto-increment keys from a bulk insert
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            self.assert_query_count_does_not_grow('dinner')
+
+
+class SplitTests(BillManagementTestCase):
+    """Tests for the split calculator and split types of expense creation."""
+
+    def test_shares_add_up_to_the_amount(self):
+        self.assertEqual(splits.split_amounts(100, splits.EQUAL, 3).tolist(), [34, 33, 33])
+        self.assertEqual(splits.split_amounts(100, splits.PERCENTAGE, 3, [33.33, 33.33, 33.34]).tolist(),
+                         [33, 33, 34])
+        self.assertEqual(splits.split_amounts(10, splits.SHARES, 3, [1, 2, 2]).tolist(), [2, 4, 4])
+        self.assertEqual(splits.split_amounts(10, splits.EXACT, 2, [3, 7]).tolist(), [3, 7])
+        shares = splits.split_amounts(1000001, splits.SHARES, 10000, list(range(1, 10001)))
+        self.assertEqual(int(shares.sum()), 1000001)
+
+    def test_invalid_splits_are_rejected(self):
+        invalid = [
+            (-1, splits.EQUAL, 2, None),
+            (10.5, splits.EQUAL, 2, None),
+            ('Infinity', splits.EQUAL, 2, None),
+            (float('inf'), splits.EQUAL, 2, None),
+            ('NaN', splits.EQUAL, 2, None),
+            ('sNaN', splits.EQUAL, 2, None),
+            (True, splits.EQUAL, 2, None),
+            (2 ** 63, splits.EXACT, 1, [2 ** 63]),
+            (10, 'thirds', 2, None),
+            (10, splits.EQUAL, 0, None),
+            (10, splits.EXACT, 2, [3, 6]),
+            (10, splits.PERCENTAGE, 2, [50, 49.999]),
+            (10, splits.PERCENTAGE, 2, [60, 60]),
+            (10, splits.SHARES, 2, [1]),
+            (10, splits.SHARES, 2, [0, 0]),
+            (10, splits.SHARES, 2, [1, 'two']),
+            (2 ** 62, splits.SHARES, 2, [1, 2]),
+        ]
+        for amount, split_type, count, values in invalid:
+            with self.subTest(amount=amount, split_type=split_type, values=values):
+                with self.assertRaises(splits.SplitError):
+                    splits.split_amounts(amount, split_type, count, values)
+
+    def test_expense_with_percentage_split(self):
+        response = self.client.post(reverse('create_expense'), {
+            'name': 'hotel', 'description': 'hotel', 'amount': 101, 'paid_by': self.alice.email,
+            'users': [self.alice.email, self.bob.email], 'group_name': 'trip',
+            'split_type': 'percentage', 'split': {self.alice.email: 25, self.bob.email: 75},
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        shares = {row.user_id: row for row in models.Expense.objects.get(name='hotel').users.all()}
+        self.assertEqual((shares[self.alice.id].paid_share, shares[self.alice.id].owed_share), (101, 25))
+        self.assertEqual(shares[self.alice.id].net_balance, 76)
+        self.assertEqual((shares[self.bob.id].owed_share, shares[self.bob.id].net_balance), (76, -76))
+        self.assertEqual(models.Debt.objects.get().amount, 76)
+
+    def test_expense_with_invalid_split_is_rejected(self):
+        response = self.client.post(reverse('create_expense'), {
+            'name': 'hotel', 'description': 'hotel', 'amount': 100, 'paid_by': self.alice.email,
+            'users': [self.alice.email, self.bob.email], 'group_name': 'trip',
+            'split_type': 'exact', 'split': {self.alice.email: 30},
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(models.Expense.objects.exists())
+
+    def test_expense_amount_is_normalized(self):
+        for name, amount in (('taxi', '30.0'), ('bus', 30.0), ('train', '1E+1')):
+            response = self.create_expense(name, amount, self.alice, [self.alice, self.bob])
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(models.Expense.objects.order_by('name').values_list('amount', flat=True)), [30, 30, 10])
+        response = self.create_expense('plane', 'Infinity', self.alice, [self.alice, self.bob])
+        self.assertEqual(response.status_code, 400)
+
+
+class CurrencyTests(BillManagementTestCase):
+    """Tests for money amounts, exchange rates and multi-currency groups."""
+
+    def setUp(self):
+        super().setUp()
+        # Rates loaded by an earlier test were rolled back, so the revision is read again
+        fx._revision_checked_at = float('-inf')
+
+    def load_rates(self, *lines):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as rates:
+            rates.write('\n'.join(['date,currency,rate', *lines]))
+        self.addCleanup(os.remove, rates.name)
+        return call_command_output('load_fx_rates', rates.name)
+
+    def test_money_keeps_minor_units(self):
+        self.assertEqual(money.Money.from_major('12.34', 'eur'), money.Money(1234, 'EUR'))
+        self.assertEqual(money.Money.from_major('1.5', 'KWD'), money.Money(1500, 'KWD'))
+        self.assertEqual(str(money.Money(1234, 'EUR') + money.Money(66, 'EUR')), '13.00 EUR')
+        self.assertEqual(str(money.Money(500, 'JPY')), '500 JPY')
+        with self.assertRaises(ValueError):
+            money.Money.from_major('1.5', 'JPY')
+        for value in ('Infinity', '-Infinity', 'NaN'):
+            with self.assertRaisesMessage(ValueError, 'Amount must be a number'):
+                money.Money.from_major(value, 'EUR')
+        with self.assertRaises(ValueError):
+            money.Money(1, 'EUR') + money.Money(1, 'USD')
+        with self.assertRaises(ValueError):
+            money.validate_currency('XYZ')
+
+    def test_rates_are_looked_up_by_day(self):
+        self.assertEqual(self.load_rates('2024-01-01,EUR,0.9', '2024-02-01,EUR,0.8', '2024-01-01,JPY,150'),
+                         'Loaded 3 exchange rates.\n')
+        table = fx.get_table()
+        self.assertIs(fx.get_table(), table)
+        self.assertEqual(table.rate('EUR', date(2024, 1, 31)), 0.9)
+        self.assertEqual(table.rate('EUR', date(2024, 3, 1)), 0.8)
+        with self.assertRaises(fx.MissingRate):
+            table.rate('EUR', date(2023, 12, 31))
+
+        converted = fx.convert([1000, 1000, 900, 300], ['USD', 'EUR', 'EUR', 'JPY'],
+                               [date(2024, 1, 15), date(2024, 1, 15), date(2024, 2, 15), date(2024, 1, 15)], 'USD')
+        self.assertEqual(converted.tolist(), [1000, 1111, 1125, 200])
+        self.assertEqual(fx.convert([1000], ['EUR'], [date(2024, 1, 15)], 'JPY').tolist(), [1667])
+
+        self.load_rates('2024-01-01,EUR,0.5')
+        self.assertIsNot(fx.get_table(), table)
+        self.assertEqual(fx.get_table().rate('EUR', date(2024, 1, 31)), 0.5)
+
+        # Another worker's load is seen at the next revision check, without a query per call
+        table = fx.get_table()
+        models.ExchangeRate.objects.filter(currency='EUR', date=date(2024, 1, 1)).update(
+            rate=Decimal('0.4'), revision=fx.latest_revision() + 1)
+        with mock.patch('BillManagement.fx.time.monotonic', return_value=fx._revision_checked_at + 1):
+            with self.assertNumQueries(0):
+                self.assertIs(fx.get_table(), table)
+        with mock.patch('BillManagement.fx.time.monotonic', return_value=fx._revision_checked_at + 10):
+            self.assertEqual(fx.get_table().rate('EUR', date(2024, 1, 31)), 0.4)
+        with self.assertRaises(CommandError):
+            self.load_rates('2024-01-01,EUR,-1')
+
+    def test_foreign_expense_is_converted_into_balances(self):
+        response = self.client.post(reverse('create_expense'), {
+            'name': 'museum', 'description': 'museum', 'amount': 3000, 'paid_by': self.alice.email,
+            'users': [self.alice.email, self.bob.email], 'group_name': 'trip', 'currency': 'EUR',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('No exchange rate for EUR', response.data['error'])
+
+        self.load_rates(f'{timezone.localdate() - timedelta(days=1)},EUR,0.75')
+        response = self.client.post(reverse('create_expense'), {
+            'name': 'museum', 'description': 'museum', 'amount': 3000, 'paid_by': self.alice.email,
+            'users': [self.alice.email, self.bob.email], 'group_name': 'trip', 'currency': 'EUR',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(models.Debt.objects.get().money, money.Money(1500, 'EUR'))
+        self.assertEqual(settle.group_net_balances(self.group), {self.alice.id: 2000, self.bob.id: -2000})
+
+        payments.record_payment(models.Expense.objects.get(name='museum'), self.bob.id, self.alice.id, 1500)
+        self.assertEqual(settle.group_net_balances(self.group), {})
+
+    def test_settlement_is_in_the_group_currency(self):
+        self.load_rates(f'{timezone.localdate()},EUR,0.5')
+        self.group.currency = 'EUR'
+        self.group.save()
+        self.create_expense('fuel', 2000, self.alice, [self.alice, self.bob])
+
+        response = self.client.post(reverse('settle_group'), {'group_name': 'trip', 'apply': True}, format='json')
+        self.assertEqual(response.data['currency'], 'EUR')
+        self.assertEqual(response.data['transfers'], [{'from': self.bob.email, 'to': self.alice.email, 'amount': 1000}])
+        self.assertEqual(list(self.group.debts.values_list('amount', 'currency')), [(1000, 'EUR')])
+        self.assertEqual(settle.group_net_balances(self.group), {self.alice.id: 2000, self.bob.id: -2000})
+
+
+class GroupMembershipTests(BillManagementTestCase):
+    """Tests for group membership changes."""
+
+    def add_users(self, emails, group_name='trip'):
+        return self.client.post(reverse('add_user_to_group'), {'group_name': group_name, 'user_emails': emails},
+                                format='json')
+
+    def test_member_count_follows_every_change(self):
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.member_count, 3)
+
+        dave = create_profile('dave@example.com', 'Dave')
+        response = self.add_users([dave.email, self.alice.email])
+        self.assertEqual((response.data['added'], response.data['already_members']), ([dave.email], [self.alice.email]))
+
+        response = self.client.post(reverse('remove_users_from_group'), {
+            'group_name': 'trip', 'user_emails': [self.bob.email, self.carol.email]}, format='json')
+        self.assertEqual(response.data['removed'], 2)
+
+        dave.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.member_count, 1)
+        self.assertTrue(self.group.has_member(self.alice.id))
+        self.assertFalse(self.group.has_member(self.bob.id))
+
+    def test_adding_one_user_does_not_depend_on_group_size(self):
+        big = models.Group.objects.create(group_name='big')
+        big.add_members(create_participant(f'member{i}@example.com').id for i in range(200))
+        small = models.Group.objects.create(group_name='small')
+
+        query_counts = []
+        for group_name in ('small', 'big'):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('add_user_to_group'), {
+                    'group_name': group_name, 'user_email': self.bob.email}, format='json')
+            self.assertEqual(response.status_code, 200)
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual(models.Group.objects.get(pk=big.pk).member_count, 201)
+
+        response = self.client.post(reverse('add_user_to_group'), {'group_name': 'big', 'user_email': self.bob.email},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ResolveEmailsTests(BillManagementTestCase):
+    """Tests for resolving lists of emails."""
+
+    def test_group_creation_resolves_members_in_one_query(self):
+        profiles = [create_participant(f'member{i}@example.com') for i in range(50)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('create_group'), {
+                'group_name': 'big', 'members': [profile.email for profile in profiles]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sum('"user_userinfo"' in query['sql'] for query in queries), 1)
+        self.assertEqual(models.Group.objects.get(group_name='big').member_count, 50)
+
+    def test_all_missing_emails_are_reported(self):
+        response = self.client.post(reverse('create_group'), {
+            'group_name': 'big', 'members': [self.alice.email, 'x@example.com', 'y@example.com']}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['missing_emails'], ['x@example.com', 'y@example.com'])
+
+        response = self.create_expense('dinner', 30, self.alice, [self.alice, self.bob])
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(reverse('create_expense'), {
+            'name': 'lunch', 'description': 'lunch', 'amount': 30, 'paid_by': self.alice.email,
+            'users': [self.alice.email, 'x@example.com'], 'group_name': 'trip'}, format='json')
+        self.assertEqual((response.status_code, response.data['missing_emails']), (404, ['x@example.com']))
+
+    def test_emails_that_are_not_strings_are_rejected(self):
+        expense = {'name': 'lunch', 'description': 'lunch', 'amount': 30, 'paid_by': self.alice.email,
+                   'group_name': 'trip'}
+        for users in ([[self.alice.email]], [{'email': self.bob.email}], self.alice.email, {self.alice.email: 1}):
+            response = self.client.post(reverse('create_expense'), {**expense, 'users': users}, format='json')
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('create_expense'), {**expense, 'paid_by': [self.alice.email],
+                                                                'users': [self.alice.email]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('create_group'), {'group_name': 'big', 'members': [1]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('add_user_to_group'), {
+            'group_name': 'trip', 'user_emails': [[self.alice.email]]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(models.Expense.objects.exists())
+
+
+class IdempotencyTests(BillManagementTestCase):
+    """Tests for retried write requests."""
+
+    def create_expense_with_key(self, name, key):
+        self.client.credentials(HTTP_IDEMPOTENCY_KEY=key)
+        return self.create_expense(name, 30, self.alice, [self.alice, self.bob, self.carol])
+
+    def test_retry_replays_stored_response(self):
+        first = self.create_expense_with_key('dinner', 'key-1')
+        with self.assertNumQueries(1):
+            retry = self.create_expense_with_key('dinner', 'key-1')
+
+        self.assertEqual((retry.status_code, retry.data), (first.status_code, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(models.Expense.objects.count(), 1)
+        self.assertEqual(models.Debt.objects.count(), 2)
+
+    def test_key_reused_for_different_request_is_rejected(self):
+        self.create_expense_with_key('dinner', 'key-1')
+        self.assertEqual(self.create_expense_with_key('lunch', 'key-1').status_code, 422)
+        self.assertEqual(self.create_expense_with_key('lunch', 'key-2').status_code, 201)
+
+    def test_expired_keys_are_swept(self):
+        self.create_expense_with_key('dinner', 'key-1')
+        self.create_expense_with_key('lunch', 'key-2')
+        models.IdempotencyKey.objects.filter(key='key-1').update(created_at=timezone.now() - timedelta(days=2))
+
+        call_command('sweep_idempotency_keys', stdout=io.StringIO())
+        self.assertEqual(list(models.IdempotencyKey.objects.values_list('key', flat=True)), ['key-2'])
+
+
+class BatchTests(BillManagementTestCase):
+    """Tests for the batch endpoint."""
+
+    def batch(self, operations, **extra):
+        return self.client.post(reverse('batch'), {'operations': operations, **extra}, format='json')
+
+    def test_operations_run_in_order_and_share_lookups(self):
+        response = self.batch([
+            {'method': 'POST', 'path': 'expenses/create/', 'body': {
+                'name': 'dinner', 'description': 'dinner', 'amount': 30, 'paid_by': self.alice.email,
+                'users': [self.alice.email, self.bob.email, self.carol.email], 'group_name': 'trip'}},
+            {'path': 'groups/members/', 'params': {'name': 'trip'}},
+            {'path': 'groups/details/', 'params': {'name': 'trip'}},
+            {'path': 'users/details/', 'params': {'email': self.bob.email}},
+            {'path': 'groups/members/', 'params': {'name': 'missing'}},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 200, 200, 200, 404])
+        self.assertEqual(len(response.data['results'][1]['body']['members']), 3)
+        self.assertEqual(response.data['results'][3]['body']['debt_summary'], ['User "Bob User" owes 10 to "Alice User"'])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.batch([{'path': 'groups/members/', 'params': {'name': 'trip'}}] * 5)
+        group_lookups = [query for query in queries if 'WHERE "BillManagement_group"."group_name"' in query['sql']]
+        self.assertEqual(len(group_lookups), 1)
+
+    def test_atomic_batch_is_rolled_back_on_failure(self):
+        response = self.batch([
+            {'method': 'POST', 'path': 'expenses/create/', 'body': {
+                'name': 'dinner', 'description': 'dinner', 'amount': 30, 'paid_by': self.alice.email,
+                'users': [self.alice.email, self.bob.email], 'group_name': 'trip'}},
+            {'method': 'POST', 'path': 'expenses/create/', 'body': {
+                'name': 'lunch', 'description': 'lunch', 'amount': 30, 'paid_by': 'nobody@example.com',
+                'users': [self.alice.email], 'group_name': 'trip'}},
+            {'path': 'groups/members/', 'params': {'name': 'trip'}},
+        ], atomic=True)
+
+        self.assertTrue(response.data['rolled_back'])
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 404])
+        self.assertFalse(models.Expense.objects.exists())
+
+    def test_atomic_flag_is_parsed_as_a_boolean(self):
+        operations = [
+            {'method': 'POST', 'path': 'expenses/create/', 'body': {
+                'name': 'dinner', 'description': 'dinner', 'amount': 30, 'paid_by': self.alice.email,
+                'users': [self.alice.email, self.bob.email], 'group_name': 'trip'}},
+            {'path': 'groups/members/', 'params': {'name': 'missing'}},
+        ]
+        response = self.batch(operations, atomic='false')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['rolled_back'])
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 404])
+        self.assertTrue(models.Expense.objects.filter(name='dinner').exists())
+
+        self.assertEqual(self.batch(operations, atomic='maybe').status_code, 400)
+
+    def test_unknown_or_excluded_paths_are_rejected(self):
+        self.assertEqual(self.batch([{'path': 'nowhere/'}]).status_code, 400)
+        self.assertEqual(self.batch([{'path': 'groups/export/', 'params': {'name': 'trip'}}]).status_code, 400)
+        self.assertEqual(self.batch([]).status_code, 400)
+
+
+class ImportExpensesTests(BillManagementTestCase):
+    """Tests for the bulk expense import."""
+
+    def test_csv_upload_reports_bad_rows(self):
+        content = (
+            'name,description,amount,paid_by,users,group_name\n'
+            'hotel,Hotel,300,alice@example.com,alice@example.com;bob@example.com;carol@example.com,trip\n'
+            'hotel,Duplicate,10,alice@example.com,bob@example.com,trip\n'
+            'museum,Museum,abc,alice@example.com,bob@example.com,trip\n'
+            'boat,Boat,40,bob@example.com,alice@example.com;nobody@example.com,\n'
+            'dinner,Dinner,20,bob@example.com,alice@example.com;bob@example.com,\n'
+        )
+        upload = SimpleUploadedFile('expenses.csv', content.encode())
+        response = self.client.post(reverse('import_expenses'), {'file': upload}, format='multipart')
+
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 3)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4])
+        self.assertEqual(models.Expense.objects.get(name='hotel').repayments.count(), 2)
+        response = self.client.get(reverse('show_user_details'), {'email': self.carol.email})
+        self.assertEqual(response.data['debt_summary'], ['User "Carol User" owes 100 to "Alice User"'])
+
+    def test_management_command_imports_jsonl_in_chunks(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as stream:
+            for i in range(5):
+                stream.write(f'{{"name": "e{i}", "amount": 10, "paid_by": "alice@example.com", '
+                             f'"users": ["alice@example.com", "bob@example.com"], "group_name": "trip"}}\n')
+            stream.write('not json\n')
+        self.addCleanup(os.remove, stream.name)
+
+        stderr = io.StringIO()
+        call_command('import_expenses', stream.name, chunk_size=2, stdout=io.StringIO(), stderr=stderr)
+        self.assertEqual(stderr.getvalue(), 'Row 6: Row could not be parsed\n')
+        self.assertEqual(models.Expense.objects.count(), 5)
+        response = self.client.get(reverse('show_user_details'), {'email': self.bob.email})
+        self.assertEqual(response.data['debt_summary'], ['User "Bob User" owes 25 to "Alice User"'])
+
+    def test_rows_with_wrong_types_are_reported(self):
+        rows = [
+            {'name': 'a', 'amount': 10, 'paid_by': ['alice@example.com'], 'users': ['bob@example.com']},
+            {'name': 'b', 'amount': 10, 'paid_by': 'alice@example.com', 'users': [['bob@example.com']]},
+            {'name': {'x': 1}, 'amount': 10, 'paid_by': 'alice@example.com', 'users': ['bob@example.com']},
+            {'name': 'c', 'amount': 12.9, 'paid_by': 'alice@example.com', 'users': ['bob@example.com']},
+            {'name': 'd', 'amount': '12.9', 'paid_by': 'alice@example.com', 'users': ['bob@example.com']},
+            {'name': 'e', 'amount': 12.0, 'paid_by': 'alice@example.com', 'users': ['bob@example.com']},
+        ]
+        content = ''.join(json.dumps(row) + '\n' for row in rows)
+        upload = SimpleUploadedFile('expenses.jsonl', content.encode())
+        response = self.client.post(reverse('import_expenses'), {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 2, 3, 4, 5])
+        self.assertEqual(response.data['errors'][3]['error'], 'Amount must be an integer')
+        self.assertEqual(models.Expense.objects.get().amount, 12)
+
+
+class ExportGroupTests(BillManagementTestCase):
+    """Tests for the streaming group export."""
+
+    def test_export_streams_expenses_and_repayments(self):
+        self.create_expense('dinner', 30, self.alice, [self.alice, self.bob, self.carol])
+        self.create_expense('solo', 30, self.alice, [self.alice], group_name=None)
+
+        response = self.client.get(reverse('export_group'), {'name': 'trip', 'file_format': 'jsonl'})
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['type'] for row in rows], ['expense', 'repayment', 'repayment'])
+        self.assertEqual({row['to_user'] for row in rows[1:]}, {self.bob.email, self.carol.email})
+        self.assertEqual({row['currency'] for row in rows}, {'USD'})
+
+        response = self.client.get(reverse('export_group'), {'name': 'trip'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'type,expense,date,description,amount,currency,payment,from_user,to_user')
+        self.assertEqual(len(lines), 4)
+
+
+class ShowGroupDetailsTests(BillManagementTestCase):
+    """Tests for the group details view."""
+
+    def test_query_count_is_constant_for_large_groups(self):
+        members = [self.alice.id, self.bob.id, self.carol.id]
+        expenses.create_expenses([
+            (models.Expense(name=f'expense-{i}', description='', amount=30, expense_group=self.group),
+             members[i % 3], members)
+            for i in range(1000)
+        ])
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('show_group_details'), {'name': 'trip', 'page_size': 1000})
+        self.assertEqual(len(response.data['expenses']), 1000)
+        self.assertIn(' owes 10 to ', response.data['expenses'][0]['repayments'][0])
+
+
+class PaginationTests(BillManagementTestCase):
+    """Tests for the cursor pagination of the read endpoints."""
+
+    def test_group_details_pages_cover_every_expense_once(self):
+        members = [self.alice.id, self.bob.id]
+        expenses.create_expenses([
+            (models.Expense(name=f'expense-{i}', description='', amount=10, expense_group=self.group),
+             self.alice.id, members)
+            for i in range(5)
+        ])
+
+        names = []
+        params = {'name': 'trip', 'page_size': 2}
+        while True:
+            response = self.client.get(reverse('show_group_details'), params)
+            names.extend(expense['name'] for expense in response.data['expenses'])
+            if not response.data['next_cursor']:
+                break
+            params['cursor'] = response.data['next_cursor']
+        self.assertEqual(sorted(names), [f'expense-{i}' for i in range(5)])
+
+    def test_members_and_user_details_are_paginated(self):
+        response = self.client.get(reverse('show_group_members'), {'name': 'trip', 'page_size': 2})
+        self.assertEqual(len(response.data['members']), 2)
+        response = self.client.get(reverse('show_group_members'),
+                                   {'name': 'trip', 'cursor': response.data['next_cursor']})
+        self.assertEqual(len(response.data['members']), 1)
+        self.assertIsNone(response.data['next_cursor'])
+
+        self.create_expense('dinner', 90, self.alice, [self.alice, self.bob, self.carol])
+        response = self.client.get(reverse('show_user_details'), {'email': self.alice.email, 'page_size': 1})
+        self.assertEqual(len(response.data['debt_summary']), 1)
+        self.assertEqual(response.data['total_debt'], -60)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('show_group_members'), {'name': 'trip', 'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+        for url, values in [('show_group_members', ['not-a-uuid']), ('show_group_details', [[1], 'x']),
+                            ('show_group_details', ['yesterday', str(uuid.uuid4())]),
+                            ('show_user_details', [{'id': 1}])]:
+            with self.subTest(url=url, values=values):
+                params = {'name': 'trip', 'email': self.alice.email, 'cursor': pagination.encode_cursor(values)}
+                response = self.client.get(reverse(url), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['error'], 'Invalid cursor')
+
+
+class CachingTests(BillManagementTestCase):
+    """Tests for the versioned cache of group and balance reads."""
+
+    def test_reads_are_cached_until_a_write(self):
+        url = reverse('show_group_details')
+        self.client.get(url, {'name': 'trip'})
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'name': 'trip'})
+        self.assertEqual(response.data['expenses'], [])
+
+        self.create_expense('dinner', 30, self.alice, [self.alice, self.bob, self.carol])
+        response = self.client.get(url, {'name': 'trip'})
+        self.assertEqual([expense['name'] for expense in response.data['expenses']], ['dinner'])
+
+        self.client.get(reverse('show_user_details'), {'email': self.bob.email})
+        self.client.post(reverse('record_payment'), {
+            'from_user': self.bob.email, 'to_user': self.alice.email, 'amount': 10,
+            'group_name': 'trip', 'expense_name': 'dinner',
+        }, format='json')
+        response = self.client.get(reverse('show_user_details'), {'email': self.bob.email})
+        self.assertEqual(response.data['debt_summary'], [])
+
+    def test_membership_changes_invalidate_members(self):
+        url = reverse('show_group_members')
+        self.assertEqual(len(self.client.get(url, {'name': 'trip'}).data['members']), 3)
+        self.group.members.remove(self.carol)
+        self.assertEqual(len(self.client.get(url, {'name': 'trip'}).data['members']), 2)
+
+
+class ConditionalGetTests(BillManagementTestCase):
+    """Tests for ETag based conditional reads."""
+
+    def test_unchanged_group_is_not_modified_until_a_write(self):
+        url = reverse('show_group_details')
+        etag = self.client.get(url, {'name': 'trip'})['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'name': 'trip'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.create_expense('dinner', 30, self.alice, [self.alice, self.bob])
+        response = self.client.get(url, {'name': 'trip'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotEqual(self.client.get(url, {'name': 'trip', 'page_size': 1})['ETag'], response['ETag'])
+
+    def test_user_details_change_with_payments(self):
+        self.create_expense('dinner', 30, self.alice, [self.alice, self.bob])
+        url = reverse('show_user_details')
+        etag = self.client.get(url, {'email': self.bob.email})['ETag']
+        self.assertEqual(self.client.get(url, {'email': self.bob.email}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post(reverse('record_payment'), {
+            'from_user': self.bob.email, 'to_user': self.alice.email, 'amount': 5,
+            'group_name': 'trip', 'expense_name': 'dinner',
+        }, format='json')
+        self.assertEqual(self.client.get(url, {'email': self.bob.email}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_deploy_check_requires_a_shared_cache(self):
+        errors = checks.check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['BillManagement.E001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                                   'LOCATION': 'redis://127.0.0.1:6379/1'}}):
+            self.assertEqual(checks.check_shared_cache(None), [])
+
+
+class AsyncReadViewTests(BillManagementTestCase):
+    """Tests for the async versions of the read endpoints."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_expense('dinner', 30, self.alice, [self.alice, self.bob])
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.alice.user)}'}
+
+    async def get(self, view, params, **headers):
+        request = AsyncRequestFactory().get('/', params, headers={**self.headers, **headers})
+        return await view.as_view()(request)
+
+    async def test_responses_match_the_sync_views(self):
+        cases = [
+            (async_views.ShowGroupMembersView, 'show_group_members', {'name': 'trip', 'page_size': 2}),
+            (async_views.ShowGroupDetailsView, 'show_group_details', {'name': 'trip'}),
+            (async_views.ShowUserDetailsView, 'show_user_details', {'email': self.bob.email}),
+        ]
+        for view, url_name, params in cases:
+            expected = await sync_to_async(self.client.get)(reverse(url_name), params)
+            response = await self.get(view, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content), expected.json())
+            self.assertEqual(response['ETag'], expected['ETag'])
+
+            response = await self.get(view, params, if_none_match=expected['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+    async def test_errors_match_the_sync_views(self):
+        response = await self.get(async_views.ShowGroupDetailsView, {'name': 'missing'})
+        self.assertEqual((response.status_code, json.loads(response.content)), (404, {'error': 'Group does not exist'}))
+        response = await self.get(async_views.ShowGroupMembersView, {'name': 'trip', 'cursor': 'x'})
+        self.assertEqual((response.status_code, json.loads(response.content)), (400, {'error': 'Invalid cursor'}))
+
+        response = await async_views.ShowGroupDetailsView.as_view()(AsyncRequestFactory().get('/', {'name': 'trip'}))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+        response = await self.get(async_views.ShowGroupDetailsView, {'name': 'trip'}, authorization='Bearer x')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    async def test_replica_middleware_runs_async_views(self):
+        async def view(request):
+            return HttpResponse(router.db_for_read(models.Group))
+
+        middleware = ReplicaRoutingMiddleware(view)
+        response = await middleware(AsyncRequestFactory().get('/'))
+        self.assertEqual(response.content, b'replica')
+
+
+class EventStreamTests(BillManagementTestCase):
+    """Tests for the Server-Sent Events endpoints."""
+
+    def setUp(self):
+        super().setUp()
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.alice.user)}'}
+
+    async def get(self, view, params):
+        return await view.as_view()(AsyncRequestFactory().get('/', params, headers=self.headers))
+
+    def commit_expense(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_expense(name, 30, self.alice, [self.alice, self.bob])
+
+    async def test_group_and_user_streams_receive_committed_events(self):
+        group_stream = async_views.event_stream(events.group_channel(self.group.id))
+        user_stream = async_views.event_stream(events.user_channel(self.bob.id))
+        other_stream = async_views.event_stream(events.user_channel(self.carol.id))
+        for stream in (group_stream, user_stream, other_stream):
+            self.assertEqual(await anext(stream), b': connected\n\n')
+
+        await sync_to_async(self.commit_expense)('dinner')
+        for stream in (group_stream, user_stream):
+            lines = (await asyncio.wait_for(anext(stream), 1)).decode().splitlines()
+            self.assertEqual(lines[1], 'event: expense_created')
+            self.assertEqual(json.loads(lines[2].removeprefix('data: '))['expense'], 'dinner')
+
+        with override_settings(EVENT_STREAM_KEEPALIVE_SECONDS=0.01):
+            self.assertEqual(await anext(other_stream), b': keep-alive\n\n')
+        for stream in (group_stream, user_stream, other_stream):
+            await stream.aclose()
+        self.assertEqual(events.get_broker()._subscriptions, {})
+
+    async def test_slow_subscriber_is_told_to_reset(self):
+        with override_settings(EVENT_QUEUE_SIZE=2):
+            subscription = events.get_broker().subscribe('test')
+        for index in range(3):
+            events.get_broker().publish('test', {'id': index, 'type': 'test', 'data': {}})
+        await asyncio.sleep(0)
+        self.assertEqual((await subscription.get(1))['type'], events.RESET)
+        self.assertIsNone(await subscription.get(0.01))
+        subscription.close()
+
+    async def test_stream_response(self):
+        response = await self.get(async_views.GroupEventsView, {'name': 'trip'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.is_async)
+        response = await self.get(async_views.GroupEventsView, {'name': 'missing'})
+        self.assertEqual(response.status_code, 404)
+        response = await self.get(async_views.UserEventsView, {'email': 'missing@example.com'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ExplainQueriesTests(TestCase):
+    """Tests for the explain_queries management command."""
+
+    def test_endpoint_queries_avoid_full_scans(self):
+        stdout = io.StringIO()
+        call_command('explain_queries', fail_on_scan=True, stdout=stdout)
+        self.assertNotIn('FULL SCAN', stdout.getvalue())
+
+
+class FastJSONTests(BillManagementTestCase):
+    """Tests for the orjson renderer and parser."""
+
+    def test_renders_like_the_stdlib_renderer(self):
+        data = {
+            'id': uuid.uuid4(), 'date': timezone.now(), 'amount': Decimal('1.50'), 'label': gettext_lazy('Name'),
+            'nested': [{'ok': True, 'none': None, 'float': 0.1, 'text': 'caf\u00e9'}],
+        }
+        fast = fast_json.FastJSONRenderer().render(data)
+        self.assertEqual(fast, JSONRenderer().render(data))
+        self.assertIn('café'.encode(), fast)
+
+    def test_documented_differences_from_the_stdlib_renderer(self):
+        fast, stdlib = fast_json.FastJSONRenderer(), JSONRenderer()
+        for value in (float('nan'), float('inf'), float('-inf')):
+            with self.subTest(value=value):
+                with self.assertRaisesMessage(ValueError, 'Out of range float values are not JSON compliant'):
+                    stdlib.render({'a': value})
+                self.assertEqual(fast.render({'a': value}), b'{"a":null}')
+        self.assertEqual((fast.render([1e300]), stdlib.render([1e300])), (b'[1e300]', b'[1e+300]'))
+        self.assertEqual((fast.render(['\u2028']), stdlib.render(['\u2028'])), ('["\u2028"]'.encode(), b'["\\u2028"]'))
+        context = {'indent': 4}
+        self.assertEqual(fast.render({'a': [1]}, renderer_context=context), b'{\n  "a": [\n    1\n  ]\n}')
+        self.assertEqual(stdlib.render({'a': [1]}, renderer_context=context), b'{\n    "a": [\n        1\n    ]\n}')
+
+    def test_requests_and_errors_round_trip(self):
+        response = self.client.post(reverse('create_group'), data='{"group_name": "x", "members": [',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+
+        self.create_expense('dinner', 30, self.alice, [self.alice, self.bob])
+        response = self.client.get(reverse('show_group_details'), {'name': 'trip'})
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    """Tests for the read-replica router."""
+
+    def route(self, method, user, write=False):
+        """Runs a request through the middleware and returns the alias its reads used."""
+        aliases = []
+
+        def view(request):
+            request.user = user
+            if write:
+                router.db_for_write(models.Group)
+            aliases.append(router.db_for_read(models.Group))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)('/')
+        ReplicaRoutingMiddleware(view)(request)
+        return aliases[0]
+
+    def test_reads_of_safe_requests_use_replica_until_user_writes(self):
+        user = User.objects.create_user(email='replica@example.com', password=None, is_active=True)
+        self.assertEqual(self.route('get', user), 'replica')
+        self.assertEqual(self.route('post', user), 'default')
+        self.assertEqual(self.route('get', user), 'default')
+
+        other = User.objects.create_user(email='other@example.com', password=None, is_active=True)
+        self.assertEqual(self.route('get', other, write=True), 'default')
+        self.assertEqual(self.route('get', other), 'default')
+        self.assertEqual(router.db_for_read(models.Group), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[f'replica{index}' for index in range(20)])
+    def test_reads_of_a_request_use_one_replica(self):
+        aliases = []
+
+        def view(request):
+            aliases.extend(router.db_for_read(models.Group) for _ in range(20))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(len(set(aliases)), 1)
+
+
+class PooledBackendTests(SimpleTestCase):
+    """Tests for the pooled database backend, on its SQLite variant."""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.alias = f'pooled_{uuid.uuid4().hex}'
+        self.addCleanup(pool._pools.pop, self.alias, None)
+
+    def connect(self, size=4, recycle=3600):
+        """Returns an open wrapper of the pooled alias, sharing the pool of the other wrappers."""
+        settings_dict = {'ENGINE': 'core.db.backends.sqlite3_pooled', 'NAME': self.path,
+                         'POOL': {'SIZE': size, 'RECYCLE': recycle}}
+        wrapper = ConnectionHandler({'default': settings_dict, self.alias: settings_dict})[self.alias]
+        wrapper.ensure_connection()
+        self.addCleanup(lambda: pool.get_pool(self.alias, settings_dict).close_all())
+        return wrapper
+
+    def test_released_connection_is_reused_last_in_first_out(self):
+        first, second = self.connect(), self.connect()
+        first_raw, second_raw = first.connection, second.connection
+        self.assertIsNot(first_raw, second_raw)
+        first.close()
+        second.close()
+
+        self.assertIs(self.connect().connection, second_raw)
+        self.assertIs(self.connect().connection, first_raw)
+        self.assertIsNot(self.connect().connection, first_raw)
+
+    def test_connection_past_its_max_age_is_recycled(self):
+        with mock.patch('core.db.pool.time.monotonic', return_value=1000.0):
+            wrapper = self.connect(recycle=60)
+            raw = wrapper.connection
+            wrapper.close()
+        with mock.patch('core.db.pool.time.monotonic', return_value=1030.0):
+            wrapper = self.connect(recycle=60)
+            self.assertIs(wrapper.connection, raw)
+            wrapper.close()
+        with mock.patch('core.db.pool.time.monotonic', return_value=1061.0):
+            self.assertIsNot(self.connect(recycle=60).connection, raw)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            raw.execute('SELECT 1')
+
+    def test_connection_failing_the_health_check_is_discarded(self):
+        wrapper = self.connect()
+        raw = wrapper.connection
+        wrapper.close()
+
+        settings_dict = wrapper.settings_dict
+        with mock.patch('core.db.backends.sqlite3_pooled.base.DatabaseWrapper.check_pooled_connection',
+                        side_effect=sqlite3.OperationalError('gone away')):
+            wrapper = ConnectionHandler({'default': settings_dict, self.alias: settings_dict})[self.alias]
+            wrapper.ensure_connection()
+        self.assertIsNot(wrapper.connection, raw)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            raw.execute('SELECT 1')
+        wrapper.close()
+
+    def test_open_transaction_is_rolled_back_before_reuse(self):
+        wrapper = self.connect()
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE pooled (id integer)')
+        wrapper.set_autocommit(False)
+        with wrapper.cursor() as cursor:
+            cursor.execute('INSERT INTO pooled VALUES (1)')
+        raw = wrapper.connection
+        self.assertTrue(raw.in_transaction)
+        wrapper.close()
+        self.assertFalse(raw.in_transaction)
+
+        wrapper = self.connect()
+        self.assertIs(wrapper.connection, raw)
+        self.assertTrue(wrapper.get_autocommit())
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM pooled')
+            self.assertEqual(cursor.fetchone(), (0,))
+        wrapper.close()
+
+    def test_pool_keeps_at_most_its_size_of_idle_connections(self):
+        wrappers = [self.connect(size=2) for _ in range(4)]
+        raws = [wrapper.connection for wrapper in wrappers]
+        for wrapper in wrappers:
+            wrapper.close()
+
+        self.assertEqual(pool.get_pool(self.alias, wrappers[0].settings_dict)._idle.qsize(), 2)
+        for raw in raws[2:]:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                raw.execute('SELECT 1')
+        self.assertEqual({id(self.connect(size=2).connection) for _ in range(2)}, {id(raw) for raw in raws[:2]})
+
+
+class SettleTests(BillManagementTestCase):
+    """Tests for the group settle-up engine."""
+
+    def test_simplify_debts_settles_every_balance(self):
+        net_balances = {'a': 50, 'b': -20, 'c': -20, 'd': -10}
+        transfers = settle.simplify_debts(net_balances)
+
+        self.assertEqual(len(transfers), 3)
+        for debtor, creditor, amount in transfers:
+            net_balances[debtor] += amount
+            net_balances[creditor] -= amount
+        self.assertEqual(set(net_balances.values()), {0})
+
+    def test_apply_replaces_chain_of_debts(self):
+        self.create_expense('fuel', 20, self.alice, [self.alice, self.bob])
+        self.create_expense('tolls', 20, self.bob, [self.bob, self.carol])
+
+        response = self.client.post(reverse('settle_group'), {'group_name': 'trip'}, format='json')
+        self.assertEqual(response.data['transfers'], [
+            {'from': self.carol.email, 'to': self.alice.email, 'amount': 10},
+        ])
+        self.assertFalse(models.Expense.objects.filter(payment=True).exists())
+
+        response = self.client.post(reverse('settle_group'), {'group_name': 'trip', 'apply': 'false'}, format='json')
+        self.assertFalse(response.data['applied'])
+        self.assertFalse(models.Expense.objects.filter(payment=True).exists())
+        response = self.client.post(reverse('settle_group'), {'group_name': 'trip', 'apply': 'maybe'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(reverse('settle_group'), {'group_name': 'trip', 'apply': True}, format='json')
+        self.assertTrue(response.data['applied'])
+        self.assertFalse(models.Expense.objects.filter(payment=False).exists())
+        self.assertEqual(list(self.group.debts.values_list('from_user', 'to_user', 'amount')),
+                         [(self.alice.id, self.carol.id, 10)])
+        self.assertEqual(settle.group_net_balances(self.group), {self.alice.id: 10, self.carol.id: -10})
+
+
+class LedgerTests(BillManagementTestCase):
+    """Tests for the balance ledger and its snapshots."""
+
+    def stored_balances(self, group):
+        return {(user_a_id, user_b_id): amount for user_a_id, user_b_id, amount in models.Balance.objects.filter(
+            group=group).exclude(amount=0).values_list('user_a_id', 'user_b_id', 'amount')}
+
+    def write_history(self):
+        self.create_expense('fuel', 30, self.alice, [self.alice, self.bob, self.carol])
+        self.create_expense('tolls', 20, self.bob, [self.bob, self.carol])
+        self.client.post(reverse('record_payment'), {
+            'from_user': self.carol.email, 'to_user': self.alice.email, 'amount': 4,
+            'group_name': 'trip', 'expense_name': 'fuel',
+        }, format='json')
+        settle.apply_settlement(self.group)
+
+    def test_every_change_is_recorded(self):
+        self.write_history()
+        self.assertEqual(set(models.LedgerEntry.objects.values_list('kind', flat=True)),
+                         {models.LedgerEntry.EXPENSE, models.LedgerEntry.PAYMENT, models.LedgerEntry.SETTLEMENT})
+        self.assertEqual(ledger.balances(self.group.id), self.stored_balances(self.group))
+        self.assertEqual(ledger.balances(), self.stored_balances(None))
+
+    @override_settings(LEDGER_SNAPSHOT_LAG_SECONDS=0)
+    def test_balances_are_snapshot_plus_tail(self):
+        self.create_expense('fuel', 30, self.alice, [self.alice, self.bob, self.carol])
+        self.assertEqual(ledger.take_snapshots(min_entries=3), 0)
+        self.assertEqual(ledger.take_snapshots(min_entries=1), 2)
+        self.assertEqual(call_command_output('snapshot_balances', min_entries=1), 'Stored 0 balance snapshots.\n')
+        snapshotted = self.stored_balances(self.group)
+
+        self.create_expense('tolls', 20, self.bob, [self.bob, self.carol])
+        expected = self.stored_balances(self.group)
+        with self.assertNumQueries(2):
+            self.assertEqual(ledger.balances(self.group.id), expected)
+        snapshot = models.BalanceSnapshot.objects.get(group=self.group)
+        self.assertEqual(ledger.balances(self.group.id, snapshot.last_entry_id), snapshotted)
+
+    def test_rebuild_restores_balances(self):
+        self.write_history()
+        expected = {None: self.stored_balances(None), self.group.id: self.stored_balances(self.group)}
+        balance = models.Balance.objects.filter(group=self.group).exclude(amount=0).first()
+        models.Balance.objects.filter(pk=balance.pk).update(amount=balance.amount + 7)
+        models.Balance.objects.filter(user_a=balance.user_a_id, user_b=balance.user_b_id, group=None).delete()
+
+        self.assertIn('2 balances would be corrected', call_command_output('rebuild_balances', dry_run=True, workers=1))
+        self.assertIn('2 balances corrected', call_command_output('rebuild_balances', chunk_size=2, workers=1))
+        self.assertEqual({None: self.stored_balances(None), self.group.id: self.stored_balances(self.group)}, expected)
+        self.assertEqual(ledger.balances(self.group.id), expected[self.group.id])
+
+
+class RebuildBalancesTests(TransactionTestCase):
+    """Tests for replaying the ledger on several connections."""
+
+    def test_parallel_replay_matches_balances(self):
+        users = [create_participant(f'user{index}@example.com') for index in range(4)]
+        group = models.Group.objects.create(group_name='trip')
+        expenses.create_expenses([
+            (models.Expense(name=f'expense {index}', description='x', amount=12, expense_group=group if index % 2 else None),
+             users[index % 4].id, [user.id for user in users[:index % 3 + 2]])
+            for index in range(20)
+        ])
+        totals, _, chunks = ledger.replay(chunk_size=5, workers=3)
+
+        self.assertGreater(chunks, 3)
+        self.assertEqual({key: amount for key, amount in totals.items() if amount}, {
+            (user_a_id, user_b_id, group_id): amount for user_a_id, user_b_id, group_id, amount in
+            models.Balance.objects.exclude(amount=0).values_list('user_a_id', 'user_b_id', 'group_id', 'amount')
+        })
+
+    def test_writes_during_the_replay_are_kept(self):
+        alice, bob = create_participant('alice@example.com'), create_participant('bob@example.com')
+        group = models.Group.objects.create(group_name='trip')
+        expenses.create_expenses([(models.Expense(name='rent', description='x', amount=40, expense_group=group),
+                                   alice.id, [alice.id, bob.id])])
+        replay = ledger.replay
+
+        def replay_then_write(*args):
+            result = replay(*args)
+            expenses.create_expenses([(models.Expense(name='fuel', description='x', amount=10, expense_group=group),
+                                       alice.id, [alice.id, bob.id])])
+            return result
+
+        with mock.patch.object(ledger, 'replay', side_effect=replay_then_write):
+            result = ledger.rebuild_balances(workers=1)
+
+        self.assertEqual(result['corrected'], 0)
+        self.assertEqual(result['last_entry_id'], models.LedgerEntry.objects.latest('id').id)
+        self.assertEqual({(group_id, abs(amount)) for group_id, amount in models.Balance.objects.values_list(
+            'group_id', 'amount')}, {(group.id, 25), (None, 25)})
+        self.assertEqual(ledger.balances(group.id), ledger.balances())
 
-# Create your tests here.
@@ -1,15 +1,38 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# The read endpoints are served by their async versions when running under ASGI
+if settings.ASYNC_READ_VIEWS:
+    show_group_members = async_views.ShowGroupMembersView.as_view()
+    show_group_details = async_views.ShowGroupDetailsView.as_view()
+    show_user_details = async_views.ShowUserDetailsView.as_view()
+else:
+    show_group_members = views.ShowGroupMembersApiView.as_view()
+    show_group_details = views.ShowGroupDetailsApiView.as_view()
+    show_user_details = views.ShowUserDetailsApiView.as_view()
 
 urlpatterns = [
     # Group-related endpoints
     path('groups/create/', views.CreateGroupApiView.as_view(), name='create_group'),
     path('groups/add_user/', views.AddUserToGroupApiView.as_view(), name='add_user_to_group'),
-    path('groups/members/', views.ShowGroupMembersApiView.as_view(), name='show_group_members'),
+    path('groups/remove_users/', views.RemoveUsersFromGroupApiView.as_view(), name='remove_users_from_group'),
+    path('groups/members/', show_group_members, name='show_group_members'),
     path('groups/delete/', views.DeleteGroupApiView.as_view(), name='delete_group'),
-    path('groups/details/', views.ShowGroupDetailsApiView.as_view(), name='show_group_details'),
+    path('groups/details/', show_group_details, name='show_group_details'),
+    path('groups/export/', views.ExportGroupApiView.as_view(), name='export_group'),
+    path('groups/settle/', views.SettleGroupApiView.as_view(), name='settle_group'),
+    path('groups/events/', async_views.GroupEventsView.as_view(), name='group_events'),
+
+    # User-related endpoints
+    path('users/details/', show_user_details, name='show_user_details'),
+    path('users/events/', async_views.UserEventsView.as_view(), name='user_events'),
 
     # Expense-related endpoints
     path('expenses/create/', views.CreateExpenseApiView.as_view(), name='create_expense'),
+    path('expenses/import/', views.ImportExpensesApiView.as_view(), name='import_expenses'),
     path('expenses/record_payment/', views.RecordPaymentApiView.as_view(), name='record_payment'),
+
+    # Runs several of the endpoints above in one request
+    path('batch/', views.BatchApiView.as_view(), name='batch'),
 ]
@@ -1,30 +1,35 @@
+import io
+import os
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import BooleanField, IntegerField
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from BillManagement import models, serializers
+from rest_framework.parsers import MultiPartParser
+from BillManagement import balances, batch, caching, expenses, exporter, fx, idempotency, importer, lookups, models, money, pagination, payments, reads, serializers, settle, splits
 from user.models import UserInfo as UserProfile
 
 
 class CreateGroupApiView(APIView):
     """Group Creation View"""
-    serializer_class = serializers.GroupSerializer
+    serializer_class = serializers.GroupCreateSerializer
     permission_classes = [IsAuthenticated]
 
     def post(self, request) -> Response:
         """Creates a group and adds members"""
         members_emails = request.data.get('members', [])
-        member_ids = []
-
-        for email in members_emails:
-            try:
-                user = UserProfile.objects.get(email=email)
-                member_ids.append(user.id)
-            except UserProfile.DoesNotExist:
-                return Response({'error': f'User with email {email} does not exist!'},
-                                status=status.HTTP_400_BAD_REQUEST)
+        try:
+            member_ids = lookups.resolve_emails(members_emails)
+        except lookups.InvalidEmails as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except lookups.UnknownEmails as e:
+            return Response({'error': f'{e}!', 'missing_emails': e.emails}, status=status.HTTP_400_BAD_REQUEST)
 
-        request.data['members'] = member_ids
+        request.data['members'] = list(dict.fromkeys(member_ids[email] for email in members_emails))
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -34,24 +39,59 @@ class CreateGroupApiView(APIView):
 
 
 class AddUserToGroupApiView(APIView):
-    """Add member to existing group"""
+    """Add members to existing group"""
     permission_classes = [IsAuthenticated]
 
     def post(self, request) -> Response:
-        """Adds a user to a group"""
+        """Adds one user (user_email) or many users (user_emails) to a group"""
         group_name = request.data.get('group_name')
         user_email = request.data.get('user_email')
+        user_emails = request.data.get('user_emails') or [user_email]
         try:
-            user = UserProfile.objects.get(email=user_email)
-            group = models.Group.objects.get(group_name=group_name)
-        except (UserProfile.DoesNotExist, models.Group.DoesNotExist):
+            group = lookups.get_group(group_name)
+            user_ids = lookups.resolve_emails(user_emails)
+        except models.Group.DoesNotExist:
             return Response({'error': 'User or Group does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        except lookups.InvalidEmails as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except lookups.UnknownEmails as e:
+            return Response({'error': 'User or Group does not exist', 'missing_emails': e.emails},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        added = group.add_members(user_ids.values())
+        if 'user_emails' not in request.data:
+            if not added:
+                return Response({'message': 'User is already a member of this group'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            return Response({'message': f'User "{user_email}" added to group "{group.group_name}" successfully'},
+                            status=status.HTTP_200_OK)
+        return Response({
+            'message': f'{len(added)} users added to group "{group.group_name}" successfully',
+            'added': [email for email, user_id in user_ids.items() if user_id in added],
+            'already_members': [email for email, user_id in user_ids.items() if user_id not in added],
+        }, status=status.HTTP_200_OK)
+
+
+class RemoveUsersFromGroupApiView(APIView):
+    """Remove members from existing group"""
+    permission_classes = [IsAuthenticated]
 
-        if user in group.members.all():
-            return Response({'message': 'User is already a member of this group'}, status=status.HTTP_400_BAD_REQUEST)
+    def post(self, request) -> Response:
+        """Removes one user (user_email) or many users (user_emails) from a group"""
+        group_name = request.data.get('group_name')
+        user_emails = request.data.get('user_emails') or [request.data.get('user_email')]
+        try:
+            group = lookups.get_group(group_name)
+            user_ids = lookups.resolve_emails(user_emails)
+        except models.Group.DoesNotExist:
+            return Response({'error': 'Group does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        except lookups.InvalidEmails as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except lookups.UnknownEmails as e:
+            return Response({'error': str(e), 'missing_emails': e.emails}, status=status.HTTP_404_NOT_FOUND)
 
-        group.members.add(user)
-        return Response({'message': f'User "{user_email}" added to group "{group.group_name}" successfully'},
+        removed = group.remove_members(user_ids.values())
+        return Response({'message': f'{removed} users removed from group "{group.group_name}"', 'removed': removed},
                         status=status.HTTP_200_OK)
 
 
@@ -63,11 +103,18 @@ class ShowGroupMembersApiView(APIView):
         """Displays members of a group"""
         group_name = request.GET.get('name')
         try:
-            group = models.Group.objects.get(group_name=group_name)
-            members = [str(member) for member in group.members.all()]
-            return Response({'members': members}, status=status.HTTP_200_OK)
+            group = lookups.get_group(group_name)
+
+            def members_page():
+                members, next_cursor = pagination.paginate(
+                    request, reads.members_queryset(group), reads.MEMBERS_ORDERING)
+                return reads.members_data(group, members, next_cursor)
+
+            return caching.conditional_response(request, caching.GROUP, group.id, 'members', members_page)
         except models.Group.DoesNotExist:
             return Response({'error': 'Group does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class ShowUserDetailsApiView(APIView):
@@ -77,33 +124,19 @@ class ShowUserDetailsApiView(APIView):
     def get(self, request) -> Response:
         user_email = request.GET.get('email')
         try:
-            user = UserProfile.objects.get(email=user_email)
-            debts_from = models.Debt.objects.filter(from_user=user)
-            debts_to = models.Debt.objects.filter(to_user=user)
-            debt_summary = {}
-            total_debt = 0
-            total_credit = 0
-
-            for debt in debts_from:
-                debt_summary[debt.to_user.name] = debt_summary.get(debt.to_user.name, 0) - debt.amount
-                total_debt -= debt.amount
-            for debt in debts_to:
-                debt_summary[debt.from_user.name] = debt_summary.get(debt.from_user.name, 0) + debt.amount
-                total_credit += debt.amount
-
-            summary = [
-                f'User "{user.name}" owes {amount} to "{user}"' if amount > 0 else f'User "{user.name}" is owed {-amount} by "{user}"'
-                for user, amount in debt_summary.items() if amount != 0
-            ]
+            user = lookups.get_profile(user_email)
+
+            def summary_page():
+                rows, next_cursor = pagination.paginate(
+                    request, balances.user_balances(user), reads.BALANCES_ORDERING)
+                owes, owed = balances.user_totals(user)
+                return reads.user_details_data(user, rows, next_cursor, owes, owed)
 
-            return Response({
-                'user': str(user),
-                'total_debt': total_debt,
-                'total_credit': total_credit,
-                'debt_summary': summary
-            }, status=status.HTTP_200_OK)
+            return caching.conditional_response(request, caching.USER, user.id, 'details', summary_page)
         except UserProfile.DoesNotExist:
             return Response({'error': 'User does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class CreateExpenseApiView(APIView):
@@ -111,6 +144,7 @@ class CreateExpenseApiView(APIView):
     serializer_class = serializers.ExpenseSerializer
     permission_classes = [IsAuthenticated]
 
+    @idempotency.idempotent
     def post(self, request) -> Response:
         """Creates an expense and assigns it to users"""
         description = request.data.get('description')
@@ -119,45 +153,79 @@ class CreateExpenseApiView(APIView):
         amount = request.data.get('amount')
         group_name = request.data.get('group_name', None)
         expense_name = request.data.get('name')
+        split_type = request.data.get('split_type') or splits.EQUAL
+        split = request.data.get('split')
+        currency = request.data.get('currency')
 
-        if models.Expense.objects.filter(name=expense_name).exists():
+        if lookups.expense_queryset(expense_name).exists():
             return Response({'error': 'Expense name must be unique'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            users = UserProfile.objects.filter(email__in=users_emails)
-            paid_by_user = UserProfile.objects.get(email=paid_by_email)
-            group = models.Group.objects.get(group_name=group_name) if group_name else None
-        except (UserProfile.DoesNotExist, models.Group.DoesNotExist):
+            user_ids = lookups.resolve_emails([paid_by_email, *lookups.check_emails(users_emails)])
+            group = lookups.get_group(group_name) if group_name else None
+        except models.Group.DoesNotExist:
             return Response({'error': 'User or Group does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        except lookups.InvalidEmails as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except lookups.UnknownEmails as e:
+            return Response({'error': 'User or Group does not exist', 'missing_emails': e.emails},
+                            status=status.HTTP_404_NOT_FOUND)
 
-        share_per_user = amount / len(users)
-        expense_users = []
-        repayments = []
-
-        for user in users:
-            if user != paid_by_user:
-                debt = models.Debt.objects.create(from_user=paid_by_user, to_user=user, amount=share_per_user)
-                repayments.append(debt)
-            expense_user = models.ExpenseUser.objects.create(
-                user=user,
-                paid_share=share_per_user if user == paid_by_user else 0,
-                owed_share=share_per_user,
-                net_balance=-share_per_user if user != paid_by_user else amount - share_per_user
-            )
-            expense_users.append(expense_user)
-
-        expense = models.Expense.objects.create(
+        emails = list(dict.fromkeys(users_emails))
+        try:
+            currency = money.validate_currency(currency or (group.currency if group else money.default_currency()))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            values = None
+            if split_type != splits.EQUAL:
+                if not isinstance(split, dict) or set(split) != set(emails):
+                    raise splits.SplitError('Split must map the email of every user to their value')
+                values = [split[email] for email in emails]
+            amount = splits.parse_amount(amount)
+            owed_shares = splits.split_amounts(amount, split_type, len(emails), values)
+        except splits.SplitError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        expense = models.Expense(
             expense_group=group,
             description=description,
             amount=amount,
+            currency=currency,
             name=expense_name
         )
-        expense.repayments.set(repayments)
-        expense.users.set(expense_users)
-        expense.save()
+        try:
+            expenses.create_expenses([
+                (expense, user_ids[paid_by_email], [user_ids[email] for email in emails], owed_shares)
+            ])
+        except IntegrityError:
+            return Response({'error': 'Expense name must be unique'}, status=status.HTTP_400_BAD_REQUEST)
+        except fx.MissingRate as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'message': 'Expense created successfully'}, status=status.HTTP_201_CREATED)
 
 
+class ImportExpensesApiView(APIView):
+    """Expense Import View"""
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request) -> Response:
+        """Imports expenses from an uploaded CSV or JSONL file"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get('file_format') or os.path.splitext(upload.name)[1].lstrip('.').lower()
+        if file_format not in importer.FORMATS:
+            return Response({'error': f'Unsupported format, expected one of {", ".join(importer.FORMATS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        summary = importer.import_expenses(importer.read_rows(stream, file_format))
+        return Response(summary, status=status.HTTP_200_OK)
+
+
 class ShowGroupDetailsApiView(APIView):
     """Show group details"""
     permission_classes = [IsAuthenticated]
@@ -165,20 +233,41 @@ class ShowGroupDetailsApiView(APIView):
     def get(self, request) -> Response:
         group_name = request.GET.get('name')
         try:
-            group = models.Group.objects.get(group_name=group_name)
-            expenses = models.Expense.objects.filter(expense_group=group, payment=False)
-            expense_details = [
-                {
-                    "name": expense.name,
-                    "description": expense.description,
-                    "repayments": [str(rep) for rep in expense.repayments.all() if
-                                   rep.from_user != rep.to_user and rep.amount != 0]
-                } for expense in expenses
-            ]
-            return Response({'expenses': expense_details}, status=status.HTTP_200_OK)
+            group = lookups.get_group(group_name)
+
+            def details_page():
+                expenses, next_cursor = pagination.paginate(
+                    request, reads.details_queryset(group), reads.DETAILS_ORDERING)
+                return reads.details_data(expenses, next_cursor)
+
+            return caching.conditional_response(request, caching.GROUP, group.id, 'details', details_page)
+        except models.Group.DoesNotExist:
+            return Response({'error': 'Group does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ExportGroupApiView(APIView):
+    """Export group ledger"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Streams a group's expenses, repayments and settlements as CSV or JSON lines"""
+        group_name = request.GET.get('name')
+        file_format = request.GET.get('file_format', 'csv')
+        if file_format not in exporter.FORMATS:
+            return Response({'error': f'Unsupported format, expected one of {", ".join(exporter.FORMATS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            group = lookups.get_group(group_name)
         except models.Group.DoesNotExist:
             return Response({'error': 'Group does not exist'}, status=status.HTTP_404_NOT_FOUND)
 
+        response = StreamingHttpResponse(exporter.render(exporter.export_rows(group), file_format),
+                                         content_type=exporter.FORMATS[file_format])
+        response['Content-Disposition'] = f'attachment; filename="{group.id}.{file_format}"'
+        return response
+
 
 class DeleteUserApiView(APIView):
     """Delete user"""
@@ -187,7 +276,13 @@ class DeleteUserApiView(APIView):
     def delete(self, request) -> Response:
         user_email = request.GET.get('email')
         try:
-            user = UserProfile.objects.get(email=user_email)
+            user = lookups.get_profile(user_email)
+            counterparty_ids = [
+                user_id for pair in models.Balance.objects.filter(Q(user_a=user) | Q(user_b=user)).values_list(
+                    'user_a_id', 'user_b_id') for user_id in pair
+            ]
+            caching.invalidate(caching.USER, counterparty_ids)
+            caching.invalidate(caching.GROUP, user.group_set.values_list('id', flat=True))
             user.delete()
             return Response({'message': 'User deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
         except UserProfile.DoesNotExist:
@@ -201,7 +296,7 @@ class DeleteGroupApiView(APIView):
     def delete(self, request) -> Response:
         group_name = request.GET.get('name')
         try:
-            group = models.Group.objects.get(group_name=group_name)
+            group = lookups.get_group(group_name)
             group.delete()
             return Response({'message': 'Group deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
         except models.Group.DoesNotExist:
@@ -212,23 +307,29 @@ class RecordPaymentApiView(APIView):
     """Record payment"""
     permission_classes = [IsAuthenticated]
 
+    @idempotency.idempotent
     def post(self, request) -> Response:
         from_user_email = request.data.get('from_user')
         to_user_email = request.data.get('to_user')
-        amount = request.data.get('amount')
         group_name = request.data.get('group_name')
         expense_name = request.data.get('expense_name')
+        try:
+            amount = IntegerField(min_value=1).run_validation(request.data.get('amount'))
+        except ValidationError:
+            return Response({'error': 'Amount must be a positive whole number'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            from_user = UserProfile.objects.get(email=from_user_email)
-            to_user = UserProfile.objects.get(email=to_user_email)
-        except UserProfile.DoesNotExist:
-            return Response({'error': 'User does not exist'}, status=status.HTTP_404_NOT_FOUND)
+            user_ids = lookups.resolve_emails([from_user_email, to_user_email])
+        except lookups.InvalidEmails as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except lookups.UnknownEmails as e:
+            return Response({'error': 'User does not exist', 'missing_emails': e.emails},
+                            status=status.HTTP_404_NOT_FOUND)
 
         if group_name:
             try:
-                expense = models.Expense.objects.get(name=expense_name)
-                group = models.Group.objects.get(group_name=group_name)
+                expense = lookups.expense_queryset(expense_name).get()
+                group = lookups.get_group(group_name)
             except (models.Expense.DoesNotExist, models.Group.DoesNotExist):
                 return Response({'error': 'Expense or Group does not exist'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -236,19 +337,73 @@ class RecordPaymentApiView(APIView):
                 return Response({'error': 'Expense is not associated with this group'},
                                 status=status.HTTP_400_BAD_REQUEST)
 
-            for repayment in expense.repayments.all():
-                if repayment.from_user == to_user and repayment.to_user == from_user:
-                    if repayment.amount < amount:
-                        return Response({'error': 'Insufficient repayment amount'}, status=status.HTTP_400_BAD_REQUEST)
-                    repayment.amount -= amount
-                    repayment.save()
-                    break
+            try:
+                payments.record_payment(expense, user_ids[from_user_email], user_ids[to_user_email], amount)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            except payments.PaymentConflict as e:
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+            return Response({'message': 'Expense payment recorded successfully'}, status=status.HTTP_200_OK)
+
+
+class SettleGroupApiView(APIView):
+    """Settle up group"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request) -> Response:
+        """Returns the transfers that settle a group, optionally applying them as its new debts"""
+        group_name = request.data.get('group_name')
+        try:
+            apply = BooleanField().to_internal_value(request.data.get('apply', False))
+        except ValidationError:
+            return Response({'error': 'apply must be a boolean'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            group = lookups.get_group(group_name)
+        except models.Group.DoesNotExist:
+            return Response({'error': 'Group does not exist'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            if apply:
+                transfers = settle.apply_settlement(group)
             else:
-                debt = models.Debt.objects.create(from_user=to_user, to_user=from_user, amount=amount)
-                expense.repayments.add(debt)
+                transfers = settle.convert_transfers(
+                    settle.simplify_debts(settle.group_net_balances(group)), group.currency)
+        except fx.MissingRate as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        user_ids = {user_id for transfer in transfers for user_id in transfer[:2]}
+        emails = dict(UserProfile.objects.filter(id__in=user_ids).values_list('id', 'user__email'))
+        return Response({
+            'applied': apply,
+            'currency': group.currency,
+            'transfers': [
+                {'from': emails[debtor_id], 'to': emails[creditor_id], 'amount': amount}
+                for debtor_id, creditor_id, amount in transfers
+            ]
+        }, status=status.HTTP_200_OK)
 
-            expense.save()
-            if all(rep.amount <= 0 for rep in expense.repayments.all()):
-                expense.payment = True
-                expense.save()
-            return Response({'message': 'Expense payment recorded successfully'}, status=status.HTTP_200_OK)
+
+class BatchApiView(APIView):
+    """Run several requests in one"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request) -> Response:
+        """Runs a list of sub-requests against the other endpoints and returns all their results"""
+        operations = request.data.get('operations')
+        try:
+            atomic = BooleanField().to_internal_value(request.data.get('atomic', False))
+        except ValidationError:
+            return Response({'error': 'atomic must be a boolean'}, status=status.HTTP_400_BAD_REQUEST)
+        rolled_back = False
+        try:
+            if atomic:
+                with transaction.atomic():
+                    results = batch.run_batch(request, operations, stop_on_failure=True)
+                    if any(batch.is_failure(result) for result in results):
+                        transaction.set_rollback(True)
+                        rolled_back = True
+            else:
+                results = batch.run_batch(request, operations)
+        except batch.BatchError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results, 'rolled_back': rolled_back}, status=status.HTTP_200_OK)
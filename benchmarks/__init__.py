@@ -0,0 +1,38 @@
+"""
+Benchmarks for the split_wise backend.
+
+Each module is run from the project root with ``python -m benchmarks.<module>``.
+"""
+import os
+import time
+import django
+from dotenv import load_dotenv
+
+
+def setup():
+    """
+    Loads the environment files and configures Django the same way manage.py does.
+    """
+    load_dotenv(dotenv_path='env/.env.secrets')
+    load_dotenv(dotenv_path='env/.env.shared')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    django.setup()
+
+
+def best_of(func, repeat=5):
+    """
+    Runs a callable several times and returns the fastest wall-clock time.
+
+    Args:
+        func (callable): The callable to time.
+        repeat (int): Number of runs.
+
+    Returns:
+        float: The fastest run in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
@@ -0,0 +1,215 @@
+"""
+Load test of the read endpoints served over WSGI and over ASGI.
+
+Seeds a temporary SQLite database with a group, its members and expenses, then sends a mix of
+group members, group details and user details requests through the WSGI application with a pool
+of worker threads (one by default, like a gunicorn sync worker) and through the ASGI application
+with many requests in flight on one event loop, where they are served by the async views.
+
+Each mode runs in its own process because the read views are chosen when the URLs are loaded.
+``--db-latency-ms`` adds a delay to every query to stand in for the network round trip to a
+database server, which is where async views pay off; the result cache is disabled so every
+request reaches the database.
+
+Usage: python -m benchmarks.bench_asgi [--requests 2000] [--concurrency 50] [--db-latency-ms 2]
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks import setup
+
+MODES = ('wsgi', 'asgi')
+MEMBERS = 20  # Members of the seeded group
+EXPENSES = 100  # Expenses of the seeded group, each split between four members
+PATHS = [  # Requests sent in turn, as (path, query string)
+    ('/api/bill/groups/members/', 'name=bench'),
+    ('/api/bill/groups/details/', 'name=bench'),
+    ('/api/bill/users/details/', 'email=member1%40example.com'),
+]
+
+
+def configure(database, db_latency):
+    """Points the default database at the benchmark file and delays every query."""
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    connections.settings['default'].update(ENGINE='django.db.backends.sqlite3', NAME=database, OPTIONS={})
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(db_latency)
+        return execute(sql, params, many, context)
+
+    def install_delay(sender, connection, **kwargs):
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    if db_latency:
+        connection_created.connect(install_delay, weak=False)
+
+
+def seed():
+    """Migrates the benchmark database and creates a group with its members and expenses."""
+    from django.core.management import call_command
+    from BillManagement import expenses, models
+    from user.models import User, UserInfo
+
+    call_command('migrate', verbosity=0)
+    profiles = []
+    for index in range(MEMBERS):
+        user = User.objects.create_user(email=f'member{index}@example.com', password=None, is_active=True)
+        profiles.append(UserInfo.objects.create(
+            user=user, first_name='Member', last_name=str(index), date_of_birth='1990-01-01',
+            phone_number='+14155552671', street_address='1 Main St', city='City', state_province='State',
+            postal_code='00000', country='US',
+        ))
+    group = models.Group.objects.create(group_name='bench')
+    group.add_members([profile.id for profile in profiles])
+    expenses.create_expenses([
+        (models.Expense(expense_group=group, description='bench', amount=40, name=f'expense {index}'),
+         profiles[index % MEMBERS].id, [profiles[(index + offset) % MEMBERS].id for offset in range(4)])
+        for index in range(EXPENSES)
+    ])
+
+
+def wsgi_request(application, path, query, token):
+    """Sends one GET request through the WSGI application and returns its status code."""
+    statuses = []
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': 'localhost',
+        'HTTP_AUTHORIZATION': f'Bearer {token}', 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+        'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    body = application(environ, lambda status, headers: statuses.append(int(status.split()[0])))
+    b''.join(body)
+    body.close()
+    return statuses[0]
+
+
+async def asgi_request(application, path, query, token):
+    """Sends one GET request through the ASGI application and returns its status code."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    messages = []
+    requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    finished = asyncio.Event()
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # The client stays connected until the whole response is sent
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+        if message['type'] == 'http.response.body' and not message.get('more_body'):
+            finished.set()
+
+    await application(scope, receive, send)
+    return messages[0]['status']
+
+
+def run_wsgi(token, requests, threads):
+    """Sends the requests through the WSGI application and returns their latencies."""
+    from core.wsgi import application
+
+    def timed(index):
+        start = time.perf_counter()
+        status = wsgi_request(application, *PATHS[index % len(PATHS)], token)
+        assert status == 200, status
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(timed, range(requests)))
+
+
+def run_asgi(token, requests, concurrency):
+    """Sends the requests through the ASGI application and returns their latencies."""
+    from core.asgi import application
+
+    async def client(indexes, latencies):
+        for index in indexes:
+            start = time.perf_counter()
+            status = await asgi_request(application, *PATHS[index % len(PATHS)], token)
+            assert status == 200, status
+            latencies.append(time.perf_counter() - start)
+
+    async def load():
+        latencies = []
+        await asyncio.gather(*(client(range(offset, requests, concurrency), latencies)
+                               for offset in range(concurrency)))
+        return latencies
+
+    return asyncio.run(load())
+
+
+def run_mode(args):
+    """Seeds the database or runs one mode in this process, printing its result line."""
+    setup()
+    configure(args.database, args.db_latency_ms / 1000)
+    if args.seed:
+        seed()
+        return
+    from rest_framework_simplejwt.tokens import AccessToken
+    from user.models import User
+
+    token = str(AccessToken.for_user(User.objects.get(email='member0@example.com')))
+    start = time.perf_counter()
+    if args.mode == 'wsgi':
+        latencies = run_wsgi(token, args.requests, args.wsgi_threads)
+        workers = f'{args.wsgi_threads} thread(s)'
+    else:
+        latencies = run_asgi(token, args.requests, args.concurrency)
+        workers = f'{args.concurrency} in flight'
+    elapsed = time.perf_counter() - start
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f'{args.mode:<6} {workers:<16} {args.requests / elapsed:>10.0f} {quantiles[49] * 1000:>9.1f} '
+          f'{quantiles[98] * 1000:>9.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50, help='requests in flight under ASGI')
+    parser.add_argument('--wsgi-threads', type=int, default=1, help='worker threads under WSGI')
+    parser.add_argument('--db-latency-ms', type=float, default=2)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    parser.add_argument('--seed', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.database:
+        run_mode(args)
+        return
+
+    handle, database = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(handle)
+    options = [f'--database={database}', f'--requests={args.requests}', f'--concurrency={args.concurrency}',
+               f'--wsgi-threads={args.wsgi_threads}']
+    command = [sys.executable, '-m', 'benchmarks.bench_asgi', *options]
+    env = dict(os.environ, CACHE_BACKEND='django.core.cache.backends.dummy.DummyCache')
+    try:
+        subprocess.run([*command, '--seed', '--db-latency-ms=0'], env=env, check=True)
+        print(f'{args.requests} requests per mode, {args.db_latency_ms:g}ms simulated latency per query')
+        print(f'{"mode":<6} {"workers":<16} {"requests/s":>10} {"p50 ms":>9} {"p99 ms":>9}')
+        for mode in MODES:
+            subprocess.run([*command, f'--mode={mode}', f'--db-latency-ms={args.db_latency_ms}'], check=True,
+                           env=dict(env, ASYNC_READ_VIEWS=str(mode == 'asgi')))
+    finally:
+        os.remove(database)
+
+
+if __name__ == '__main__':
+    main()
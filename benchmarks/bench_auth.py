@@ -0,0 +1,58 @@
+"""
+Benchmark of authentication overhead per request.
+
+Authenticates the same bearer token with the stock JWTAuthentication, which loads the user row,
+and with the stateless authentication, which reads the active flag from its in-process cache.
+A throwaway user is created inside a transaction that is rolled back afterwards.
+
+Usage: python -m benchmarks.bench_auth [--requests 5000]
+"""
+import argparse
+import uuid
+from benchmarks import best_of, setup
+
+
+def authenticate_many(authentication, request, requests):
+    """Authenticates the request the given number of times."""
+    for _ in range(requests):
+        authentication.authenticate(request)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.tokens import AccessToken
+    from user.authentication import StatelessJWTAuthentication
+    from user.models import User
+
+    authentications = {
+        'JWTAuthentication': JWTAuthentication(),
+        'StatelessJWTAuthentication': StatelessJWTAuthentication(),
+    }
+    with transaction.atomic():
+        user = User.objects.create_user(email=f'bench-{uuid.uuid4()}@example.com', password=None, is_active=True)
+        token = AccessToken.for_user(user)
+        request = Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+
+        print(f'{connection.vendor} database, {args.requests} requests per authentication class')
+        print(f'{"authentication":<28} {"queries/request":>16} {"us/request":>12}')
+        for name, authentication in authentications.items():
+            authentication.authenticate(request)
+            with CaptureQueriesContext(connection) as queries:
+                authenticate_many(authentication, request, args.requests)
+            elapsed = best_of(lambda: authenticate_many(authentication, request, args.requests), args.repeat)
+            print(f'{name:<28} {len(queries) / args.requests:>16.2f} {elapsed / args.requests * 1e6:>12.1f}')
+        transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark of database connection handling per request.
+
+Compares opening a connection per request, persistent connections with health checks and the
+pooled backend, using the configured MySQL database or a temporary SQLite file as a stand-in.
+
+Usage: python -m benchmarks.bench_connections [--requests 2000]
+"""
+import argparse
+import os
+import tempfile
+import time
+from benchmarks import setup
+
+ENGINES = {
+    'mysql': ('django.db.backends.mysql', 'core.db.backends.mysql_pooled'),
+    'sqlite': ('django.db.backends.sqlite3', 'core.db.backends.sqlite3_pooled'),
+}
+
+
+def run_requests(alias, requests):
+    """Runs one query per simulated request and returns the requests per second."""
+    from django.core.signals import request_finished, request_started
+    from django.db import connections
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        request_started.send(sender=None)
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        request_finished.send(sender=None)
+    elapsed = time.perf_counter() - start
+    connections[alias].close()
+    return requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connections
+
+    default = connections['default'].settings_dict
+    vendor = connections['default'].vendor
+    if vendor not in ENGINES:
+        vendor = 'sqlite'
+    base = dict(default)
+    if vendor == 'sqlite':
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        base.update(NAME=path, OPTIONS={})
+    plain_engine, pooled_engine = ENGINES[vendor]
+
+    configurations = {
+        'connect per request': dict(base, ENGINE=plain_engine, CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False),
+        'persistent + checks': dict(base, ENGINE=plain_engine, CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True),
+        'pooled': dict(base, ENGINE=pooled_engine, CONN_MAX_AGE=0, POOL={'SIZE': 4}),
+    }
+    print(f'{vendor} database, {args.requests} requests per configuration')
+    print(f'{"configuration":<22} {"requests/s":>12}')
+    for name, settings_dict in configurations.items():
+        alias = f'bench_{name.replace(" ", "_").replace("+", "")}'
+        connections.settings[alias] = connections.configure_settings({'default': default, alias: settings_dict})[alias]
+        print(f'{name:<22} {run_requests(alias, args.requests):>12.0f}')
+
+    if vendor == 'sqlite':
+        os.remove(base['NAME'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark for converting amounts with the in-memory exchange rate table.
+
+Compares ``RateTable.convert`` with converting one row at a time through a per-currency
+bisect over the same rates, for growing batches of amounts in several currencies and dates.
+
+Usage: python -m benchmarks.bench_fx [--rows 1000 10000 100000]
+"""
+import argparse
+import bisect
+import random
+from datetime import date, timedelta
+from benchmarks import best_of, setup
+
+CURRENCIES = ('USD', 'EUR', 'GBP', 'JPY', 'INR')
+DAYS = 3650  # Days of daily rates per currency
+START = date(2015, 1, 1)
+
+
+def random_rates(seed=0):
+    """Returns ``(currency, date, rate)`` tuples with a daily rate for every non-base currency."""
+    rng = random.Random(seed)
+    return [(currency, START + timedelta(days=day), rng.uniform(0.5, 150))
+            for currency in CURRENCIES[1:] for day in range(DAYS)]
+
+
+def per_row_lookup(rates):
+    """Returns a function converting one amount at a time, the baseline being measured against."""
+    from BillManagement.money import MINOR_UNITS
+
+    days = {}
+    values = {}
+    for currency, day, rate in sorted(rates):
+        days.setdefault(currency, []).append(day)
+        values.setdefault(currency, []).append(rate)
+
+    def rate(currency, day):
+        if currency == 'USD':
+            return 1.0
+        return values[currency][bisect.bisect_right(days[currency], day) - 1]
+
+    def convert(amount, currency, day, to_currency):
+        return round(amount * rate(to_currency, day) / rate(currency, day)
+                     * 10.0 ** (MINOR_UNITS[to_currency] - MINOR_UNITS[currency]))
+
+    return convert
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    from BillManagement.fx import RateTable
+
+    rates = random_rates()
+    table = RateTable(rates, 'USD')
+    convert = per_row_lookup(rates)
+    rng = random.Random(1)
+    print(f'{"rows":>10} {"per row ms":>12} {"table ms":>10}')
+    for rows in args.rows:
+        amounts = [rng.randint(1, 10 ** 6) for _ in range(rows)]
+        currencies = [rng.choice(CURRENCIES) for _ in range(rows)]
+        dates = [START + timedelta(days=rng.randrange(DAYS)) for _ in range(rows)]
+        rows_data = list(zip(amounts, currencies, dates))
+
+        def one_by_one():
+            return [convert(amount, currency, day, 'EUR') for amount, currency, day in rows_data]
+
+        assert one_by_one() == table.convert(amounts, currencies, dates, 'EUR').tolist()
+        baseline = best_of(one_by_one, args.repeat)
+        vectorized = best_of(lambda: table.convert(amounts, currencies, dates, 'EUR'), args.repeat)
+        print(f'{rows:>10} {baseline * 1000:>12.2f} {vectorized * 1000:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
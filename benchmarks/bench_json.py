@@ -0,0 +1,59 @@
+"""
+Benchmark of JSON rendering and parsing for large group-detail payloads.
+
+Builds a payload shaped like the groups/details/ response and compares DRF's stdlib-based
+JSONRenderer/JSONParser with the orjson based FastJSONRenderer/FastJSONParser.
+
+Usage: python -m benchmarks.bench_json [--expenses 10000]
+"""
+import argparse
+import io
+import uuid
+from datetime import datetime, timezone
+from benchmarks import best_of, setup
+
+
+def group_details_payload(expenses):
+    """Returns a group-details response body with the given number of expenses."""
+    return {
+        'expenses': [
+            {
+                'id': uuid.UUID(int=i),
+                'name': f'expense {i}',
+                'description': 'Dinner at the harbour restaurant',
+                'date': datetime(2024, 1, 1, 12, 30, i % 60, tzinfo=timezone.utc),
+                'repayments': [f'User "Member {j}" owes {i % 97} to "Member 0"' for j in range(1, 4)],
+            } for i in range(expenses)
+        ],
+        'next_cursor': None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--expenses', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from utils import fast_json
+
+    payload = group_details_payload(args.expenses)
+    body = JSONRenderer().render(payload)
+    pairs = {
+        'stdlib (DRF)': (JSONRenderer(), JSONParser()),
+        'orjson' if fast_json.orjson else 'fallback': (fast_json.FastJSONRenderer(), fast_json.FastJSONParser()),
+    }
+
+    print(f'{args.expenses} expenses, {len(body) / 1024:.0f} KiB of JSON')
+    print(f'{"implementation":<16} {"render ms":>10} {"parse ms":>10}')
+    for name, (renderer, json_parser) in pairs.items():
+        render = best_of(lambda: renderer.render(payload), args.repeat)
+        parse = best_of(lambda: json_parser.parse(io.BytesIO(body)), args.repeat)
+        print(f'{name:<16} {render * 1000:>10.1f} {parse * 1000:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Benchmark for the group settle-up engine.
+
+Usage: python -m benchmarks.bench_settle [--members 1000 5000 50000]
+"""
+import argparse
+import random
+import uuid
+from benchmarks import best_of, setup
+
+
+def random_balances(members, seed=0):
+    """Returns zero-sum random net balances for the given number of members."""
+    rng = random.Random(seed)
+    user_ids = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(members)]
+    balances = {user_id: rng.randint(-10000, 10000) for user_id in user_ids[:-1]}
+    balances[user_ids[-1]] = -sum(balances.values())
+    return balances
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--members', type=int, nargs='+', default=[1000, 5000, 20000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    from BillManagement.settle import simplify_debts
+
+    print(f'{"members":>10} {"transfers":>10} {"best ms":>10}')
+    for members in args.members:
+        balances = random_balances(members)
+        transfers = simplify_debts(balances)
+        elapsed = best_of(lambda: simplify_debts(balances), args.repeat)
+        print(f'{members:>10} {len(transfers):>10} {elapsed * 1000:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark for the vectorized split calculator.
+
+Compares ``splits.split_amounts`` with the same largest-remainder split written as a plain
+Python loop, for every weighted split type and growing numbers of users.
+
+Usage: python -m benchmarks.bench_splits [--users 1000 10000 100000]
+"""
+import argparse
+import random
+from benchmarks import best_of, setup
+
+AMOUNT = 123456789  # Amount split in every run, in minor units
+
+
+def python_split(amount, weights):
+    """Largest-remainder split with Python integers, the baseline being measured against."""
+    total = sum(weights)
+    shares = []
+    remainders = []
+    for index, weight in enumerate(weights):
+        share, remainder = divmod(weight * amount, total)
+        shares.append(share)
+        remainders.append((-remainder, index))
+    for _, index in sorted(remainders)[:amount - sum(shares)]:
+        shares[index] += 1
+    return shares
+
+
+def split_values(split_type, users, seed=0):
+    """Returns the split values and the equivalent integer weights for a split type."""
+    from BillManagement import splits
+
+    rng = random.Random(seed)
+    if split_type == splits.EQUAL:
+        return None, [1] * users
+    if split_type == splits.SHARES:
+        weights = [rng.randint(1, 5) for _ in range(users)]
+        return weights, weights
+    # Percentages in hundredths of a percent, adding up to 100%
+    weights = [1] * users
+    for _ in range(10000 - users):
+        weights[rng.randrange(users)] += 1
+    return [weight / 100 for weight in weights], weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    from BillManagement import splits
+
+    print(f'{"split":>10} {"users":>10} {"python ms":>10} {"numpy ms":>10}')
+    for split_type in (splits.EQUAL, splits.PERCENTAGE, splits.SHARES):
+        for users in args.users:
+            if split_type == splits.PERCENTAGE and users > 10000:
+                continue  # Every user needs at least 0.01%
+            values, weights = split_values(split_type, users)
+            assert splits.split_amounts(AMOUNT, split_type, users, values).tolist() == python_split(AMOUNT, weights)
+            python = best_of(lambda: python_split(AMOUNT, weights), args.repeat)
+            vectorized = best_of(lambda: splits.split_amounts(AMOUNT, split_type, users, values), args.repeat)
+            print(f'{split_type:>10} {users:>10} {python * 1000:>10.2f} {vectorized * 1000:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
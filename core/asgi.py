@@ -2,6 +2,7 @@
 ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Under ASGI the read endpoints are served by the async views in ``BillManagement.async_views``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -10,7 +11,15 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from dotenv import load_dotenv
+
+
+# loading environmental variable for the ASGI server (uvicorn, daphne...)
+load_dotenv(dotenv_path='env/.env.secrets')
+load_dotenv(dotenv_path='env/.env.shared')
+
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+os.environ.setdefault('ASYNC_READ_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -0,0 +1,10 @@
+from django.db.backends.mysql import base
+from core.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """
+    MySQL backend (mysqlclient) that reuses connections from a per-process pool.
+    """
+    def check_pooled_connection(self, connection):
+        connection.ping()
@@ -0,0 +1,9 @@
+from django.db.backends.sqlite3 import base
+from core.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """
+    SQLite backend that reuses connections from a per-process pool, used as a local
+    stand-in for the pooled MySQL backend.
+    """
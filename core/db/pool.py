@@ -0,0 +1,161 @@
+"""
+Process-local connection pooling for Django database backends.
+
+Django opens one connection per thread and, with ``CONN_MAX_AGE = 0``, closes it at the end
+of every request. The pooled backends keep closed connections in a per-process pool instead,
+so the next request reuses one without a new TCP and authentication handshake.
+
+Pool settings live in the ``POOL`` key of the database settings:
+
+    'POOL': {
+        'SIZE': 4,         # Idle connections kept per worker process, match the worker's threads
+        'RECYCLE': 3600,   # Seconds after which a connection is closed instead of reused
+    }
+"""
+import queue
+import threading
+import time
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_RECYCLE = 3600
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of idle DB-API connections.
+
+    Args:
+        size (int): Maximum number of idle connections kept.
+        recycle (int): Maximum age of a connection in seconds.
+    """
+    def __init__(self, size=DEFAULT_POOL_SIZE, recycle=DEFAULT_RECYCLE):
+        self.size = size
+        self.recycle = recycle
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created_at = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, connect, check):
+        """
+        Returns a healthy idle connection, or a new one if none is available.
+
+        Args:
+            connect (callable): Opens a new connection.
+            check (callable): Raises if a connection is no longer usable.
+
+        Returns:
+            object: The DB-API connection.
+        """
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._expired(connection):
+                self._discard(connection)
+                continue
+            try:
+                check(connection)
+            except Exception:
+                self._discard(connection)
+                continue
+            return connection
+
+        connection = connect()
+        with self._lock:
+            self._created_at[id(connection)] = time.monotonic()
+        return connection
+
+    def release(self, connection):
+        """
+        Returns a connection to the pool, closing it if the pool is full, it expired or it
+        cannot be rolled back to a clean state.
+
+        Args:
+            connection (object): The DB-API connection.
+        """
+        if self._expired(connection):
+            self._discard(connection)
+            return
+        try:
+            connection.rollback()
+            self._idle.put_nowait(connection)
+        except Exception:
+            self._discard(connection)
+
+    def close_all(self):
+        """
+        Closes every idle connection.
+        """
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def _expired(self, connection):
+        with self._lock:
+            created_at = self._created_at.get(id(connection))
+        return created_at is None or time.monotonic() - created_at > self.recycle
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    """
+    Returns the pool of a database alias, creating it on first use.
+
+    Args:
+        alias (str): The database alias.
+        settings_dict (dict): The database settings.
+
+    Returns:
+        ConnectionPool: The pool shared by every thread of the process.
+    """
+    with _pools_lock:
+        if alias not in _pools:
+            options = settings_dict.get('POOL') or {}
+            _pools[alias] = ConnectionPool(
+                size=options.get('SIZE', DEFAULT_POOL_SIZE),
+                recycle=options.get('RECYCLE', DEFAULT_RECYCLE),
+            )
+        return _pools[alias]
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Mixin for ``DatabaseWrapper`` classes that takes connections from, and returns them to,
+    the alias' :class:`ConnectionPool` instead of opening and closing them.
+    """
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire(lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params),
+                                 self.check_pooled_connection)
+
+    def check_pooled_connection(self, connection):
+        """
+        Raises if a pooled connection can no longer run queries.
+        """
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
@@ -0,0 +1,144 @@
+"""
+Read-replica routing.
+
+Queries made while serving a safe (GET, HEAD, OPTIONS) request are sent to one of the aliases in
+``DATABASE_REPLICAS``, picked once per request so all of its reads see the same snapshot; everything
+else uses the primary ``default`` database. After a user writes, their reads stay on the primary for
+``REPLICA_PIN_SECONDS`` so they always read their own writes. Pins are kept in the default cache,
+which production.py requires to be shared between workers, so a pin set by the worker that served
+the write is seen by every worker.
+"""
+import contextvars
+import random
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import SimpleLazyObject, empty
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_request_state = contextvars.ContextVar('replica_request_state', default=None)
+
+
+def _pin_key(user_id):
+    return f'replica_pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """
+    Sends the user's reads to the primary database for ``REPLICA_PIN_SECONDS``.
+
+    Args:
+        user_id (UUID): The user who wrote.
+    """
+    cache.set(_pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+async def apin_to_primary(user_id):
+    """
+    Async version of :func:`pin_to_primary`.
+    """
+    await cache.aset(_pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def _authenticated_user_id(request):
+    """
+    Returns the id of the request's user if it is already known and authenticated.
+
+    A lazy user that has not been loaded yet is not resolved here, since loading it would
+    itself run a query through the router.
+    """
+    user = request.__dict__.get('user')
+    if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+        return None
+    if user is not None and user.is_authenticated:
+        return user.pk
+    return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Middleware that marks safe requests as replica-readable and pins users after they write.
+
+    It works under both WSGI and ASGI, so async views are not forced back onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = self._start(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and self._wrote(state):
+            pin_to_primary(user.pk)
+        return response
+
+    async def __acall__(self, request):
+        state = self._start(request)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+        # A lazy user is left unresolved, loading it here would be a sync query in the event loop
+        user_id = _authenticated_user_id(request)
+        if user_id is not None and self._wrote(state):
+            await apin_to_primary(user_id)
+        return response
+
+    @staticmethod
+    def _start(request):
+        return {'request': request, 'read_only': request.method in SAFE_METHODS, 'wrote': False, 'pinned': None,
+                'replica': None}
+
+    @staticmethod
+    def _wrote(state):
+        return state['wrote'] or not state['read_only']
+
+
+class ReplicaRouter:
+    """
+    Database router sending the reads of safe requests to the replica picked for the request.
+    """
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or state is None or not state['read_only'] or state['wrote']:
+            return DEFAULT_DB_ALIAS
+        if state['pinned'] is None:
+            user_id = _authenticated_user_id(state['request'])
+            if user_id is not None:
+                state['pinned'] = bool(cache.get(_pin_key(user_id)))
+            # Otherwise authentication has not run yet, decide again once the user is known
+        if state['pinned']:
+            return DEFAULT_DB_ALIAS
+        if state['replica'] is None:
+            state['replica'] = random.choice(replicas)
+        return state['replica']
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -52,6 +52,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db.replicas.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -117,10 +118,53 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly'
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user.authentication.StatelessJWTAuthentication',
+    ),
+    # orjson based JSON handling, falling back to the stdlib when orjson is not installed
+    'DEFAULT_RENDERER_CLASSES': (
+        'utils.fast_json.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'utils.fast_json.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
 }
 
+# Stateless JWT authentication: how many user active flags are kept in memory and for how long,
+# which bounds how long a deactivated user's tokens keep working on other processes
+AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE', 10000))
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', 60))
+
+# Seconds an Idempotency-Key and its stored response are kept for retries
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+# Read replicas: aliases in DATABASES that serve the reads of safe requests, and how long a user's
+# reads stay on the primary after they write
+DATABASE_ROUTERS = ['core.db.replicas.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+
+# Serve the read endpoints with async views, set by core.asgi when running under an ASGI server
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'False') == 'True'
+
+# Live events: broker class delivering them, seconds between keep-alive comments on idle event
+# streams and events buffered for a slow client before it is told to fetch the current state again
+EVENT_BROKER = os.environ.get('EVENT_BROKER', 'BillManagement.events.InProcessBroker')
+EVENT_STREAM_KEEPALIVE_SECONDS = int(os.environ.get('EVENT_STREAM_KEEPALIVE_SECONDS', 15))
+EVENT_QUEUE_SIZE = int(os.environ.get('EVENT_QUEUE_SIZE', 100))
+
+# Balance snapshots: ledger entries a group needs since its last snapshot before snapshot_balances
+# takes a new one, and seconds an entry must have been committed for before it is snapshotted
+LEDGER_SNAPSHOT_MIN_ENTRIES = int(os.environ.get('LEDGER_SNAPSHOT_MIN_ENTRIES', 1000))
+LEDGER_SNAPSHOT_LAG_SECONDS = int(os.environ.get('LEDGER_SNAPSHOT_LAG_SECONDS', 60))
+
+# Money: ISO 4217 code of the currency balances are kept in, which exchange rates are quoted against,
+# and seconds a process goes without checking whether exchange rates were loaded since it read them
+BASE_CURRENCY = os.environ.get('BASE_CURRENCY', 'USD')
+FX_REVISION_CHECK_SECONDS = int(os.environ.get('FX_REVISION_CHECK_SECONDS', 10))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -133,6 +177,25 @@ EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS')
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 
+# Email outbox delivery: emails per batch, attempts before giving up, base retry delay in seconds
+# and seconds a worker holds a claimed batch before another worker may send it
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', 50))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+EMAIL_OUTBOX_BACKOFF_SECONDS = int(os.environ.get('EMAIL_OUTBOX_BACKOFF_SECONDS', 30))
+EMAIL_OUTBOX_CLAIM_SECONDS = int(os.environ.get('EMAIL_OUTBOX_CLAIM_SECONDS', 600))
+
+# Cache Configuration from Environment Variables (local memory unless a shared backend such as Redis is set).
+# Cache versions are only seen by every worker with a shared backend, which production.py requires.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'split_wise'),
+    }
+}
+
+# Seconds a cached group or balance read is kept, entries are also invalidated on every write
+BILL_CACHE_TIMEOUT = int(os.environ.get('BILL_CACHE_TIMEOUT', 300))
+
 # Django REST Framework Simple JWT Configuration
 SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": False,
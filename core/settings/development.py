@@ -62,8 +62,22 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',  # Database file location
+        # SQLite has no row locks: take the write lock when a transaction starts so concurrent
+        # writers queue up instead of failing with "database is locked"
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+        # File-based test database so tests can use several connections at once
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
+
+# Optional SQLite read replica, kept in sync by the developer (e.g. a copy of db.sqlite3)
+if os.environ.get('DB_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_REPLICA_PATH'),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = ['replica']
 # Static files settings
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
@@ -1,4 +1,5 @@
 # Production Settings
+from django.core.exceptions import ImproperlyConfigured
 from .base import *
 
 
@@ -38,14 +39,45 @@ CORS_ALLOW_METHODS = [
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+# Connections persist for DB_CONN_MAX_AGE seconds and are health-checked before being reused.
+# With DB_POOL = True the pooled mysqlclient backend is used instead: every request hands its
+# connection back to a per-worker pool of DB_POOL_SIZE idle connections (match it to the
+# gunicorn --threads of a worker), so CONN_MAX_AGE is 0.
+DB_POOL = os.environ.get('DB_POOL') == 'True'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'core.db.backends.mysql_pooled' if DB_POOL else 'django.db.backends.mysql',
         'OPTIONS': {
             'read_default_file': os.environ.get('DB_CNF_PATH'),
         },
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'SIZE': int(os.environ.get('DB_POOL_SIZE', 4)),
+            'RECYCLE': int(os.environ.get('DB_POOL_RECYCLE', 3600)),
+        },
+    }
+}
+
+# Optional read replica, configured through its own MySQL option file
+if os.environ.get('DB_REPLICA_CNF_PATH'):
+    DATABASES['replica'] = dict(DATABASES['default'], OPTIONS={
+        'read_default_file': os.environ.get('DB_REPLICA_CNF_PATH'),
+    }, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS = ['replica']
+
+# Cache shared by every worker: the versions invalidating cached group and balance reads (and their
+# ETags) and the replica pins of users who just wrote live there, so a per-process cache would let
+# workers that missed a write keep serving stale data
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
     }
 }
+if CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+    raise ImproperlyConfigured('CACHE_BACKEND must be shared between workers in production, e.g. RedisCache')
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
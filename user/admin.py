@@ -1,7 +1,8 @@
 from django.contrib import admin
-from user.models import User, UserInfo, OTPModel
+from user.models import User, UserInfo, OTPModel, EmailOutbox
 
 # Register your models here.
 admin.site.register(User)
 admin.site.register(UserInfo)
-admin.site.register(OTPModel)
\ No newline at end of file
+admin.site.register(OTPModel)
+admin.site.register(EmailOutbox)
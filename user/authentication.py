@@ -0,0 +1,153 @@
+"""
+Stateless JWT authentication.
+
+Requests are authenticated from the claims of the access token alone. The only state checked is
+whether the user is still active, and that flag is kept in a small in-process LRU cache with a
+short TTL, so authenticated requests normally run no authentication query at all.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from user.models import User
+
+
+class ActiveUserCache:
+    """
+    Thread-safe LRU cache of user active flags that expire after ``AUTH_USER_CACHE_TTL`` seconds.
+    """
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """
+        Returns the cached active flag of a user, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            is_active, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return is_active
+
+    def set(self, user_id, is_active):
+        """
+        Caches the active flag of a user, evicting the least recently used entries when full.
+        """
+        with self._lock:
+            self._entries[user_id] = (is_active, time.monotonic() + settings.AUTH_USER_CACHE_TTL)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > settings.AUTH_USER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        """
+        Removes a user from the cache so the next request reads the flag from the database.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+active_users = ActiveUserCache()
+
+
+class StatelessUser:
+    """
+    Lightweight user built from token claims.
+
+    ``id`` and ``pk`` come from the token. Any other attribute or method loads the full ``User``
+    row on first use, so views that change the user keep working unchanged.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token, user_id):
+        self.__dict__.update(token=token, id=user_id, pk=user_id)
+
+    @cached_property
+    def _user(self):
+        return User.objects.get(pk=self.pk)
+
+    def __getattr__(self, name):
+        return getattr(self._user, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._user, name, value)
+
+    def __eq__(self, other):
+        if isinstance(other, (StatelessUser, User)):
+            return self.pk == other.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return str(self._user)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that does not load the user row on each request.
+
+    Deactivated users are rejected once their cached active flag expires, or immediately on the
+    process that deactivated them.
+    """
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        is_active = active_users.get(user_id)
+        if is_active is None:
+            is_active = User.objects.filter(pk=user_id).values_list('is_active', flat=True).first()
+            self._remember(user_id, is_active)
+        return self._user(validated_token, user_id, is_active)
+
+    async def aauthenticate(self, request):
+        """
+        Async version of ``authenticate`` for async views, checking the active flag with the async ORM.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        user_id = self._user_id(validated_token)
+        is_active = active_users.get(user_id)
+        if is_active is None:
+            is_active = await User.objects.filter(pk=user_id).values_list('is_active', flat=True).afirst()
+            self._remember(user_id, is_active)
+        return self._user(validated_token, user_id, is_active), validated_token
+
+    def _user_id(self, validated_token):
+        try:
+            return uuid.UUID(str(validated_token[api_settings.USER_ID_CLAIM]))
+        except (KeyError, ValueError) as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def _remember(self, user_id, is_active):
+        if is_active is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        active_users.set(user_id, is_active)
+
+    def _user(self, validated_token, user_id, is_active):
+        if not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return StatelessUser(validated_token, user_id)
@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from utils.email import deliver_queued_emails
+
+
+class Command(BaseCommand):
+    """
+    Management command that delivers the emails queued in the outbox.
+
+    Run it once from cron, or with ``--loop`` as a long-running worker next to gunicorn.
+    """
+    help = 'Sends queued emails in batches over a reused SMTP connection, retrying failures with backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting.')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Seconds to wait between polls when the outbox is empty.')
+        parser.add_argument('--batch-size', type=int, help='Maximum number of emails sent per batch.')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent, failed = deliver_queued_emails(options['batch_size'])
+            except Exception as e:
+                self.stderr.write(f'Email delivery failed: {e}')
+                sent = failed = 0
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} emails, {failed} failed.')
+            if not options['loop']:
+                return
+            if not sent and not failed:
+                time.sleep(options['interval'])
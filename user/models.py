@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser, PermissionsMixin
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from uuid import uuid4
 from phonenumber_field.modelfields import PhoneNumberField
@@ -168,6 +169,26 @@ class UserInfo(AbstractBaseWithUuid):
     facebook = models.URLField(blank=True)
     instagram = models.URLField(blank=True)
 
+    @property
+    def name(self):
+        """
+        Returns the user's full name.
+
+        Returns:
+            str: The first and last name joined by a space.
+        """
+        return f'{self.first_name} {self.last_name}'.strip()
+
+    @property
+    def email(self):
+        """
+        Returns the email address of the associated user.
+
+        Returns:
+            str: The user's email address.
+        """
+        return self.user.email
+
 
 class OTPModel(AbstractBaseWithUuid):
     """
@@ -186,4 +207,49 @@ class OTPModel(AbstractBaseWithUuid):
         return f"{self.email}"
 
     class Meta:
-        db_table = "otp_model"
\ No newline at end of file
+        db_table = "otp_model"
+
+
+class EmailOutbox(AbstractBaseWithUuid):
+    """
+    Model to queue outgoing emails for background delivery.
+
+    Emails are enqueued on the request path and sent by the ``send_queued_emails``
+    management command, which retries failed deliveries with exponential backoff.
+    Emails being sent are ``sending`` until their claim expires at ``next_attempt_at``.
+
+    Attributes:
+        subject (CharField): The subject of the email.
+        message (TextField): The body of the email.
+        to_mail (EmailField): The recipient email address.
+        status (CharField): Delivery status of the email.
+        attempts (PositiveIntegerField): Number of failed delivery attempts.
+        next_attempt_at (DateTimeField): Earliest time of the next delivery attempt.
+        last_error (TextField): Error raised by the last failed attempt.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    choices = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed')
+    ]
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    to_mail = models.EmailField()
+    status = models.CharField(max_length=10, choices=choices, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.to_mail} - {self.subject}"
+
+    class Meta:
+        db_table = "email_outbox"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='email_outbox_due_idx'),
+        ]
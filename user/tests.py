@@ -1,3 +1,89 @@
-from django.test import TestCase
+from unittest import mock
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from user.authentication import active_users
+from user.models import EmailOutbox, User
+from utils.email import deliver_queued_emails, send_email
 
-# Create your tests here.
+
+@override_settings(EMAIL_HOST_USER='noreply@example.com', EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+class EmailOutboxTests(TestCase):
+    """Tests for the queued email delivery."""
+
+    def test_send_email_only_enqueues(self):
+        self.assertTrue(send_email('Email Verification', 'otp is 123456', 'alice@example.com'))
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(deliver_queued_emails(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ['alice@example.com'])
+        self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.SENT)
+        self.assertEqual(deliver_queued_emails(), (0, 0))
+
+    def test_failed_delivery_is_retried_then_given_up(self):
+        send_email('Email Verification', 'otp is 123456', 'alice@example.com')
+        with mock.patch('utils.email.EmailMessage.send', side_effect=OSError('connection refused')):
+            self.assertEqual(deliver_queued_emails(), (0, 1))
+            email = EmailOutbox.objects.get()
+            self.assertEqual((email.status, email.attempts), (EmailOutbox.PENDING, 1))
+
+            EmailOutbox.objects.update(next_attempt_at=email.created_at)
+            deliver_queued_emails()
+        email = EmailOutbox.objects.get()
+        self.assertEqual((email.status, email.attempts, email.last_error), (EmailOutbox.FAILED, 2, 'connection refused'))
+
+    def test_connection_failure_is_recorded(self):
+        send_email('Email Verification', 'otp is 123456', 'alice@example.com')
+        send_email('Email Verification', 'otp is 654321', 'bob@example.com')
+        with mock.patch('utils.email.get_connection', side_effect=OSError('no route to host')):
+            self.assertEqual(deliver_queued_emails(), (0, 2))
+        for email in EmailOutbox.objects.all():
+            self.assertEqual((email.status, email.attempts, email.last_error), (EmailOutbox.PENDING, 1, 'no route to host'))
+            self.assertGreater(email.next_attempt_at, email.created_at)
+
+    def test_claimed_emails_are_sent_once(self):
+        send_email('Email Verification', 'otp is 123456', 'alice@example.com')
+        sends = []
+
+        def send_and_poll_again(message):
+            # Another worker polling while this batch is in flight finds nothing to send
+            sends.append(message)
+            self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.SENDING)
+            self.assertEqual(deliver_queued_emails(), (0, 0))
+            return 1
+
+        with mock.patch('utils.email.EmailMessage.send', autospec=True, side_effect=send_and_poll_again):
+            self.assertEqual(deliver_queued_emails(), (1, 0))
+        self.assertEqual(len(sends), 1)
+        self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.SENT)
+
+    def test_expired_claim_is_sent_again(self):
+        send_email('Email Verification', 'otp is 123456', 'alice@example.com')
+        email = EmailOutbox.objects.get()
+        # A worker claimed the email and died before recording the result
+        EmailOutbox.objects.update(status=EmailOutbox.SENDING, next_attempt_at=email.created_at)
+        self.assertEqual(deliver_queued_emails(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ['alice@example.com'])
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    """Tests for the token-only authentication."""
+
+    def setUp(self):
+        active_users.clear()
+        self.user = User.objects.create_user(email='alice@example.com', password='secret', is_active=True)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_warm_requests_run_no_auth_query(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(reverse('user-info')).status_code, 404)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse('user-info')).status_code, 404)
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.delete(reverse('delete-account')).status_code, 204)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+        self.assertEqual(self.client.get(reverse('user-info')).status_code, 401)
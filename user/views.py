@@ -6,6 +6,7 @@ from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from user.authentication import active_users
 from user.models import User, OTPModel, UserInfo
 from user.serializers import UserModelSerializer, OTPSerializer, EmailSerializer, UserTokenObtainPairSerializer, UserInfoSerializer
 from utils.generate_otp import generate_otp
@@ -369,7 +370,7 @@ class UserInfoView(APIView):
         """
         GET method to retrieve user information.
         """
-        user_info = UserInfo.objects.filter(user=request.user).first()
+        user_info = UserInfo.objects.filter(user_id=request.user.pk).first()
         if user_info:
             serializer = UserInfoSerializer(user_info)
             context = {
@@ -387,7 +388,7 @@ class UserInfoView(APIView):
         """
         PUT method to update user information.
         """
-        user_info = UserInfo.objects.filter(user=request.user).first()
+        user_info = UserInfo.objects.filter(user_id=request.user.pk).first()
         if user_info:
             # Check if any fields are provided in the request data
             if not request.data:
@@ -447,6 +448,7 @@ class DeleteUser(APIView):
         user = request.user
         user.is_active = False  # Deactivate the user account
         user.save()
+        active_users.discard(user.pk)
         context = {
             'message': 'User account deactivated (soft delete).'
         }
@@ -1,10 +1,16 @@
-from django.core.mail import send_mail
+from datetime import timedelta
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
 
 
 def send_email(subject, message, to_mail):
     """
-    Sends an email using Django's send_mail function.
+    Queues an email for background delivery.
+
+    The email is stored in the outbox and sent by the ``send_queued_emails`` management
+    command, so the request never waits for the SMTP server.
 
     Args:
         subject (str): The subject of the email.
@@ -12,15 +18,112 @@ def send_email(subject, message, to_mail):
         to_mail (str): The recipient email address.
 
     Returns:
-        bool: True if the email was sent successfully, False otherwise.
+        bool: True if the email was queued successfully, False otherwise.
     """
+    from user.models import EmailOutbox
+
     try:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[to_mail, ]
-        )
+        EmailOutbox.objects.create(subject=subject, message=message, to_mail=to_mail)
         return True
+    except DatabaseError:
+        return False
+
+
+def _claim_due_emails(batch_size):
+    """
+    Marks a batch of due emails as in flight and returns them.
+
+    Rows are locked only for this short transaction. Claimed rows get a lease of
+    ``EMAIL_OUTBOX_CLAIM_SECONDS``, after which a worker that died mid-batch no longer
+    holds them and they are picked up again.
+    """
+    from user.models import EmailOutbox
+
+    now = timezone.now()
+    with transaction.atomic():
+        due = EmailOutbox.objects.filter(
+            status__in=[EmailOutbox.PENDING, EmailOutbox.SENDING], next_attempt_at__lte=now
+        ).order_by('next_attempt_at')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        emails = list(due[:batch_size])
+        if emails:
+            lease = now + timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_SECONDS)
+            EmailOutbox.objects.filter(pk__in=[email.pk for email in emails]).update(
+                status=EmailOutbox.SENDING, next_attempt_at=lease, updated_at=now
+            )
+    return emails
+
+
+def _record_failure(email, error):
+    """Counts a failed attempt and schedules a retry with exponential backoff, or gives up."""
+    from user.models import EmailOutbox
+
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = EmailOutbox.FAILED
+    else:
+        backoff = settings.EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (email.attempts - 1)
+        email.status = EmailOutbox.PENDING
+        email.next_attempt_at = timezone.now() + timedelta(seconds=backoff)
+
+
+def deliver_queued_emails(batch_size=None):
+    """
+    Sends a batch of due emails from the outbox over a single SMTP connection.
+
+    The batch is claimed in a short transaction and sent outside of it, so no row stays locked
+    while the SMTP server answers. The result of every email is saved as soon as it is known.
+    Failed emails, including those of a connection that could not be opened, are retried with
+    exponential backoff and marked as failed once ``EMAIL_OUTBOX_MAX_ATTEMPTS`` attempts have
+    been made.
+
+    Args:
+        batch_size (int): Maximum number of emails to send. Defaults to ``EMAIL_OUTBOX_BATCH_SIZE``.
+
+    Returns:
+        tuple: The number of sent and failed emails in the batch.
+    """
+    from user.models import EmailOutbox
+
+    fields = ['status', 'attempts', 'next_attempt_at', 'last_error', 'updated_at']
+    emails = _claim_due_emails(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not emails:
+        return 0, 0
+
+    sent = failed = 0
+    try:
+        smtp_connection = get_connection(fail_silently=False)
+        smtp_connection.open()
     except Exception as e:
-        return False
\ No newline at end of file
+        for email in emails:
+            _record_failure(email, e)
+            email.updated_at = timezone.now()
+        EmailOutbox.objects.bulk_update(emails, fields)
+        return sent, len(emails)
+
+    try:
+        for email in emails:
+            try:
+                EmailMessage(
+                    subject=email.subject,
+                    body=email.message,
+                    from_email=settings.EMAIL_HOST_USER,
+                    to=[email.to_mail],
+                    connection=smtp_connection,
+                ).send()
+                email.status = EmailOutbox.SENT
+                email.last_error = ''
+                sent += 1
+            except Exception as e:
+                _record_failure(email, e)
+                failed += 1
+            email.updated_at = timezone.now()
+            email.save(update_fields=fields)
+    finally:
+        try:
+            smtp_connection.close()
+        except Exception:
+            pass
+    return sent, failed